@@ -0,0 +1,189 @@
+"""Generate synthetic fixtures for the rnaseeker benchmark suite.
+
+Every generator is seeded so the same scale always produces byte-identical
+files, which keeps runs comparable across releases.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, asdict
+import random
+import os
+
+BASES = 'ACGT'
+GO_ROOTS = ('biological_process', 'molecular_function', 'cellular_component')
+
+
+@dataclass
+class Scale:
+    """Sizes of the generated fixtures."""
+
+    read_count: int = 200_000
+    read_length: int = 150
+    chromosome_count: int = 4
+    chromosome_length: int = 5_000_000
+    line_length: int = 80
+    wide_line_length: int = 10_000
+    gene_count: int = 20_000
+    go_term_count: int = 200_000
+    seed: int = 1
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+SCALES = {
+    'tiny': Scale(
+        read_count=2_000,
+        chromosome_count=2,
+        chromosome_length=50_000,
+        wide_line_length=1_000,
+        gene_count=200,
+        go_term_count=2_000,
+    ),
+    'small': Scale(
+        read_count=50_000,
+        chromosome_count=2,
+        chromosome_length=1_000_000,
+        gene_count=2_000,
+        go_term_count=50_000,
+    ),
+    'medium': Scale(),
+    'large': Scale(
+        read_count=2_000_000,
+        chromosome_count=8,
+        chromosome_length=25_000_000,
+        gene_count=60_000,
+        go_term_count=1_000_000,
+    ),
+}
+
+
+def _random_sequence(rng: random.Random, length: int, n_fraction: float = 0.0) -> str:
+    sequence = ''.join(rng.choices(BASES, k=length))
+    if n_fraction and length:
+        start = rng.randrange(length)
+        sequence = (
+            sequence[:start] + 'N' * int(length * n_fraction) + sequence[start:]
+        )[:length]
+    return sequence
+
+
+def _wrap(sequence: str, line_length: int) -> str:
+    if line_length <= 0:
+        return sequence + '\n'
+    return ''.join(
+        sequence[i : i + line_length] + '\n'
+        for i in range(0, len(sequence), line_length)
+    )
+
+
+def write_short_reads_fasta(path: str, scale: Scale) -> int:
+    """Many short reads, one line each. Returns number of records."""
+    rng = random.Random(scale.seed)
+    with open(path, 'w', encoding='UTF-8') as out_file:
+        for i in range(scale.read_count):
+            # Vary length a little and sprinkle in N-rich reads for fasta-filter
+            length = scale.read_length - rng.randrange(0, scale.read_length // 3)
+            n_fraction = 0.5 if i % 10 == 0 else 0.0
+            out_file.write(f'>read{i} synthetic\n')
+            out_file.write(_random_sequence(rng, length, n_fraction) + '\n')
+    return scale.read_count
+
+
+def write_short_reads_fastq(path: str, scale: Scale) -> int:
+    """Many short reads in four-line fastq. Returns number of records."""
+    rng = random.Random(scale.seed + 1)
+    # Includes '@' and '+' so the parser is exercised on ambiguous quality lines
+    qualities = [chr(i) for i in range(33, 74)]
+    with open(path, 'w', encoding='UTF-8') as out_file:
+        for i in range(scale.read_count):
+            sequence = _random_sequence(rng, scale.read_length)
+            quality = ''.join(rng.choices(qualities, k=scale.read_length))
+            out_file.write(f'@read{i} synthetic\n{sequence}\n+\n{quality}\n')
+    return scale.read_count
+
+
+def write_chromosomes_fasta(
+    path: str, scale: Scale, line_length: int | None = None
+) -> int:
+    """Few huge chromosomes. Returns number of records."""
+    rng = random.Random(scale.seed + 2)
+    if line_length is None:
+        line_length = scale.line_length
+    with open(path, 'w', encoding='UTF-8') as out_file:
+        for i in range(1, scale.chromosome_count + 1):
+            out_file.write(f'>chr{i} synthetic chromosome\n')
+            # Generate in blocks to keep generator memory bounded
+            remaining = scale.chromosome_length
+            block = 1_000_000 - (1_000_000 % max(line_length, 1))
+            while remaining > 0:
+                size = min(block, remaining)
+                out_file.write(_wrap(_random_sequence(rng, size), line_length))
+                remaining -= size
+    return scale.chromosome_count
+
+
+def write_genes_gff(path: str, scale: Scale) -> int:
+    """Gene annotations over the synthetic chromosomes. Returns number of genes."""
+    rng = random.Random(scale.seed + 3)
+    with open(path, 'w', encoding='UTF-8') as out_file:
+        out_file.write('##gff-version 3\n')
+        for i in range(scale.gene_count):
+            chromosome = rng.randrange(1, scale.chromosome_count + 1)
+            start = rng.randrange(1, max(scale.chromosome_length - 5_000, 2))
+            end = start + rng.randrange(500, 5_000)
+            strand = rng.choice('+-')
+            attributes = (
+                f'ID=gene-G{i};Dbxref=GeneID:{100000 + i};Name=G{i};gbkey=Gene'
+            )
+            out_file.write(
+                f'chr{chromosome}\tsynthetic\tgene\t{start}\t{end}\t.\t{strand}\t.\t'
+                + f'{attributes}\n'
+            )
+            # Non-gene features are dropped by extract_gene_info
+            out_file.write(
+                f'chr{chromosome}\tsynthetic\texon\t{start}\t{end}\t.\t{strand}\t.\t'
+                + f'ID=exon-G{i};gbkey=mRNA\n'
+            )
+    return scale.gene_count
+
+
+def write_gprofiler_csv(path: str, scale: Scale) -> int:
+    """gProfiler-like csv output. Returns number of data rows."""
+    rng = random.Random(scale.seed + 4)
+    with open(path, 'w', encoding='UTF-8') as out_file:
+        out_file.write(
+            'source,term_name,term_id,adjusted_p_value,negative_log10_of_adjusted_p_value\n'
+        )
+        for i in range(scale.go_term_count):
+            if i % 50 == 0:
+                term = GO_ROOTS[i % 3]
+            else:
+                term = f'synthetic process {i}'
+            p_value = rng.random() / 100
+            out_file.write(f'GO:BP,{term},GO:{i:07d},{p_value:.3e},{p_value:.3f}\n')
+    return scale.go_term_count
+
+
+def build_fixtures(directory: str, scale: Scale) -> dict[str, tuple[str, int]]:
+    """Write every fixture into directory.
+
+    Returns:
+        dict[str, tuple[str, int]]: Fixture name to (path, record count)
+    """
+    os.makedirs(directory, exist_ok=True)
+    builders = {
+        'short_reads.fa': write_short_reads_fasta,
+        'short_reads.fq': write_short_reads_fastq,
+        'chromosomes.fa': write_chromosomes_fasta,
+        'wide_lines.fa': lambda path, scale: write_chromosomes_fasta(
+            path, scale, scale.wide_line_length
+        ),
+        'genes.gff': write_genes_gff,
+        'gprofiler.csv': write_gprofiler_csv,
+    }
+    fixtures = {}
+    for name, builder in builders.items():
+        path = os.path.join(directory, name)
+        fixtures[name] = (path, builder(path, scale))
+    return fixtures
@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""Benchmark sequence_io and the rnaseeker sub-programs.
+
+Runs fully offline against synthetic fixtures and records MB/s, records/s and
+peak RSS for every case. Each repeat runs in a fresh process so peak RSS is
+not polluted by earlier cases.
+
+usage:
+    python benchmarks/run_benchmarks.py [--scale {tiny,small,medium,large}]
+        [-o results.json] [--compare baseline.json]
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+from dataclasses import dataclass
+import multiprocessing
+import atexit
+import statistics
+import itertools
+import argparse
+import platform
+import tempfile
+import resource
+import shutil
+import json
+import time
+import sys
+import os
+
+try:
+    import rnaseeker  # noqa: F401
+except ImportError:
+    # Allow running from a source checkout without installing
+    sys.path.insert(
+        0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+    )
+
+# pylint: disable=wrong-import-position
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.fasta import (
+    fasta_filter,
+    fasta_split,
+    fasta_stats,
+    kmer_count,
+    dedup,
+    subsample,
+    trim,
+    convert,
+    sort,
+    fetch_regions,
+    demux,
+    motif_scan,
+    extract_promoters,
+)
+from rnaseeker.gene_ontology import go_filter
+from rnaseeker import cache
+from rnaseeker.version import __version__
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fixtures  # noqa: E402
+
+
+@dataclass
+class Case:
+    """A benchmark case.
+
+    `function' receives the fixture paths, a scratch directory and whatever
+    `setup' returned, and returns the number of records processed. Only
+    `function' is timed.
+    """
+
+    function: Callable[[dict[str, str], str, Any], int]
+    inputs: tuple[str, ...]
+    setup: Callable[[dict[str, str]], Any] | None = None
+    available: Callable[[], bool] = lambda: True
+
+
+def _count_headers(path: str) -> int:
+    with open(path, 'r', encoding='UTF-8') as in_file:
+        return sum(1 for line in in_file if line.startswith('>'))
+
+
+def _count_fastq(path: str) -> int:
+    with open(path, 'r', encoding='UTF-8') as in_file:
+        return sum(1 for _ in in_file) // 4
+
+
+def _parse_fasta(path: str) -> int:
+    count = 0
+    with seqio.FastaReader(path) as reader:
+        for _ in reader.parse():
+            count += 1
+    return count
+
+
+def _parse_fastq(path: str) -> int:
+    count = 0
+    with seqio.FastqReader(path) as reader:
+        for _ in reader.parse():
+            count += 1
+    return count
+
+
+def _load_fasta(path: str) -> list[seqio.SequenceRecord]:
+    with seqio.FastaReader(path) as reader:
+        return list(reader.parse())
+
+
+def _write_fasta(
+    _paths: dict[str, str], scratch: str, sequences: list[seqio.SequenceRecord]
+) -> int:
+    with seqio.FastaWriter(os.path.join(scratch, 'out.fa')) as writer:
+        writer.write_sequences(sequences)
+    return writer.writer.sequences_written
+
+
+def _filter_fasta(fixture: str) -> Callable[[dict[str, str], str, Any], int]:
+    def function(paths: dict[str, str], scratch: str, _state: Any) -> int:
+        fasta_filter.filter_fasta(
+            paths[fixture], os.path.join(scratch, 'filtered.fa'), 100, 80
+        )
+        return _count_headers(paths[fixture])
+
+    return function
+
+
+def _split(
+    fixture: str, input_format: str
+) -> Callable[[dict[str, str], str, Any], int]:
+    def function(paths: dict[str, str], scratch: str, _state: Any) -> int:
+        fasta_split.split_file(
+            10, paths[fixture], input_format, directory=os.path.join(scratch, 'split')
+        )
+        if input_format == 'fastq':
+            return _count_fastq(paths[fixture])
+        return _count_headers(paths[fixture])
+
+    return function
+
+
+def _fasta_stats(
+    fixture: str, input_format: str
+) -> Callable[[dict[str, str], str, Any], int]:
+    def function(paths: dict[str, str], _scratch: str, _state: Any) -> int:
+        return fasta_stats.compute_stats(paths[fixture], input_format).record_count
+
+    return function
+
+
+def _kmer_count(paths: dict[str, str], scratch: str, _state: Any) -> int:
+    kmer_count.count_kmers(
+        paths['short_reads.fq'], os.path.join(scratch, 'kmers.bin'), 21, 'fastq', 'binary'
+    )
+    return _count_fastq(paths['short_reads.fq'])
+
+
+def _dedup(external: bool) -> Callable[[dict[str, str], str, Any], int]:
+    def function(paths: dict[str, str], scratch: str, _state: Any) -> int:
+        read, _ = dedup.deduplicate(
+            [paths['short_reads.fq']],
+            [os.path.join(scratch, 'dedup.fq')],
+            'fastq',
+            external,
+        )
+        return read
+
+    return function
+
+
+def _subsample(paths: dict[str, str], scratch: str, _state: Any) -> int:
+    read, _ = subsample.subsample(
+        [paths['short_reads.fq']],
+        [os.path.join(scratch, 'subsample.fq')],
+        'fastq',
+        number=1000,
+    )
+    return read
+
+
+def _trim(paths: dict[str, str], scratch: str, _state: Any) -> int:
+    counts = trim.trim_reads(
+        paths['short_reads.fq'],
+        os.path.join(scratch, 'trimmed.fq'),
+        trim.Trimmer(['AGATCGGAAGAGC'], quality_cutoff=20, minimum_length=20),
+    )
+    return counts['reads']
+
+
+def _convert_parquet(paths: dict[str, str], scratch: str, _state: Any) -> int:
+    parquet = os.path.join(scratch, 'reads.parquet')
+    if os.path.exists(parquet):
+        os.remove(parquet)
+    convert.convert(paths['short_reads.fq'], parquet, 'fastq', 'parquet')
+    return convert.convert(parquet, os.devnull, 'parquet', 'fastq')
+
+
+def _sort(paths: dict[str, str], scratch: str, _state: Any) -> int:
+    output = os.path.join(scratch, 'sorted.fq')
+    if os.path.exists(output):
+        os.remove(output)
+    # Small memory so the merge of spilled runs is measured too
+    return sort.sort_file(
+        paths['short_reads.fq'], output, 'fastq', 'sequence', memory=8 * 1024 * 1024
+    )
+
+
+def _gene_regions(paths: dict[str, str]) -> str:
+    """BED lines of the gene annotations, in file order."""
+    with open(paths['genes.gff'], 'r', encoding='UTF-8') as gff_file:
+        rows = [line.split('\t') for line in gff_file if not line.startswith('#')]
+    return ''.join(
+        f'{row[0]}\t{int(row[3]) - 1}\t{row[4]}\tG{index}\t0\t{row[6]}\n'
+        for index, row in enumerate(rows)
+        if row[2] == 'gene'
+    )
+
+
+def _fetch_regions(paths: dict[str, str], scratch: str, bed_lines: str) -> int:
+    bed_path = os.path.join(scratch, 'genes.bed')
+    output = os.path.join(scratch, 'regions.fa')
+    with open(bed_path, 'w', encoding='UTF-8') as bed_file:
+        bed_file.write(bed_lines)
+    if os.path.exists(output):
+        os.remove(output)
+    return fetch_regions.fetch_regions(
+        bed_path,
+        paths['chromosomes.fa'],
+        output,
+        index_path=os.path.join(scratch, 'chromosomes.fa.fai'),
+    )
+
+
+def _warm_index_cache(paths: dict[str, str]) -> tuple[str, cache.Cache]:
+    """Gene regions and a cache already holding the fasta index, which is
+    removed when the benchmark process exits."""
+    directory = tempfile.mkdtemp(prefix='rnaseeker-bench-cache-')
+    atexit.register(shutil.rmtree, directory, True)
+    file_cache = cache.Cache(directory)
+    fetch_regions.fetch_regions(
+        os.devnull, paths['chromosomes.fa'], os.devnull, file_cache=file_cache
+    )
+    return _gene_regions(paths), file_cache
+
+
+def _fetch_regions_cached(
+    paths: dict[str, str], scratch: str, state: tuple[str, cache.Cache]
+) -> int:
+    bed_lines, file_cache = state
+    bed_path = os.path.join(scratch, 'genes.bed')
+    with open(bed_path, 'w', encoding='UTF-8') as bed_file:
+        bed_file.write(bed_lines)
+    return fetch_regions.fetch_regions(
+        bed_path,
+        paths['chromosomes.fa'],
+        os.path.join(scratch, 'regions.fa'),
+        file_cache=file_cache,
+    )
+
+
+def _plate_barcodes(_paths: dict[str, str]) -> dict[str, str]:
+    """Inline 6-mer barcodes of a 384-sample plate."""
+    kmers = [''.join(bases) for bases in itertools.product('ACGT', repeat=6)]
+    return {f'S{index:03d}': kmer for index, kmer in enumerate(kmers[::10][:384])}
+
+
+def _demux(paths: dict[str, str], scratch: str, samples: dict[str, str]) -> int:
+    directory = os.path.join(scratch, 'demux')
+    shutil.rmtree(directory, ignore_errors=True)
+    counts, _ = demux.demultiplex(
+        [paths['short_reads.fq']], samples, directory, max_open=64
+    )
+    return sum(counts.values())
+
+
+# A, C, G and T counts at each position of JASPAR MA0004.1 and MA0006.1
+_MATRIX_COUNTS = {
+    'Arnt': [
+        [4, 16, 0, 0],
+        [19, 0, 1, 0],
+        [0, 20, 0, 0],
+        [0, 0, 20, 0],
+        [0, 0, 0, 20],
+        [0, 0, 20, 0],
+    ],
+    'Ahr::Arnt': [
+        [4, 16, 0, 3],
+        [0, 0, 23, 0],
+        [0, 23, 0, 0],
+        [0, 0, 23, 0],
+        [0, 0, 0, 23],
+        [0, 0, 23, 0],
+    ],
+}
+
+
+def _motif_scanner(matrices: bool) -> Callable[[dict[str, str]], Any]:
+    def setup(_paths: dict[str, str]) -> motif_scan.Scanner:
+        if matrices:
+            return motif_scan.Scanner(
+                matrices=[
+                    motif_scan.Matrix(
+                        name,
+                        [[count / sum(row) for count in row] for row in rows],
+                        round(sum(rows[0])),
+                    )
+                    for name, rows in _MATRIX_COUNTS.items()
+                ]
+            )
+        return motif_scan.Scanner(
+            [
+                motif_scan.ConsensusMotif('TATA', 'TATAWAWR'),
+                motif_scan.ConsensusMotif('Ebox', 'CACGTG'),
+                motif_scan.ConsensusMotif('GATA', 'WGATAR'),
+                motif_scan.ConsensusMotif('CCAAT', 'CCAAT'),
+            ]
+        )
+
+    return setup
+
+
+def _motif_scan(
+    paths: dict[str, str], scratch: str, scanner: motif_scan.Scanner
+) -> int:
+    motif_scan.scan_motifs(
+        paths['chromosomes.fa'], os.path.join(scratch, 'hits.bed'), scanner
+    )
+    return _count_headers(paths['chromosomes.fa'])
+
+
+def _have_numpy() -> bool:
+    try:
+        motif_scan.import_numpy()
+    except ImportError:
+        return False
+    return True
+
+
+def _have_pyarrow() -> bool:
+    try:
+        seqio.import_pyarrow()
+    except ImportError:
+        return False
+    return True
+
+
+def _go_filter(paths: dict[str, str], scratch: str, _state: Any) -> int:
+    with open(paths['gprofiler.csv'], 'r', encoding='UTF-8') as in_file:
+        terms = go_filter.filter_terms(
+            in_file,
+            to_filter='biological_process;molecular_function;cellular_component',
+        )
+    with open(os.path.join(scratch, 'revigo.tsv'), 'w', encoding='UTF-8') as out_file:
+        go_filter.write_terms(out_file, terms)
+    return len(terms) - 1
+
+
+def _extract_promoters(paths: dict[str, str], scratch: str, _state: Any) -> int:
+    extract_promoters.extract_promoters(
+        paths['genes.gff'], paths['chromosomes.fa'], 1000, scratch
+    )
+    return _count_headers(os.path.join(scratch, 'promoters.fa'))
+
+
+def _have_promoter_tools() -> bool:
+    return shutil.which('samtools') is not None and shutil.which('bedtools') is not None
+
+
+CASES: dict[str, Case] = {
+    'fasta_parse_short_reads': Case(
+        lambda paths, _scratch, _state: _parse_fasta(paths['short_reads.fa']),
+        ('short_reads.fa',),
+    ),
+    'fasta_parse_chromosomes': Case(
+        lambda paths, _scratch, _state: _parse_fasta(paths['chromosomes.fa']),
+        ('chromosomes.fa',),
+    ),
+    'fasta_parse_wide_lines': Case(
+        lambda paths, _scratch, _state: _parse_fasta(paths['wide_lines.fa']),
+        ('wide_lines.fa',),
+    ),
+    'fastq_parse_short_reads': Case(
+        lambda paths, _scratch, _state: _parse_fastq(paths['short_reads.fq']),
+        ('short_reads.fq',),
+    ),
+    'fasta_write_short_reads': Case(
+        _write_fasta,
+        ('short_reads.fa',),
+        setup=lambda paths: _load_fasta(paths['short_reads.fa']),
+    ),
+    'fasta_write_chromosomes': Case(
+        _write_fasta,
+        ('chromosomes.fa',),
+        setup=lambda paths: _load_fasta(paths['chromosomes.fa']),
+    ),
+    'fasta_filter_short_reads': Case(
+        _filter_fasta('short_reads.fa'), ('short_reads.fa',)
+    ),
+    'fasta_filter_chromosomes': Case(
+        _filter_fasta('chromosomes.fa'), ('chromosomes.fa',)
+    ),
+    'fasta_split_fasta': Case(_split('short_reads.fa', 'fasta'), ('short_reads.fa',)),
+    'fasta_split_fastq': Case(_split('short_reads.fq', 'fastq'), ('short_reads.fq',)),
+    'fasta_stats_short_reads': Case(
+        _fasta_stats('short_reads.fa', 'fasta'), ('short_reads.fa',)
+    ),
+    'fasta_stats_chromosomes': Case(
+        _fasta_stats('chromosomes.fa', 'fasta'), ('chromosomes.fa',)
+    ),
+    'fasta_stats_fastq': Case(
+        _fasta_stats('short_reads.fq', 'fastq'), ('short_reads.fq',)
+    ),
+    'kmer_count_fastq': Case(_kmer_count, ('short_reads.fq',)),
+    'fastq_dedup': Case(_dedup(False), ('short_reads.fq',)),
+    'fastq_dedup_external': Case(_dedup(True), ('short_reads.fq',)),
+    'fastq_subsample': Case(_subsample, ('short_reads.fq',)),
+    'fastq_trim': Case(_trim, ('short_reads.fq',)),
+    'fastq_sort': Case(_sort, ('short_reads.fq',)),
+    'fetch_regions': Case(
+        _fetch_regions, ('genes.gff', 'chromosomes.fa'), setup=_gene_regions
+    ),
+    'fetch_regions_cached_index': Case(
+        _fetch_regions_cached, ('genes.gff', 'chromosomes.fa'), setup=_warm_index_cache
+    ),
+    'fastq_demux': Case(_demux, ('short_reads.fq',), setup=_plate_barcodes),
+    'motif_scan_consensus': Case(
+        _motif_scan, ('chromosomes.fa',), setup=_motif_scanner(False)
+    ),
+    'motif_scan_matrices': Case(
+        _motif_scan,
+        ('chromosomes.fa',),
+        setup=_motif_scanner(True),
+        available=_have_numpy,
+    ),
+    'convert_parquet': Case(
+        _convert_parquet, ('short_reads.fq',), available=_have_pyarrow
+    ),
+    'go_filter': Case(_go_filter, ('gprofiler.csv',)),
+    'extract_promoters': Case(
+        _extract_promoters,
+        ('genes.gff', 'chromosomes.fa'),
+        available=_have_promoter_tools,
+    ),
+}
+
+
+def _peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    if sys.platform == 'darwin':
+        return peak // 1024
+    return peak
+
+
+def _run_case(name: str, paths: dict[str, str], queue: multiprocessing.Queue) -> None:
+    case = CASES[name]
+    state = case.setup(paths) if case.setup is not None else None
+    with tempfile.TemporaryDirectory(prefix=f'rnaseeker-bench-{name}-') as scratch:
+        start = time.perf_counter()
+        records = case.function(paths, scratch, state)
+        seconds = time.perf_counter() - start
+    queue.put((seconds, records, _peak_rss_kb()))
+
+
+def run_case(name: str, paths: dict[str, str], repeats: int) -> dict[str, object]:
+    """Run one case `repeats' times, each in a fresh process, and summarise."""
+    input_bytes = sum(os.path.getsize(paths[fixture]) for fixture in CASES[name].inputs)
+    context = multiprocessing.get_context('spawn')
+    timings: list[float] = []
+    peak_rss: list[int] = []
+    records = 0
+    for _ in range(repeats):
+        queue = context.Queue()
+        process = context.Process(target=_run_case, args=(name, paths, queue))
+        process.start()
+        # Result is a small tuple, so joining before reading cannot deadlock
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(f'Benchmark case {name} failed')
+        seconds, records, rss = queue.get()
+        timings.append(seconds)
+        peak_rss.append(rss)
+    best = min(timings)
+    return {
+        'name': name,
+        'input_bytes': input_bytes,
+        'records': records,
+        'repeats': repeats,
+        'seconds_best': best,
+        'seconds_median': statistics.median(timings),
+        'mb_per_s': input_bytes / 1_000_000 / best if best else None,
+        'records_per_s': records / best if best else None,
+        'peak_rss_kb': max(peak_rss),
+    }
+
+
+def compare(results: list[dict], baseline_path: str, threshold: float) -> list[str]:
+    """Return descriptions of cases that regressed by more than threshold."""
+    with open(baseline_path, 'r', encoding='UTF-8') as baseline_file:
+        baseline = {case['name']: case for case in json.load(baseline_file)['results']}
+    regressions = []
+    for case in results:
+        old = baseline.get(case['name'])
+        if old is None or not old.get('mb_per_s') or not case.get('mb_per_s'):
+            continue
+        ratio = case['mb_per_s'] / old['mb_per_s']
+        if ratio < 1 - threshold:
+            regressions.append(
+                f"{case['name']}: {old['mb_per_s']:.2f} -> {case['mb_per_s']:.2f} MB/s "
+                + f'({(ratio - 1) * 100:+.1f}%)'
+            )
+    return regressions
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments, build fixtures and run benchmark cases."""
+    parser = argparse.ArgumentParser(
+        'run_benchmarks', description='Benchmark rnaseeker sequence io and sub-programs'
+    )
+    parser.add_argument(
+        '--scale',
+        choices=list(fixtures.SCALES),
+        default='small',
+        help="Size of generated fixtures. Default is `small'",
+    )
+    parser.add_argument(
+        '--read-count', type=int, help='Override number of short reads in fixtures'
+    )
+    parser.add_argument(
+        '--chromosome-length',
+        type=int,
+        help='Override length of each synthetic chromosome',
+    )
+    parser.add_argument(
+        '--wide-line-length',
+        type=int,
+        help='Override line length of the wide-line fasta fixture',
+    )
+    parser.add_argument(
+        '-k',
+        '--case',
+        dest='cases',
+        action='append',
+        choices=list(CASES),
+        help='Only run given case. May be given multiple times. Default is all cases',
+    )
+    parser.add_argument(
+        '-r', '--repeats', type=int, default=3, help='Repeats per case. Default is 3'
+    )
+    parser.add_argument(
+        '--fixture-directory',
+        help='Directory to write fixtures to and keep. Defaults to a temporary directory',
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to JSON results. Writes to standard out if `-'. Defaults to `-'",
+    )
+    parser.add_argument(
+        '--compare',
+        metavar='BASELINE',
+        help='Path to a previous JSON results file to check for regressions',
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.10,
+        help='Fractional MB/s drop counted as a regression. Default is 0.10',
+    )
+    args = parser.parse_args(arguments)
+
+    scale = fixtures.SCALES[args.scale]
+    for field in ('read_count', 'chromosome_length', 'wide_line_length'):
+        if getattr(args, field) is not None:
+            setattr(scale, field, getattr(args, field))
+
+    directory = args.fixture_directory or tempfile.mkdtemp(prefix='rnaseeker-bench-')
+    try:
+        sys.stderr.write(f'Generating {args.scale} fixtures in {directory}...\n')
+        paths = {
+            name: path
+            for name, (path, _) in fixtures.build_fixtures(directory, scale).items()
+        }
+        results = []
+        skipped = []
+        for name in args.cases or CASES:
+            if not CASES[name].available():
+                skipped.append(name)
+                sys.stderr.write(f'Skipping {name}: required tools not available\n')
+                continue
+            sys.stderr.write(f'Running {name}...\n')
+            results.append(run_case(name, paths, args.repeats))
+    finally:
+        if args.fixture_directory is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        'rnaseeker_version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'scale': args.scale,
+        'scale_parameters': scale.to_dict(),
+        'skipped': skipped,
+        'results': results,
+    }
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w', encoding='UTF-8') as out_file:
+            json.dump(report, out_file, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            sys.stderr.write(f'REGRESSION {regression}\n')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
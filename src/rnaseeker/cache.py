@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""Cache files derived from input files, such as indexes and extracted
+promoters, so repeat runs with the same inputs and parameters reuse them.
+
+Entries are keyed by a fingerprint of each input file and by the parameters
+used to derive them. By default a fingerprint is the file's path, size and
+modification time; with hash_inputs it is the file's size and a hash of
+samples of its contents, so a copied or touched file still hits. The cache
+holds at most max_size bytes and evicts the least recently used entries
+first. Nothing is invalidated implicitly other than by changed fingerprints:
+use `Cache.invalidate' or `rnaseeker cache invalidate' to drop entries.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Iterable, NamedTuple, TypeVar
+import argparse
+import tempfile
+import hashlib
+import pickle
+import shutil
+import json
+import time
+import sys
+import re
+import gc
+import os
+
+from rnaseeker.version import __version__
+from rnaseeker.instrumentation import STATS
+
+T = TypeVar('T')
+
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024 * 1024
+# Bytes hashed from the start, middle and end of a file for its fingerprint
+_SAMPLE_SIZE = 1024 * 1024
+_METADATA = 'entry.json'
+_OBJECT = 'object.pickle'
+# Names of entry directories and of the temporary directories of builds
+# and removals, which are all named after the entry's key
+_KEY_NAME = re.compile(r'\.?([0-9a-f]{64})(?:-.*|\.removing)?')
+
+
+def default_directory() -> str:
+    """Return $RNASEEKER_CACHE_DIR, or rnaseeker in the user cache directory."""
+    directory = os.environ.get('RNASEEKER_CACHE_DIR')
+    if directory:
+        return directory
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'
+    )
+    return os.path.join(base, 'rnaseeker')
+
+
+def sample_hash(path: str) -> str:
+    """Hash the size and three samples of a file: the start, middle and end.
+    Reads at most three megabytes whatever the size of the file."""
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as in_file:
+        if size <= 3 * _SAMPLE_SIZE:
+            digest.update(in_file.read())
+        else:
+            for offset in (0, (size - _SAMPLE_SIZE) // 2, size - _SAMPLE_SIZE):
+                in_file.seek(offset)
+                digest.update(in_file.read(_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def fingerprint(path: str, hash_inputs: bool = False) -> dict[str, Any]:
+    """Return what identifies the current contents of a file."""
+    status = os.stat(path)
+    if hash_inputs:
+        return {'size': status.st_size, 'hash': sample_hash(path)}
+    return {
+        'path': os.path.realpath(path),
+        'size': status.st_size,
+        'mtime_ns': status.st_mtime_ns,
+    }
+
+
+class CacheEntry(NamedTuple):
+    """A complete entry in the cache."""
+
+    key: str
+    directory: str
+    namespace: str
+    inputs: list[str]
+    parameters: dict[str, Any]
+    size: int
+    last_used: float
+
+
+class Cache:
+    """On-disk cache of derived files, keyed by input fingerprints and
+    parameters, with least recently used eviction.
+
+    Each entry is a directory of files. Entries are built in a temporary
+    directory inside the cache and renamed into place when complete, so
+    readers never see a partial entry and concurrent builders of the same
+    entry keep whichever finished first.
+    """
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+        hash_inputs: bool = False,
+    ) -> None:
+        self.directory = directory or default_directory()
+        self.max_size = max_size
+        self.hash_inputs = hash_inputs
+
+    def key(
+        self, namespace: str, inputs: Iterable[str], parameters: dict[str, Any]
+    ) -> str:
+        """Return cache key of deriving namespace from input files with
+        parameters. The rnaseeker version is part of the key, so an upgrade
+        never reuses files made by older code."""
+        description = {
+            'namespace': namespace,
+            'version': __version__,
+            'inputs': [fingerprint(path, self.hash_inputs) for path in inputs],
+            'parameters': parameters,
+        }
+        return hashlib.sha256(
+            json.dumps(description, sort_keys=True).encode()
+        ).hexdigest()
+
+    def _entry_directory(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def lookup(self, key: str) -> str | None:
+        """Return directory of the entry with key and mark it used, or None if
+        there is no such entry."""
+        directory = self._entry_directory(key)
+        metadata = os.path.join(directory, _METADATA)
+        try:
+            os.utime(metadata)
+        except FileNotFoundError:
+            STATS.count('cache_misses')
+            return None
+        STATS.count('cache_hits')
+        return directory
+
+    def get_or_create(
+        self,
+        namespace: str,
+        inputs: list[str],
+        parameters: dict[str, Any],
+        build: Callable[[str], None],
+    ) -> str:
+        """Return directory of the entry for namespace, inputs and parameters,
+        first calling build with an empty directory to fill if there is no
+        such entry."""
+        key = self.key(namespace, inputs, parameters)
+        directory = self.lookup(key)
+        if directory is not None:
+            return directory
+        directory = self._entry_directory(key)
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        building = tempfile.mkdtemp(
+            prefix=f'.{key}-', dir=os.path.dirname(directory)
+        )
+        try:
+            with STATS.timer(f'cache_build_{namespace}'):
+                build(building)
+            size = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(building)
+                for name in names
+            )
+            with open(
+                os.path.join(building, _METADATA), 'w', encoding='UTF-8'
+            ) as metadata_file:
+                json.dump(
+                    {
+                        'namespace': namespace,
+                        'inputs': [os.path.realpath(path) for path in inputs],
+                        'parameters': parameters,
+                        'size': size,
+                        'created': time.time(),
+                    },
+                    metadata_file,
+                )
+            try:
+                os.rename(building, directory)
+            except OSError:
+                # Another process stored the same entry first
+                if not os.path.exists(os.path.join(directory, _METADATA)):
+                    raise
+        finally:
+            shutil.rmtree(building, ignore_errors=True)
+        self.evict(keep=key)
+        return directory
+
+    def fetch(
+        self,
+        namespace: str,
+        inputs: list[str],
+        parameters: dict[str, Any],
+        build: Callable[[str], None],
+        files: dict[str, str],
+    ) -> None:
+        """Copy files of an entry, given as a map from name in the entry to
+        output path, building the entry first if needed. Files are copied,
+        not linked, so later writes to the outputs cannot change the cache."""
+        directory = self.get_or_create(namespace, inputs, parameters, build)
+        for name, out_path in files.items():
+            shutil.copyfile(os.path.join(directory, name), out_path)
+
+    def pickled(
+        self,
+        namespace: str,
+        inputs: list[str],
+        parameters: dict[str, Any],
+        build: Callable[[], T],
+    ) -> T:
+        """Return object built by build from inputs, such as a parsed index,
+        unpickled from the cache if it was built before."""
+
+        def store(directory: str) -> None:
+            with open(os.path.join(directory, _OBJECT), 'wb') as object_file:
+                pickle.dump(build(), object_file, pickle.HIGHEST_PROTOCOL)
+
+        directory = self.get_or_create(namespace, inputs, parameters, store)
+        # Unpickling a large index creates many containers at once, which would
+        # otherwise set off repeated garbage collections that find nothing
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            with open(os.path.join(directory, _OBJECT), 'rb') as object_file:
+                return pickle.load(object_file)
+        finally:
+            if collecting:
+                gc.enable()
+
+    def entries(self) -> list[CacheEntry]:
+        """Return complete entries, least recently used first."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for prefix in os.listdir(self.directory):
+            prefix_directory = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_directory):
+                continue
+            for key in os.listdir(prefix_directory):
+                if key.startswith('.'):
+                    continue  # Being built or removed
+                directory = os.path.join(prefix_directory, key)
+                metadata_path = os.path.join(directory, _METADATA)
+                try:
+                    with open(metadata_path, 'r', encoding='UTF-8') as metadata_file:
+                        metadata = json.load(metadata_file)
+                    last_used = os.path.getmtime(metadata_path)
+                except (OSError, ValueError):
+                    continue  # Removed meanwhile, or not an entry
+                entries.append(
+                    CacheEntry(
+                        key,
+                        directory,
+                        metadata['namespace'],
+                        metadata['inputs'],
+                        metadata['parameters'],
+                        metadata['size'],
+                        last_used,
+                    )
+                )
+        entries.sort(key=lambda entry: entry.last_used)
+        return entries
+
+    def _remove(self, entry: CacheEntry) -> None:
+        # Rename first so the entry disappears at once for other processes
+        doomed = os.path.join(
+            os.path.dirname(entry.directory), f'.{entry.key}.removing'
+        )
+        try:
+            os.rename(entry.directory, doomed)
+        except OSError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+
+    def evict(self, max_size: int | None = None, keep: str | None = None) -> int:
+        """Remove least recently used entries until the cache holds at most
+        max_size bytes, defaulting to the cache's max_size. The entry with
+        key keep is never removed.
+
+        Returns:
+            int: Number of entries removed
+        """
+        max_size = self.max_size if max_size is None else max_size
+        entries = self.entries()
+        total = sum(entry.size for entry in entries)
+        removed = 0
+        for entry in entries:
+            if total <= max_size:
+                break
+            if entry.key == keep:
+                continue
+            self._remove(entry)
+            total -= entry.size
+            removed += 1
+        STATS.count('cache_evictions', removed)
+        return removed
+
+    def invalidate(
+        self, namespace: str | None = None, inputs: Iterable[str] = ()
+    ) -> int:
+        """Remove entries of namespace, or derived from any of inputs, or
+        matching both if both are given. Removes every entry if neither is
+        given.
+
+        Returns:
+            int: Number of entries removed
+        """
+        paths = {os.path.realpath(path) for path in inputs}
+        removed = 0
+        for entry in self.entries():
+            if namespace is not None and entry.namespace != namespace:
+                continue
+            if paths and paths.isdisjoint(entry.inputs):
+                continue
+            self._remove(entry)
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        """Remove every entry, including builds left by killed runs. Only
+        directories the cache created are removed, so other files in the cache
+        directory are kept.
+
+        Returns:
+            int: Number of entries removed
+        """
+        removed = len(self.entries())
+        if not os.path.isdir(self.directory):
+            return removed
+        for prefix in os.listdir(self.directory):
+            prefix_directory = os.path.join(self.directory, prefix)
+            if not re.fullmatch('[0-9a-f]{2}', prefix) or not os.path.isdir(
+                prefix_directory
+            ):
+                continue
+            for name in os.listdir(prefix_directory):
+                match = _KEY_NAME.fullmatch(name)
+                if match is None or not match.group(1).startswith(prefix):
+                    continue
+                shutil.rmtree(os.path.join(prefix_directory, name), ignore_errors=True)
+            try:
+                os.rmdir(prefix_directory)
+            except OSError:
+                pass  # Holds files the cache does not own
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
+        return removed
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add cache options to a sub-program parser."""
+    options = parser.add_argument_group('cache options')
+    options.add_argument(
+        '--cache-dir',
+        dest='cache_dir',
+        metavar='PATH',
+        help='Directory of cached files. Defaults to $RNASEEKER_CACHE_DIR or '
+        + '~/.cache/rnaseeker',
+    )
+    options.add_argument(
+        '--cache-size',
+        dest='cache_size',
+        type=int,
+        default=DEFAULT_MAX_SIZE // 1024 // 1024,
+        help='Maximum size of the cache in megabytes. Least recently used files '
+        + f'are removed first. Default is {DEFAULT_MAX_SIZE // 1024 // 1024}',
+    )
+    options.add_argument(
+        '--hash-inputs',
+        dest='hash_inputs',
+        action='store_true',
+        help='Recognize inputs by a hash of their contents instead of their path '
+        + 'and modification time',
+    )
+    options.add_argument(
+        '--no-cache',
+        dest='no_cache',
+        action='store_true',
+        help='Do not read or write cached files',
+    )
+
+
+def from_arguments(args: argparse.Namespace) -> Cache | None:
+    """Return Cache configured by the options added with `add_arguments', or
+    None if caching is disabled."""
+    if getattr(args, 'no_cache', False):
+        return None
+    return Cache(
+        getattr(args, 'cache_dir', None),
+        getattr(args, 'cache_size', DEFAULT_MAX_SIZE // 1024 // 1024) * 1024 * 1024,
+        getattr(args, 'hash_inputs', False),
+    )
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'cache',
+        description='List, evict, invalidate or clear files cached by '
+        + 'sub-programs such as extract-promoters and fetch-regions.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    parser.add_argument(
+        'action',
+        choices=['list', 'evict', 'invalidate', 'clear'],
+        help="`list' entries, `evict' least recently used entries down to "
+        + "--cache-size, `invalidate' entries by namespace or input file, or "
+        + "`clear' all entries",
+    )
+    parser.add_argument(
+        'inputs',
+        nargs='*',
+        help='With invalidate, remove entries derived from these files',
+    )
+    parser.add_argument(
+        '-n',
+        '--namespace',
+        help='With invalidate, remove entries of this namespace, such as '
+        + "`promoters' or `fasta-index'",
+    )
+    parser.add_argument(
+        '--cache-dir',
+        dest='cache_dir',
+        metavar='PATH',
+        help='Directory of cached files. Defaults to $RNASEEKER_CACHE_DIR or '
+        + '~/.cache/rnaseeker',
+    )
+    parser.add_argument(
+        '--cache-size',
+        dest='cache_size',
+        type=int,
+        default=DEFAULT_MAX_SIZE // 1024 // 1024,
+        help='With evict, size in megabytes to shrink the cache to. Default is '
+        + f'{DEFAULT_MAX_SIZE // 1024 // 1024}',
+    )
+
+    args = parser.parse_args(arguments)
+    cache = Cache(args.cache_dir, args.cache_size * 1024 * 1024)
+    if args.action == 'list':
+        entries = cache.entries()
+        for entry in reversed(entries):
+            used = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.last_used))
+            sys.stdout.write(
+                f'{entry.key[:12]}\t{entry.namespace}\t{entry.size}\t{used}\t'
+                + ','.join(entry.inputs)
+                + '\n'
+            )
+        sys.stderr.write(
+            f'{len(entries)} entries, {sum(entry.size for entry in entries)} bytes '
+            + f'in {cache.directory}\n'
+        )
+        return
+    if args.action == 'evict':
+        removed = cache.evict()
+    elif args.action == 'invalidate':
+        if args.namespace is None and not args.inputs:
+            parser.error(
+                "invalidate needs -n/--namespace or input files; use `clear' to "
+                + 'remove every entry'
+            )
+        removed = cache.invalidate(args.namespace, args.inputs)
+    else:
+        removed = cache.clear()
+    sys.stderr.write(f'Removed {removed} entries from {cache.directory}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Convert sequence files between fasta, fastq and Parquet."""
+from __future__ import annotations
+
+from typing import Iterator, Literal
+import argparse
+import os
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+
+Format = Literal['fasta', 'fastq', 'parquet']
+
+FORMATS = ('fasta', 'fastq', 'parquet')
+_EXTENSIONS = {
+    '.fa': 'fasta',
+    '.fasta': 'fasta',
+    '.fna': 'fasta',
+    '.fq': 'fastq',
+    '.fastq': 'fastq',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+}
+
+
+def infer_format(path: str) -> str | None:
+    """Return format implied by the extension of path, ignoring `.gz'."""
+    if path.endswith('.gz'):
+        path = path[:-3]
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def _require_quality(
+    records: Iterator[seqio.SequenceRecord],
+) -> Iterator[seqio.SequenceRecord]:
+    for record in records:
+        if record.sequence and not record.quality:
+            raise ValueError(
+                f'Record {record.name} has no quality scores to write as fastq'
+            )
+        yield record
+
+
+def convert(
+    input_path: str,
+    output_path: str,
+    input_format: Format,
+    output_format: Format,
+    line_length: int = 80,
+    min_length: int = 0,
+    batch_size: int = 65536,
+    compression: str = 'zstd',
+) -> int:
+    """Stream records from input_path to output_path, converting formats.
+
+    Memory is bounded by one batch of batch_size records for Parquet and by
+    one record otherwise. With min_length, shorter records are dropped; for
+    Parquet input the filter is pushed down to the reader, so row groups of
+    only short records are skipped unread.
+
+    Returns:
+        int: Number of records written
+    """
+    for fmt in (input_format, output_format):
+        if fmt not in FORMATS:
+            raise ValueError(
+                f'Invalid format: {fmt}. Must be one of ' + ', '.join(FORMATS)
+            )
+    if input_format == 'fasta' and output_format == 'fastq':
+        raise ValueError('fasta records have no quality scores to write as fastq')
+
+    reader: seqio.FastaReader | seqio.FastqReader | seqio.ParquetReader
+    if input_format == 'parquet':
+        filters = None
+        if min_length > 0:
+            pa = seqio.import_pyarrow()
+            filters = pa.dataset.field('length') >= min_length
+        reader = seqio.ParquetReader(input_path, batch_size, filters=filters)
+    elif input_format == 'fastq':
+        reader = seqio.FastqReader(input_path)
+    else:
+        reader = seqio.FastaReader(input_path)
+
+    writer: seqio.FastaWriter | seqio.FastqWriter | seqio.ParquetWriter
+    if output_format == 'parquet':
+        writer = seqio.ParquetWriter(output_path, batch_size, compression)
+    elif output_format == 'fastq':
+        writer = seqio.FastqWriter(output_path, append=False)
+    else:
+        writer = seqio.FastaWriter(output_path, line_length, append=False)
+
+    with reader as records_in, writer as records_out:
+        records = records_in.parse()
+        if min_length > 0 and input_format != 'parquet':
+            records = (
+                record for record in records if len(record.sequence) >= min_length
+            )
+        if output_format == 'fastq':
+            records = _require_quality(records)
+        written = 0
+        for written, record in enumerate(records, start=1):
+            records_out.write_sequence(record)
+    return written
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'convert',
+        description='Convert sequence files between fasta, fastq and Parquet. '
+        + 'Parquet support requires pyarrow.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input',
+        help="Path to input file. Fasta and fastq may be gzip-compressed. Reads "
+        + "from standard input if `-'",
+    )
+    input_options.add_argument(
+        '-f',
+        '--input-format',
+        dest='input_format',
+        choices=FORMATS,
+        help='Format of input file. Defaults to format implied by file extension',
+    )
+    input_options.add_argument(
+        '-m',
+        '--min-length',
+        dest='min_length',
+        type=int,
+        default=0,
+        help='Drop records shorter than this. Default is 0',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to output file. Writes fasta or fastq to standard out if `-'. "
+        + "Defaults to `-'",
+    )
+    output_options.add_argument(
+        '-F',
+        '--output-format',
+        dest='output_format',
+        choices=FORMATS,
+        help='Format of output file. Defaults to format implied by file extension',
+    )
+    output_options.add_argument(
+        '-l',
+        '--line-length',
+        dest='line_length',
+        type=int,
+        default=80,
+        help='Maximum line length for sequence lines in output fasta file. Give 0 '
+        + 'to place entire sequence on one line. Default is 80',
+    )
+    output_options.add_argument(
+        '-b',
+        '--batch-size',
+        dest='batch_size',
+        type=int,
+        default=65536,
+        help='Number of records per Parquet row group. Default is 65536',
+    )
+    output_options.add_argument(
+        '-c',
+        '--compression',
+        default='zstd',
+        help="Parquet compression codec. Default is `zstd'",
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    input_format = args.input_format or infer_format(args.input)
+    output_format = args.output_format or infer_format(args.output)
+    if input_format is None:
+        parser.error('Cannot infer input format; give -f/--input-format')
+    if output_format is None:
+        parser.error('Cannot infer output format; give -F/--output-format')
+    with instrumentation.instrument(args, parser.prog):
+        convert(
+            args.input,
+            args.output,
+            input_format,
+            output_format,
+            args.line_length,
+            args.min_length,
+            args.batch_size,
+            args.compression,
+        )
+
+
+if __name__ == '__main__':
+    main()
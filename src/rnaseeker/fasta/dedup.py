@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Remove duplicate reads from fasta/fastq files, keeping first occurrences."""
+from __future__ import annotations
+
+from typing import Iterable, Literal
+from array import array
+import contextlib
+import argparse
+import tempfile
+import hashlib
+import sys
+import os
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+# Records (or pairs of records) a partition buffers before writing to disk
+_FLUSH_SIZE = 1 << 16
+
+
+def sequence_key(records: tuple[seqio.SequenceRecord, ...]) -> int:
+    """Return 64-bit hash identifying the sequence of a read or read pair.
+
+    The key is a BLAKE2b digest, so it is the same in every process and run,
+    and only the integer is kept, so memory per read is independent of read
+    length. Reads with different sequences but equal keys are taken as
+    duplicates and the later one is dropped. Among n distinct reads this
+    happens with probability about n**2 / 2**65: roughly one in 3,700 for
+    100 million reads and 3% for a billion.
+    """
+    return int.from_bytes(
+        hashlib.blake2b(
+            '\n'.join(record.sequence for record in records).encode(), digest_size=8
+        ).digest(),
+        'little',
+        signed=True,
+    )
+
+
+def find_duplicates_external(
+    keys: Iterable[int], partitions: int, directory: str | None = None
+) -> tuple[int, bytearray]:
+    """Find duplicate positions in a stream of keys using bounded memory.
+
+    Record positions and keys are spilled to temporary files partitioned by
+    key, then each partition is deduplicated on its own. Memory is bounded by
+    the distinct keys in one partition plus one bit per record.
+
+    Returns:
+        tuple[int, bytearray]: Number of keys and bitmap with the bit for
+    every duplicate (not first) occurrence set
+    """
+    with tempfile.TemporaryDirectory(
+        prefix='rnaseeker-dedup-', dir=directory
+    ) as temporary:
+        paths = [os.path.join(temporary, f'partition{i}') for i in range(partitions)]
+        positions = [array('Q') for _ in range(partitions)]
+        hashes = [array('q') for _ in range(partitions)]
+
+        def flush(partition: int) -> None:
+            with open(paths[partition], 'ab') as partition_file:
+                partition_file.write(len(positions[partition]).to_bytes(8, 'little'))
+                positions[partition].tofile(partition_file)
+                hashes[partition].tofile(partition_file)
+            del positions[partition][:]
+            del hashes[partition][:]
+
+        total = 0
+        with STATS.timer('partition'):
+            for total, key in enumerate(keys, start=1):
+                partition = key % partitions
+                positions[partition].append(total - 1)
+                hashes[partition].append(key)
+                if len(positions[partition]) >= _FLUSH_SIZE:
+                    flush(partition)
+            for partition in range(partitions):
+                if positions[partition]:
+                    flush(partition)
+
+        duplicates = bytearray((total + 7) // 8)
+        with STATS.timer('deduplicate'):
+            for path in paths:
+                if not os.path.exists(path):
+                    continue
+                seen: set[int] = set()
+                with open(path, 'rb') as partition_file:
+                    while header := partition_file.read(8):
+                        length = int.from_bytes(header, 'little')
+                        block_positions = array('Q')
+                        block_positions.fromfile(partition_file, length)
+                        block_hashes = array('q')
+                        block_hashes.fromfile(partition_file, length)
+                        for position, key in zip(block_positions, block_hashes):
+                            if key in seen:
+                                duplicates[position >> 3] |= 1 << (position & 7)
+                            else:
+                                seen.add(key)
+    return total, duplicates
+
+
+def deduplicate(
+    input_paths: list[str],
+    output_paths: list[str],
+    input_format: Literal['fasta', 'fastq'] = 'fasta',
+    external: bool = False,
+    partitions: int = 64,
+    temporary_directory: str | None = None,
+    line_length: int = 80,
+) -> tuple[int, int]:
+    """Write reads from input_paths to output_paths without exact duplicates.
+
+    Give two input and output paths for paired reads; a pair is a duplicate
+    only if both mates match an earlier pair. With external, duplicates are
+    found with `find_duplicates_external' and inputs are read a second time,
+    so they must be files, not standard input.
+
+    Returns:
+        tuple[int, int]: Number of reads (or pairs) read and written
+    """
+    if input_format not in ('fasta', 'fastq'):
+        raise ValueError(
+            f"Invalid format for input file: {input_format}. Must be either 'fasta' or 'fastq'"
+        )
+    if len(input_paths) != len(output_paths):
+        raise ValueError('Give one output path for each input path')
+    if external and '-' in input_paths:
+        raise ValueError(
+            'External mode reads input twice and cannot read standard input'
+        )
+    writer_type = seqio.FastaWriter if input_format == 'fasta' else seqio.FastqWriter
+
+    is_duplicate: Iterable[bool] | None = None
+    if external:
+        with seqio.open_reads(input_paths, input_format) as records:
+            total, bitmap = find_duplicates_external(
+                map(sequence_key, records), partitions, temporary_directory
+            )
+        is_duplicate = (
+            bool(bitmap[position >> 3] & (1 << (position & 7)))
+            for position in range(total)
+        )
+
+    written = 0
+    read = 0
+    with contextlib.ExitStack() as stack:
+        records = stack.enter_context(seqio.open_reads(input_paths, input_format))
+        writers = [
+            stack.enter_context(writer_type(path, line_length, append=False))
+            for path in output_paths
+        ]
+        if is_duplicate is None:
+            seen: set[int] = set()
+            for read, pair in enumerate(records, start=1):
+                key = sequence_key(pair)
+                if key in seen:
+                    continue
+                seen.add(key)
+                for writer, record in zip(writers, pair):
+                    writer.write_sequence(record)
+                written += 1
+        else:
+            for read, (pair, duplicate) in enumerate(
+                zip(records, is_duplicate), start=1
+            ):
+                if duplicate:
+                    continue
+                for writer, record in zip(writers, pair):
+                    writer.write_sequence(record)
+                written += 1
+    STATS.count('duplicates', read - written)
+    return read, written
+
+
+def main(
+    arguments: list[str] | None = None,
+    input_format: Literal['fasta', 'fastq'] = 'fasta',
+) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        f'{input_format}-dedup',
+        description=f'Remove exact duplicate reads from {input_format} files, '
+        + 'keeping the first occurrence.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input',
+        help=f"Path to {input_format} file. Reads from standard input if `-'",
+    )
+    if input_format == 'fastq':
+        input_options.add_argument(
+            '-2',
+            '--input2',
+            help='Path to fastq file with second mates. Pairs are deduplicated '
+            + 'on both mates together',
+        )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help=f"Path to output {input_format} file. Writes to standard out if `-'. "
+        + "Defaults to `-'",
+    )
+    if input_format == 'fastq':
+        output_options.add_argument(
+            '-O',
+            '--output2',
+            help='Path to output fastq file for second mates. Required with -2',
+        )
+    else:
+        output_options.add_argument(
+            '-l',
+            '--line-length',
+            dest='line_length',
+            type=int,
+            default=80,
+            help='Maximum line length for sequence lines in output fasta file. Give 0 '
+            + 'to place entire sequence on one line. Default is 80',
+        )
+    memory_options = parser.add_argument_group('memory options')
+    memory_options.add_argument(
+        '-x',
+        '--external',
+        action='store_true',
+        help='Find duplicates by partitioning read hashes to temporary files. '
+        + 'Memory is bounded by one partition; input is read twice',
+    )
+    memory_options.add_argument(
+        '-p',
+        '--partitions',
+        type=int,
+        default=64,
+        help='Number of partitions for --external. Default is 64',
+    )
+    memory_options.add_argument(
+        '-T',
+        '--temporary-directory',
+        dest='temporary_directory',
+        help='Directory for --external partitions. Defaults to system temporary '
+        + 'directory',
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    input_paths = [args.input]
+    output_paths = [args.output]
+    if getattr(args, 'input2', None) is not None:
+        if args.output2 is None:
+            parser.error('-O/--output2 is required with -2/--input2')
+        input_paths.append(args.input2)
+        output_paths.append(args.output2)
+    with instrumentation.instrument(args, parser.prog):
+        read, written = deduplicate(
+            input_paths,
+            output_paths,
+            input_format,
+            args.external,
+            args.partitions,
+            args.temporary_directory,
+            getattr(args, 'line_length', 80),
+        )
+    sys.stderr.write(
+        f'Kept {written} of {read} reads; removed {read - written} duplicates\n'
+    )
+
+
+def fasta_main(arguments: list[str] | None = None) -> None:
+    """Run fasta-dedup."""
+    main(arguments, 'fasta')
+
+
+def fastq_main(arguments: list[str] | None = None) -> None:
+    """Run fastq-dedup."""
+    main(arguments, 'fastq')
+
+
+if __name__ == '__main__':
+    main()
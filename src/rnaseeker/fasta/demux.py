@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""Demultiplex fastq reads into per-sample files by inline or header barcodes."""
+from __future__ import annotations
+
+from typing import Literal
+from collections import Counter
+import argparse
+import sys
+import os
+import re
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+BarcodeLocation = Literal['inline', 'header']
+
+UNASSIGNED = 'unassigned'
+
+_BASES = 'ACGTN'
+_BARCODE = re.compile(r'[ACGTN]+(\+[ACGTN]+)?')
+
+
+def read_samples(sample_path: str) -> dict[str, str]:
+    """Read a sample sheet of sample names and barcodes, one pair per line,
+    separated by a tab or comma. Dual barcodes are joined by `+' or `-'.
+    Blank lines, `#' comments and a header line are skipped.
+
+    Returns:
+        dict[str, str]: Barcode of each sample, upper case, with dual
+    barcodes joined by `+'
+
+    Raises:
+        ValueError: Line is malformed, or a sample is named twice
+    """
+    samples: dict[str, str] = {}
+    first_line = True
+    with open(sample_path, 'r', encoding='UTF-8') as sample_file:
+        for line_number, line in enumerate(sample_file, start=1):
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = [field.strip() for field in re.split(r'[\t,]', line.rstrip())]
+            barcode = fields[-1].upper().replace('-', '+')
+            is_header, first_line = first_line and len(fields) >= 2, False
+            if len(fields) < 2 or not _BARCODE.fullmatch(barcode):
+                if is_header:
+                    continue
+                raise ValueError(
+                    f'Invalid sample sheet line {line_number} in {sample_path}: '
+                    + line.rstrip()
+                )
+            sample = fields[0]
+            if sample in samples or sample == UNASSIGNED:
+                raise ValueError(f'Sample name {sample} is given twice or reserved')
+            samples[sample] = barcode
+    return samples
+
+
+def barcode_table(
+    samples: dict[str, str], mismatches: int = 1
+) -> tuple[dict[str, str], set[str]]:
+    """Map every sequence within mismatches (0 or 1) substitutions of a
+    sample's barcode to that sample, so a read is assigned with one lookup.
+
+    Exact barcodes always map to their own sample. A one-mismatch variant
+    shared by the barcodes of two samples is left out, since the read could
+    belong to either.
+
+    Returns:
+        tuple[dict[str, str], set[str]]: Sample of each barcode sequence and
+    the ambiguous variants left out
+
+    Raises:
+        ValueError: Two samples have the same barcode
+    """
+    if mismatches not in (0, 1):
+        raise ValueError('mismatches must be 0 or 1')
+    table: dict[str, str] = {}
+    for sample, barcode in samples.items():
+        if barcode in table:
+            raise ValueError(
+                f'Samples {table[barcode]} and {sample} have the same barcode {barcode}'
+            )
+        table[barcode] = sample
+    ambiguous: set[str] = set()
+    if mismatches == 0:
+        return table, ambiguous
+    exact = set(table)
+    for sample, barcode in samples.items():
+        for position, base in enumerate(barcode):
+            if base == '+':
+                continue
+            for substitute in _BASES:
+                if substitute == base:
+                    continue
+                variant = barcode[:position] + substitute + barcode[position + 1 :]
+                if variant in exact or variant in ambiguous:
+                    continue
+                if table.setdefault(variant, sample) != sample:
+                    del table[variant]
+                    ambiguous.add(variant)
+    return table, ambiguous
+
+
+def header_barcode(description: str) -> str:
+    """Return barcode from a fastq header, taken from the last field of an
+    Illumina comment (`@name 1:N:0:ACGT+TTGA') or from after `#' in an older
+    read name (`@name#ACGT/1'). Returns an empty string if there is none."""
+    fields = description.split(None, 2)
+    if len(fields) > 1:
+        return fields[1].rpartition(':')[2].upper()
+    _, hash_mark, barcode = fields[0].partition('#')
+    if hash_mark:
+        return barcode.partition('/')[0].upper()
+    return ''
+
+
+def output_paths(
+    directory: str, prefix: str, sample: str, extension: str, paired: bool
+) -> tuple[str, ...]:
+    """Return output path of a sample, or of each mate if paired."""
+    if paired:
+        return tuple(
+            os.path.join(directory, f'{prefix}{sample}_R{mate}.{extension}')
+            for mate in (1, 2)
+        )
+    return (os.path.join(directory, f'{prefix}{sample}.{extension}'),)
+
+
+def demultiplex(
+    input_paths: list[str],
+    samples: dict[str, str],
+    directory: str = '.',
+    location: BarcodeLocation = 'inline',
+    mismatches: int = 1,
+    keep_barcode: bool = False,
+    prefix: str = '',
+    extension: str = 'fq',
+    max_open: int = 64,
+    buffer_size: int = 64 * 1024,
+    memory: int = 256 * 1024 * 1024,
+    prefetch: bool = False,
+) -> tuple[Counter[str], int]:
+    """Write each read, or read pair, of input_paths to the fastq file of
+    the sample whose barcode it carries.
+
+    Inline barcodes are the first bases of the read (of the first mate if
+    paired) and are trimmed from it unless keep_barcode. Header barcodes are
+    read from the fastq header of the first mate. A barcode matches a sample
+    exactly or, with mismatches, with one substitution; reads that match no
+    sample, or two samples equally well, go to the `unassigned' file. Files
+    are written through a WriterPool holding at most max_open files open.
+
+    Returns:
+        tuple[Counter[str], int]: Reads (or pairs) written for each sample
+    and number assigned with a mismatch
+
+    Raises:
+        ValueError: Inline barcodes have different lengths
+    """
+    if location not in ('inline', 'header'):
+        raise ValueError(
+            f'Invalid barcode location: {location}. Must be either inline or header'
+        )
+    if not samples:
+        raise ValueError('Give at least one sample')
+    lengths = {len(barcode) for barcode in samples.values()}
+    if location == 'inline':
+        if len(lengths) > 1 or any('+' in barcode for barcode in samples.values()):
+            raise ValueError('Inline barcodes must be single and of equal length')
+    barcode_length = lengths.pop()
+    table, ambiguous = barcode_table(samples, mismatches)
+    STATS.count('ambiguous_barcodes', len(ambiguous))
+    paired = len(input_paths) == 2
+    paths = {
+        sample: output_paths(directory, prefix, sample, extension, paired)
+        for sample in [*samples, UNASSIGNED]
+    }
+    counts: Counter[str] = Counter()
+    corrected = 0
+    os.makedirs(directory, exist_ok=True)
+    with STATS.timer('demultiplex'), seqio.open_reads(
+        input_paths, 'fastq', prefetch
+    ) as reads, seqio.WriterPool(
+        'fastq', max_open, buffer_size, memory
+    ) as pool:
+        write = pool.write_sequence
+        for reads_in in reads:
+            first = reads_in[0]
+            if location == 'inline':
+                barcode = first.sequence[:barcode_length]
+            else:
+                barcode = header_barcode(first.description)
+            sample = table.get(barcode)
+            if sample is None:
+                sample = UNASSIGNED
+            else:
+                if barcode != samples[sample]:
+                    corrected += 1
+                if location == 'inline' and not keep_barcode:
+                    first.sequence = first.sequence[barcode_length:]
+                    first.quality = first.quality[barcode_length:]
+            counts[sample] += 1
+            for path, record in zip(paths[sample], reads_in):
+                write(path, record)
+    STATS.count('corrected_barcodes', corrected)
+    return counts, corrected
+
+
+def write_report(
+    report_path: str, samples: dict[str, str], counts: Counter[str]
+) -> None:
+    """Write reads assigned to each sample as a tab-separated table."""
+    total = sum(counts.values())
+    with open(report_path, 'w', encoding='UTF-8') as report_file:
+        report_file.write('sample\tbarcode\treads\tpercent\n')
+        for sample, barcode in [*samples.items(), (UNASSIGNED, '')]:
+            percent = 100 * counts[sample] / total if total else 0.0
+            report_file.write(f'{sample}\t{barcode}\t{counts[sample]}\t{percent:.2f}\n')
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'demux',
+        description='Demultiplex fastq reads, or read pairs, into per-sample files '
+        + 'by inline or header barcodes, allowing one mismatch.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input',
+        help="Path to fastq file, optionally gzip-compressed. Reads from standard "
+        + "input if `-'",
+    )
+    input_options.add_argument(
+        '-2',
+        '--input2',
+        help='Path to fastq file with second mates. Barcodes are read from the '
+        + 'first mate and pairs are written together',
+    )
+    input_options.add_argument(
+        '-s',
+        '--samples',
+        required=True,
+        help='Path to sample sheet with a sample name and barcode on each line, '
+        + "separated by a tab or comma. Join dual barcodes with `+'",
+    )
+    input_options.add_argument(
+        '--prefetch',
+        action='store_true',
+        help='Read paired fastq files in background threads',
+    )
+    barcode_options = parser.add_argument_group('barcode options')
+    barcode_options.add_argument(
+        '-b',
+        '--barcode-location',
+        dest='location',
+        choices=['inline', 'header'],
+        default='inline',
+        help='Read barcodes from the start of each read or from the fastq header. '
+        + 'Default is inline',
+    )
+    barcode_options.add_argument(
+        '-m',
+        '--mismatches',
+        type=int,
+        choices=[0, 1],
+        default=1,
+        help='Number of mismatches allowed in barcodes. Default is 1',
+    )
+    barcode_options.add_argument(
+        '-k',
+        '--keep-barcode',
+        dest='keep_barcode',
+        action='store_true',
+        help='Do not trim inline barcodes from reads',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-d',
+        '--directory',
+        default='.',
+        help="Directory to place sample files in. Default is `.' (current "
+        + 'working directory)',
+    )
+    output_options.add_argument(
+        '-p',
+        '--prefix',
+        default='',
+        help='Prefix of sample file names. Defaults to no prefix',
+    )
+    output_options.add_argument(
+        '-e',
+        '--extension',
+        default='fq',
+        help="File extension to use. Default is `fq'",
+    )
+    output_options.add_argument(
+        '-r',
+        '--report',
+        help='Path to write a table of reads assigned to each sample',
+    )
+    memory_options = parser.add_argument_group('memory options')
+    memory_options.add_argument(
+        '--max-open',
+        dest='max_open',
+        type=int,
+        default=64,
+        help='Maximum number of output files open at once. Default is 64',
+    )
+    memory_options.add_argument(
+        '--buffer-size',
+        dest='buffer_size',
+        type=int,
+        default=64,
+        help='Kilobytes of reads buffered for each output file. Default is 64',
+    )
+    memory_options.add_argument(
+        '-M',
+        '--memory',
+        type=int,
+        default=256,
+        help='Megabytes of reads buffered for all output files. Default is 256',
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    input_paths = [args.input]
+    if args.input2 is not None:
+        input_paths.append(args.input2)
+    with instrumentation.instrument(args, parser.prog):
+        samples = read_samples(args.samples)
+        counts, corrected = demultiplex(
+            input_paths,
+            samples,
+            args.directory,
+            args.location,
+            args.mismatches,
+            args.keep_barcode,
+            args.prefix,
+            args.extension,
+            args.max_open,
+            args.buffer_size * 1024,
+            args.memory * 1024 * 1024,
+            args.prefetch,
+        )
+        if args.report is not None:
+            write_report(args.report, samples, counts)
+    total = sum(counts.values())
+    assigned = total - counts[UNASSIGNED]
+    sys.stderr.write(
+        f'Assigned {assigned} of {total} reads to {len(samples)} samples '
+        + f'({corrected} with one mismatch)\n'
+    )
+
+
+if __name__ == '__main__':
+    main()
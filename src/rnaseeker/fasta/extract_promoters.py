@@ -7,6 +7,9 @@ import csv
 import os
 import re
 
+from rnaseeker import instrumentation, cache
+from rnaseeker.instrumentation import STATS
+
 
 def gff_to_bed(gff_path: str, out_path: str):
     with (
@@ -34,39 +37,45 @@ def extract_gene_info(gff_path: str, out_path: str):
         )
 
 
-def extract_promoters(gff_path: str, fasta_path: str, length: int, out_directory: str):
+def _gene_files(gff_path: str, directory: str):
     stderr.write('Extracting gene info...\n')
-    extract_gene_info(gff_path, f'{out_directory}/genes.gff')
+    with STATS.timer('extract_gene_info'):
+        extract_gene_info(gff_path, f'{directory}/genes.gff')
     stderr.write('Converting gff to bed...\n')
-    gff_to_bed(f'{out_directory}/genes.gff', f'{out_directory}/genes.bed')
+    with STATS.timer('gff_to_bed'):
+        gff_to_bed(f'{directory}/genes.gff', f'{directory}/genes.bed')
+
 
+def _index_files(fasta_path: str, directory: str):
     # Make index for fasta file
     stderr.write('Making index of fasta file...\n')
-    fasta_name = fasta_path.split('/')[-1]
-    subprocess.run(
-        f'samtools faidx --fai-idx {out_directory}/{fasta_name}.fai {fasta_path}'.split(),
-        check=True,
-    )
+    with STATS.timer('faidx'):
+        subprocess.run(
+            f'samtools faidx --fai-idx {directory}/sequences.fai {fasta_path}'.split(),
+            check=True,
+        )
 
     # Make table with chromosome sizes
     stderr.write('Creating table of chromosome sizes...\n')
     with (
-        open(f'{out_directory}/{fasta_name}.fai', 'r', encoding='UTF-8') as index_file,
-        open(f'{out_directory}/sizes.chr', 'w', encoding='UTF-8') as out_file,
+        open(f'{directory}/sequences.fai', 'r', encoding='UTF-8') as index_file,
+        open(f'{directory}/sizes.chr', 'w', encoding='UTF-8') as out_file,
     ):
         for line in index_file:
             out_file.write('\t'.join(line.split('\t')[:2]) + '\n')
 
+
+def _promoter_files(fasta_path: str, length: int, in_directory: str, directory: str):
     # Make bed file containing location of promoters
     stderr.write('Creating bed file containing location of promoters...\n')
-    with open(
-        f'{out_directory}/promoters.bed', 'w', encoding='UTF-8'
+    with STATS.timer('flank'), open(
+        f'{directory}/promoters.bed', 'w', encoding='UTF-8'
     ) as promoter_bed_file:
         promoter_bed_file.write(
             subprocess.run(
                 (
-                    f'bedtools flank -i {out_directory}/genes.bed -g {out_directory}/sizes.chr '
-                    + f'-l {length} -r 0 -s'
+                    f'bedtools flank -i {in_directory}/genes.bed '
+                    + f'-g {in_directory}/sizes.chr -l {length} -r 0 -s'
                 ).split(),
                 check=True,
                 capture_output=True,
@@ -76,13 +85,71 @@ def extract_promoters(gff_path: str, fasta_path: str, length: int, out_directory
 
     # Extract promoter regions from fasta file
     stderr.write('Extracting promoter regions from fasta file...\n')
-    subprocess.run(
-        (
-            f'bedtools getfasta -s -fi {fasta_path} -bed {out_directory}/promoters.bed '
-            + f'-fo {out_directory}/promoters.fa -name'
-        ).split(),
-        check=True,
-    )
+    with STATS.timer('getfasta'):
+        subprocess.run(
+            (
+                f'bedtools getfasta -s -fi {fasta_path} -bed {directory}/promoters.bed '
+                + f'-fo {directory}/promoters.fa -name'
+            ).split(),
+            check=True,
+        )
+
+
+def extract_promoters(
+    gff_path: str,
+    fasta_path: str,
+    length: int,
+    out_directory: str,
+    file_cache: cache.Cache | None = None,
+):
+    """Write genes.gff, genes.bed, the fasta index, sizes.chr, promoters.bed
+    and promoters.fa to out_directory.
+
+    With file_cache, gene files are reused for the same gff file, index files
+    for the same fasta file, and promoter files for the same gff and fasta
+    files and length, so a repeat run only copies files out of the cache.
+    """
+    STATS.count('bytes_read', os.path.getsize(gff_path) + os.path.getsize(fasta_path))
+    fasta_name = fasta_path.split('/')[-1]
+    gene_files = {
+        name: f'{out_directory}/{name}' for name in ('genes.gff', 'genes.bed')
+    }
+    index_files = {
+        'sequences.fai': f'{out_directory}/{fasta_name}.fai',
+        'sizes.chr': f'{out_directory}/sizes.chr',
+    }
+    promoter_files = {
+        name: f'{out_directory}/{name}' for name in ('promoters.bed', 'promoters.fa')
+    }
+    if file_cache is None:
+        _gene_files(gff_path, out_directory)
+        _index_files(fasta_path, out_directory)
+        os.replace(f'{out_directory}/sequences.fai', index_files['sequences.fai'])
+        _promoter_files(fasta_path, length, out_directory, out_directory)
+    else:
+        file_cache.fetch(
+            'genes',
+            [gff_path],
+            {},
+            lambda directory: _gene_files(gff_path, directory),
+            gene_files,
+        )
+        file_cache.fetch(
+            'fasta-index',
+            [fasta_path],
+            {},
+            lambda directory: _index_files(fasta_path, directory),
+            index_files,
+        )
+        file_cache.fetch(
+            'promoters',
+            [gff_path, fasta_path],
+            {'length': length},
+            lambda directory: _promoter_files(
+                fasta_path, length, out_directory, directory
+            ),
+            promoter_files,
+        )
     if os.path.isfile(f'{fasta_name}.fai'):
         os.remove(f'{fasta_name}.fai')
 
@@ -93,6 +160,8 @@ def extract_promoters(gff_path: str, fasta_path: str, length: int, out_directory
             if line.startswith('>'):
                 sequence_count += 1
         stderr.write(f'Found {sequence_count} promoters\n')
+    STATS.count('bytes_written', os.path.getsize(f'{out_directory}/promoters.fa'))
+    STATS.count('records_out', sequence_count)
 
 
 def main(arguments: list[str] | None = None):
@@ -132,6 +201,8 @@ def main(arguments: list[str] | None = None):
         default='.',
         help='Directory to place output files in. Defaults to current directory',
     )
+    cache.add_arguments(parser)
+    instrumentation.add_arguments(parser)
 
     args = parser.parse_args(arguments)
     if shutil.which('samtools') is None:
@@ -148,9 +219,14 @@ def main(arguments: list[str] | None = None):
     if not os.path.isdir(directory):
         os.mkdir(directory)
 
-    extract_promoters(
-        args.gff_file, args.fasta_file, args.promoter_length, args.directory
-    )
+    with instrumentation.instrument(args, parser.prog):
+        extract_promoters(
+            args.gff_file,
+            args.fasta_file,
+            args.promoter_length,
+            args.directory,
+            cache.from_arguments(args),
+        )
 
 
 if __name__ == '__main__':
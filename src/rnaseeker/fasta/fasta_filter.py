@@ -5,31 +5,68 @@ import argparse
 
 from rnaseeker.sequence import sequence_io as seqio
 from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+
+def is_good(sequence: seqio.SequenceRecord, minimum_basepairs: int) -> bool:
+    """Return whether sequence has at least minimum_basepairs bases and at most
+    that many 'N' bases."""
+    return len(sequence.sequence) >= minimum_basepairs >= sequence.sequence.count('N')
 
 
 def filter_fasta(
     input_path: str, output_path: str, minimum_basepairs: int, line_length: int
 ) -> None:
     """Filter fasta sequences by length and 'N' content and write to fasta file."""
-    fasta_reader = seqio.FastaReader(input_path)
-    with fasta_reader as fasta_in:
-        good_sequences: list[seqio.SequenceRecord] = []
-        for sequence in fasta_in.parse():
-            if (
-                len(sequence.sequence)
-                >= minimum_basepairs
-                >= sequence.sequence.count('N')
-            ):
-                good_sequences.append(sequence)
-    fasta_writer = seqio.FastaWriter(output_path, line_length)
-    with fasta_writer as fasta_out:
-        fasta_out.write_sequences(good_sequences)
+    keep = STATS.timed('predicate', is_good)
+    with seqio.FastaReader(input_path) as fasta_in, seqio.FastaWriter(
+        output_path, line_length
+    ) as fasta_out:
+        fasta_out.write_sequences(
+            sequence
+            for sequence in fasta_in.parse()
+            if keep(sequence, minimum_basepairs)
+        )
+
+
+def filter_fastq(
+    input_paths: list[str],
+    output_paths: list[str],
+    minimum_basepairs: int,
+    prefetch: bool = False,
+) -> None:
+    """Filter fastq reads by length and 'N' content and write to fastq file.
+
+    Give two input and output paths for paired reads; a pair is kept only if
+    both mates pass, so output files stay in step.
+    """
+    keep = STATS.timed('predicate', is_good)
+    if len(input_paths) == 1:
+        with seqio.FastqReader(input_paths[0]) as fastq_in, seqio.FastqWriter(
+            output_paths[0]
+        ) as fastq_out:
+            fastq_out.write_sequences(
+                sequence
+                for sequence in fastq_in.parse()
+                if keep(sequence, minimum_basepairs)
+            )
+        return
+    with seqio.PairedFastqReader(
+        *input_paths, prefetch=prefetch
+    ) as pairs_in, seqio.PairedFastqWriter(*output_paths) as pairs_out:
+        pairs_out.write_sequences(
+            pair
+            for pair in pairs_in.parse()
+            if keep(pair[0], minimum_basepairs) and keep(pair[1], minimum_basepairs)
+        )
 
 
 def main(arguments: list[str] | None = None):
     """Parse arguments and call function."""
     parser = argparse.ArgumentParser(
-        'fasta-filter', description="Filter fasta sequences by length and 'N' content"
+        'fasta-filter',
+        description="Filter fasta sequences or fastq reads by length and 'N' content",
     )
     parser.add_argument(
         '-v',
@@ -38,7 +75,7 @@ def main(arguments: list[str] | None = None):
         version=f'rnaseeker: {parser.prog} {__version__}',
     )
     parser.add_argument(
-        'fasta_path', help="Path to fasta file. Reads from standard in if `-'"
+        'fasta_path', help="Path to fasta or fastq file. Reads from standard in if `-'"
     )
     parser.add_argument(
         'minimum_basepairs',
@@ -50,9 +87,33 @@ def main(arguments: list[str] | None = None):
         '--output',
         dest='out_path',
         default='-',
-        help="Path to output fasta file. Writes to standard out if `-'. "
+        help="Path to output fasta or fastq file. Writes to standard out if `-'. "
         + "Defaults to `-'.",
     )
+    parser.add_argument(
+        '-f',
+        '--input-format',
+        dest='input_format',
+        choices=['fasta', 'fastq'],
+        default='fasta',
+        help='Format of input file. Default is fasta',
+    )
+    parser.add_argument(
+        '-2',
+        '--input2',
+        help='Path to fastq file with second mates. A pair is kept only if both '
+        + 'mates pass. Requires -f fastq',
+    )
+    parser.add_argument(
+        '-O',
+        '--output2',
+        help='Path to output fastq file for second mates. Required with -2',
+    )
+    parser.add_argument(
+        '--prefetch',
+        action='store_true',
+        help='Read paired fastq files ahead in background threads',
+    )
     parser.add_argument(
         '-l',
         '--line-length',
@@ -62,11 +123,28 @@ def main(arguments: list[str] | None = None):
         help='Maximum line length for sequence lines in output fasta file. Give 0 '
         + 'to place entire sequence on one line. Default is 80',
     )
+    instrumentation.add_arguments(parser)
 
     args = parser.parse_args(arguments)
-    filter_fasta(
-        args.fasta_path, args.out_path, args.minimum_basepairs, args.line_length
-    )
+    if args.input2 is not None:
+        if args.input_format != 'fastq':
+            parser.error('-2/--input2 requires -f fastq')
+        if args.output2 is None:
+            parser.error('-O/--output2 is required with -2/--input2')
+    with instrumentation.instrument(args, parser.prog):
+        if args.input_format == 'fastq':
+            input_paths = [args.fasta_path]
+            output_paths = [args.out_path]
+            if args.input2 is not None:
+                input_paths.append(args.input2)
+                output_paths.append(args.output2)
+            filter_fastq(
+                input_paths, output_paths, args.minimum_basepairs, args.prefetch
+            )
+        else:
+            filter_fasta(
+                args.fasta_path, args.out_path, args.minimum_basepairs, args.line_length
+            )
 
 
 if __name__ == '__main__':
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-from typing import Literal
+from typing import Any, Literal
 import argparse
 import sys
 import os
@@ -8,6 +8,8 @@ import re
 
 from rnaseeker.sequence import sequence_io as seqio
 from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
 
 
 def get_io_types(
@@ -44,6 +46,14 @@ def get_file_prefix(prefix: str, input_path: str) -> str:
     return prefix
 
 
+def get_out_paths(
+    directory: str, file_prefix: str, extension: str, paired: bool
+) -> list[str]:
+    if paired:
+        return [f'{directory}/{file_prefix}_R{mate}.{extension}' for mate in (1, 2)]
+    return [f'{directory}/{file_prefix}.{extension}']
+
+
 def split_file(
     split_number: int,
     input_path: str = '-',
@@ -53,12 +63,18 @@ def split_file(
     prefix: str = 'split-',
     header_regex: str | None = None,
     extension: str | None = None,
+    input_path2: str | None = None,
+    prefetch: bool = False,
 ) -> None:
-    """Split sequence file."""
+    """Split sequence file. Give input_path2 to split paired fastq files into
+    matching R1 and R2 files."""
     if header_regex is not None:
         assert (
             is_sequence_number and split_number == 1
         ), "Cannot use header regular expression if '-s' is not provided and split number is not 1"
+    paired = input_path2 is not None
+    if paired:
+        assert input_format == 'fastq', 'Paired input is only supported for fastq'
     directory = directory.rstrip('/')
     if not os.path.isdir(directory):
         os.mkdir(directory)
@@ -67,8 +83,16 @@ def split_file(
     if extension is None:
         extension = {seqio.FastaReader: 'fa', seqio.FastqReader: 'fq'}[reader_type]
     extension = extension.lstrip('.')
-    with reader_type(input_path, encoding='') as file_reader:
-        file_reader.reader.set_sequence_count()
+    if paired:
+        file_reader: Any = seqio.PairedFastqReader(
+            input_path, input_path2, prefetch=prefetch  # type: ignore
+        )
+        writer_type = seqio.PairedFastqWriter  # type: ignore
+    else:
+        file_reader = reader_type(input_path)
+    with file_reader:
+        with STATS.timer('count'):
+            file_reader.reader.set_sequence_count()
         if is_sequence_number:
             # Hacky ceiling division
             total_files = -(file_reader.reader.sequence_count // -split_number)
@@ -89,31 +113,39 @@ def split_file(
         seqs_in_this_file = sequences_quotient + (sequences_remainder > 0)
         sequences_remainder -= 1
         file_prefix = get_file_prefix(prefix, input_path)
-        to_write: list[seqio.SequenceRecord] = []
+
+        def write_split(to_write: list) -> None:
+            if header_regex is not None:
+                out_paths = get_out_paths(
+                    directory,
+                    get_header_prefix(
+                        header_regex, to_write[0][0] if paired else to_write[0]
+                    ),
+                    extension,  # type: ignore
+                    paired,
+                )
+            else:
+                out_paths = get_out_paths(
+                    directory,
+                    f'{file_prefix}{split_file_count:0{digits}d}',
+                    extension,  # type: ignore
+                    paired,
+                )
+            with writer_type(*out_paths) as file_writer:  # type: ignore
+                file_writer.write_sequences(to_write)
+
+        to_write: list = []
         for sequence in file_reader.parse():
             if len(to_write) < seqs_in_this_file:
                 to_write.append(sequence)
             else:
-                if header_regex is not None:
-                    file_prefix = get_header_prefix(header_regex, sequence)
-                    out_path = f'{directory}/{file_prefix}.{extension}'
-                else:
-                    out_path = f'{directory}/{file_prefix}{split_file_count:0{digits}d}.{extension}'
-                with writer_type(out_path) as file_writer:
-                    file_writer.write_sequences(to_write)
+                write_split(to_write)
                 seqs_in_this_file = sequences_quotient + (sequences_remainder > 0)
                 sequences_remainder -= 1
                 to_write = [sequence]
                 split_file_count += 1
-        # TODO: refactor so don't have to repeat this
         if to_write:
-            if header_regex is not None:
-                file_prefix = get_header_prefix(header_regex, to_write[0])
-                out_path = f'{directory}/{file_prefix}.{extension}'
-            else:
-                out_path = f'{directory}/{file_prefix}{split_file_count}.fa'
-            with writer_type(out_path, 80) as file_writer:
-                file_writer.write_sequences(to_write)
+            write_split(to_write)
 
 
 def pos_non_zero_int(argument: str) -> int:
@@ -143,6 +175,17 @@ def main(arguments: list[str] | None = None) -> None:
         help="Path to fasta/fastq file. Reads from standard input if `-'. "
         + "Defaults to `-'",
     )
+    input_options.add_argument(
+        '-2',
+        '--input2',
+        help='Path to fastq file with second mates of paired reads. Pairs are kept '
+        + "together and written to matching `_R1' and `_R2' files. Requires `-f fastq'",
+    )
+    input_options.add_argument(
+        '--prefetch',
+        action='store_true',
+        help='Read ahead on each mate file in a background thread. Only used with -2',
+    )
     input_options.add_argument(
         '-f',
         '--input-format',
@@ -198,17 +241,22 @@ def main(arguments: list[str] | None = None) -> None:
         '--extension',
         help="File extension to use. Defaults to `fa' for fasta input and `fq' for fastq input",
     )
+    instrumentation.add_arguments(parser)
 
     args = parser.parse_args(arguments)
-    split_file(
-        args.number,
-        args.input,
-        args.input_format,
-        args.is_sequence_number,
-        args.directory,
-        args.prefix,
-        args.header_regex,
-    )
+    with instrumentation.instrument(args, parser.prog):
+        split_file(
+            args.number,
+            args.input,
+            args.input_format,
+            args.is_sequence_number,
+            args.directory,
+            args.prefix,
+            args.header_regex,
+            args.extension,
+            args.input2,
+            args.prefetch,
+        )
 
 
 if __name__ == '__main__':
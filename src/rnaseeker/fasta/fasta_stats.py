@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""Summarise assemblies and read sets: counts, N50/L50, length histogram,
+GC and N content, and per-position quality for fastq."""
+from __future__ import annotations
+
+from typing import Any, BinaryIO, Iterable, Literal
+from collections import Counter
+import multiprocessing
+import contextlib
+import argparse
+import json
+import math
+import sys
+import os
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+# Every byte is translated to a bit flag for its class, the result is read
+# as big integers and each class is counted with a masked popcount. That is
+# several times faster than one bytes.count pass per base. Data is read in
+# windows of a fixed size so one set of masks serves every block: a shorter
+# window's integer just has fewer bytes. Lowercase is included so
+# soft-masked assemblies report real GC content.
+_CLASSES = {
+    'gc': (1, b'GCgc'),
+    'at': (2, b'ATUatu'),
+    'n': (4, b'Nn'),
+    'eol': (8, b'\r\n'),
+}
+_CLASS_TABLE = bytearray(256)
+for _flag, _characters in _CLASSES.values():
+    for _character in _characters:
+        _CLASS_TABLE[_character] = _flag
+_CLASS_TABLE = bytes(_CLASS_TABLE)
+_WINDOW = 64 * 1024
+_CLASS_MASKS = tuple(
+    (name, int.from_bytes(bytes([flag]) * _WINDOW, 'little'))
+    for name, (flag, _) in _CLASSES.items()
+)
+_BLOCK_SIZE = 8 * 1024 * 1024
+# Transposing more reads than this at once costs more memory than it saves time
+_QUALITY_BATCH = 4096
+
+
+def count_classes(data: bytes) -> dict[str, int]:
+    """Count GC, AT, N and line ending bytes in data."""
+    counts = dict.fromkeys(_CLASSES, 0)
+    flags = memoryview(data.translate(_CLASS_TABLE))
+    for start in range(0, len(flags), _WINDOW):
+        window = int.from_bytes(flags[start : start + _WINDOW], 'little')
+        for name, mask in _CLASS_MASKS:
+            counts[name] += (window & mask).bit_count()
+    return counts
+
+
+class SequenceStats:
+    """Accumulate length, base composition and quality statistics. Instances
+    from separate parts of a file can be combined with `merge'."""
+
+    def __init__(self) -> None:
+        self.lengths: Counter[int] = Counter()
+        self.base_counts = dict.fromkeys(('gc', 'at', 'n'), 0)
+        self.quality_positions: list[Counter[int]] = []
+
+    def count_bases(self, data: bytes, sign: int = 1) -> None:
+        """Add (or with sign -1, remove) base composition of data."""
+        for name, count in count_classes(data).items():
+            if name in self.base_counts:
+                self.base_counts[name] += sign * count
+
+    def add_reads(self, sequences: list[bytes], qualities: list[bytes]) -> None:
+        """Add a batch of reads and their raw quality strings."""
+        self.lengths.update(map(len, sequences))
+        self.count_bases(b''.join(sequences))
+        for batch_start in range(0, len(qualities), _QUALITY_BATCH):
+            batch = qualities[batch_start : batch_start + _QUALITY_BATCH]
+            if len(set(map(len, batch))) == 1:
+                groups = [batch]
+            else:
+                by_length: dict[int, list[bytes]] = {}
+                for quality in batch:
+                    by_length.setdefault(len(quality), []).append(quality)
+                groups = list(by_length.values())
+            for group in groups:
+                length = len(group[0])
+                if length > len(self.quality_positions):
+                    self.quality_positions.extend(
+                        Counter() for _ in range(length - len(self.quality_positions))
+                    )
+                # zip transposes reads into per-position columns in C
+                for position, column in enumerate(zip(*group)):
+                    self.quality_positions[position].update(column)
+
+    def merge(self, other: SequenceStats) -> None:
+        """Add counts from other into this object."""
+        self.lengths.update(other.lengths)
+        for base, count in other.base_counts.items():
+            self.base_counts[base] += count
+        if len(other.quality_positions) > len(self.quality_positions):
+            self.quality_positions.extend(
+                Counter()
+                for _ in range(
+                    len(other.quality_positions) - len(self.quality_positions)
+                )
+            )
+        for position, counts in enumerate(other.quality_positions):
+            self.quality_positions[position].update(counts)
+
+    @property
+    def record_count(self) -> int:
+        return sum(self.lengths.values())
+
+    @property
+    def total_bases(self) -> int:
+        return sum(length * count for length, count in self.lengths.items())
+
+    def nx(self, fraction: float) -> tuple[int, int]:
+        """Return (Nx, Lx) for given fraction, e.g. 0.5 for N50 and L50."""
+        target = self.total_bases * fraction
+        if not target:
+            return 0, 0
+        covered = 0
+        records = 0
+        for length in sorted(self.lengths, reverse=True):
+            count = self.lengths[length]
+            if covered + length * count >= target:
+                return length, records + max(math.ceil((target - covered) / length), 1)
+            covered += length * count
+            records += count
+        return 0, 0
+
+    def histogram(self, bins: int) -> list[tuple[int, int, int]]:
+        """Return (start, end, count) for equal-width length bins. End is inclusive."""
+        if not self.lengths:
+            return []
+        minimum, maximum = min(self.lengths), max(self.lengths)
+        width = max(-((maximum - minimum + 1) // -bins), 1)
+        counts = [0] * -((maximum - minimum + 1) // -width)
+        for length, count in self.lengths.items():
+            counts[(length - minimum) // width] += count
+        return [
+            (minimum + i * width, minimum + (i + 1) * width - 1, count)
+            for i, count in enumerate(counts)
+        ]
+
+    def quality_summary(self, offset: int) -> list[dict[str, float]]:
+        """Return mean, min, quartiles and max quality for every read position."""
+        summary = []
+        for position, counts in enumerate(self.quality_positions, start=1):
+            total = sum(counts.values())
+            if not total:
+                continue
+            scores = sorted(counts)
+            quartiles = []
+            cumulative = 0
+            targets = [total * 0.25, total * 0.5, total * 0.75]
+            for score in scores:
+                cumulative += counts[score]
+                while targets and cumulative >= targets[0]:
+                    quartiles.append(score - offset)
+                    targets.pop(0)
+            summary.append(
+                {
+                    'position': position,
+                    'mean': sum(score * count for score, count in counts.items())
+                    / total
+                    - offset,
+                    'min': scores[0] - offset,
+                    'q1': quartiles[0],
+                    'median': quartiles[1],
+                    'q3': quartiles[2],
+                    'max': scores[-1] - offset,
+                }
+            )
+        return summary
+
+    def to_dict(self, bins: int = 10, offset: int = 33) -> dict[str, Any]:
+        """Return all statistics as a JSON serialisable dict."""
+        total = self.total_bases
+        records = self.record_count
+        n50, l50 = self.nx(0.5)
+        n90, l90 = self.nx(0.9)
+        result: dict[str, Any] = {
+            'records': records,
+            'total_bases': total,
+            'min_length': min(self.lengths) if self.lengths else 0,
+            'max_length': max(self.lengths) if self.lengths else 0,
+            'mean_length': total / records if records else 0,
+            'n50': n50,
+            'l50': l50,
+            'n90': n90,
+            'l90': l90,
+            'gc_percent': 100 * self.base_counts['gc'] / total if total else 0,
+            'n_percent': 100 * self.base_counts['n'] / total if total else 0,
+            'base_counts': {
+                **self.base_counts,
+                'other': total - sum(self.base_counts.values()),
+            },
+            'length_histogram': [
+                {'start': start, 'end': end, 'count': count}
+                for start, end, count in self.histogram(bins)
+            ],
+        }
+        if self.quality_positions:
+            overall: Counter[int] = Counter()
+            for counts in self.quality_positions:
+                overall.update(counts)
+            scored = sum(overall.values())
+            result['mean_quality'] = (
+                sum(score * count for score, count in overall.items()) / scored - offset
+            )
+            result['q20_percent'] = (
+                100 * sum(c for s, c in overall.items() if s - offset >= 20) / scored
+            )
+            result['q30_percent'] = (
+                100 * sum(c for s, c in overall.items() if s - offset >= 30) / scored
+            )
+            result['per_position_quality'] = self.quality_summary(offset)
+        return result
+
+
+def _blocks(stream: BinaryIO, length: int | None, block_size: int):
+    """Yield blocks of whole lines from stream, reading at most length bytes."""
+    remaining = -1 if length is None else length
+    carry = b''
+    while remaining != 0:
+        block = stream.read(block_size if remaining < 0 else min(block_size, remaining))
+        if not block:
+            break
+        if remaining > 0:
+            remaining -= len(block)
+        data = carry + block
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:  # Line longer than block; keep reading
+            carry = data
+            continue
+        carry = data[cut:]
+        yield data[:cut]
+    if carry:
+        yield carry + b'\n'
+
+
+def _scan_fasta_range(
+    stream: BinaryIO, length: int | None, block_size: int
+) -> tuple[SequenceStats, int, int | None]:
+    """Collect statistics from part of a binary fasta stream that starts and
+    ends at line boundaries. Bases are counted once per block and header
+    lines subtracted afterwards, so the work done in Python is per record,
+    not per line or base. The records cut by the range ends are left out of
+    the lengths so the caller can join them to their neighbours.
+
+    Returns:
+        tuple[SequenceStats, int, int | None]: Statistics, bases before the
+    first header, and bases of the last record, or None if the range has no
+    header
+    """
+    stats = SequenceStats()
+    leading = 0
+    record_length: int | None = None
+    for data in _blocks(stream, length, block_size):
+        index = 0
+        size = len(data)
+        headers = []
+        while index < size:
+            if data[index] == 62:  # '>'
+                if record_length is not None:
+                    stats.lengths[record_length] += 1
+                record_length = 0
+                line_end = data.index(b'\n', index) + 1
+                headers.append(data[index:line_end])
+                index = line_end
+                continue
+            header = data.find(b'\n>', index)
+            end = size if header == -1 else header + 1
+            bases = (
+                end
+                - index
+                - data.count(b'\n', index, end)
+                - data.count(b'\r', index, end)
+            )
+            if record_length is None:
+                leading += bases
+            else:
+                record_length += bases
+            index = end
+        stats.count_bases(data)
+        if headers:
+            stats.count_bases(b''.join(headers), -1)
+    return stats, leading, record_length
+
+
+def scan_fasta(
+    stream: BinaryIO, length: int | None = None, block_size: int = _BLOCK_SIZE
+) -> SequenceStats:
+    """Collect statistics from a binary fasta stream."""
+    stats, leading, last_length = _scan_fasta_range(stream, length, block_size)
+    if leading:
+        raise ValueError('File is not fasta format.')
+    if last_length is not None:
+        stats.lengths[last_length] += 1
+    return stats
+
+
+def scan_fastq(
+    stream: BinaryIO, length: int | None = None, block_size: int = _BLOCK_SIZE
+) -> SequenceStats:
+    """Collect statistics from a binary stream of four-line fastq records."""
+    stats = SequenceStats()
+    carry: list[bytes] = []
+    for data in _blocks(stream, length, block_size):
+        if b'\r' in data:
+            data = data.replace(b'\r', b'')
+        # Last element is the empty string after the final newline
+        lines = carry + data.split(b'\n')[:-1]
+        complete = len(lines) // 4 * 4
+        carry = lines[complete:]
+        lines = lines[:complete]
+        if not lines:
+            continue
+        if not lines[0].startswith(b'@'):
+            raise ValueError('File is not fastq format.')
+        stats.add_reads(lines[1::4], lines[3::4])
+    if any(carry):
+        raise ValueError('Fastq file ends with an incomplete record.')
+    return stats
+
+
+_SCANNERS = {'fasta': scan_fasta, 'fastq': scan_fastq}
+
+
+def _scan_range(task: tuple[str, int, int, str, int]) -> Any:
+    path, start, end, file_format, block_size = task
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        if file_format == 'fasta':
+            return _scan_fasta_range(stream, end - start, block_size)
+        return scan_fastq(stream, end - start, block_size)
+
+
+def line_offsets(path: str, chunk_size: int) -> list[tuple[int, int]]:
+    """Split a file into byte ranges of roughly chunk_size bytes that each
+    start at a line. Only the bytes up to the next line end are read for
+    each cut, unlike `seqio.chunk_offsets', which reads to the next record.
+
+    Returns:
+        list[tuple[int, int]]: (start, end) byte offsets covering the file
+    """
+    size = os.path.getsize(path)
+    starts = [0]
+    with open(path, 'rb') as stream:
+        offset = chunk_size
+        while offset < size:
+            # Step back one byte so a line starting exactly at offset is kept
+            stream.seek(offset - 1)
+            start = offset - 1
+            while block := stream.read(64 * 1024):
+                newline = block.find(b'\n')
+                if newline >= 0:
+                    start += newline + 1
+                    break
+                start += len(block)
+            if start >= size:
+                break
+            starts.append(start)
+            offset = start + chunk_size
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _join_fasta_ranges(
+    parts: Iterable[tuple[SequenceStats, int, int | None]]
+) -> SequenceStats:
+    """Merge statistics of consecutive fasta ranges, joining the records cut
+    at each range boundary."""
+    stats = SequenceStats()
+    open_length: int | None = None
+    for partial, leading, last_length in parts:
+        stats.merge(partial)
+        if open_length is None:
+            if leading:
+                raise ValueError('File is not fasta format.')
+        else:
+            open_length += leading
+        if last_length is not None:
+            if open_length is not None:
+                stats.lengths[open_length] += 1
+            open_length = last_length
+    if open_length is not None:
+        stats.lengths[open_length] += 1
+    return stats
+
+
+def compute_stats(
+    input_path: str,
+    input_format: Literal['fasta', 'fastq'] = 'fasta',
+    threads: int = 1,
+    chunk_size: int = 64 * 1024 * 1024,
+    block_size: int = _BLOCK_SIZE,
+) -> SequenceStats:
+    """Compute statistics for a fasta/fastq file in a single streaming pass.
+
+    Files larger than chunk_size are split and scanned by `threads' worker
+    processes. Fasta files are split at any line and the records cut by a
+    split are joined afterwards, so long records are not read ahead to find
+    a split point. Standard input is always scanned serially.
+    """
+    if input_format not in _SCANNERS:
+        raise ValueError(
+            f"Invalid format for input file: {input_format}. Must be either 'fasta' or 'fastq'"
+        )
+    with STATS.timer('parse'):
+        if input_path == '-':
+            stats = _SCANNERS[input_format](
+                sys.stdin.buffer, block_size=block_size  # type: ignore
+            )
+        else:
+            STATS.count('bytes_read', os.path.getsize(input_path))
+            if input_format == 'fasta':
+                ranges = line_offsets(input_path, chunk_size)
+            else:
+                ranges = seqio.chunk_offsets(input_path, chunk_size, input_format)
+            tasks = [
+                (input_path, start, end, input_format, block_size)
+                for start, end in ranges
+            ]
+            with contextlib.ExitStack() as stack:
+                if threads <= 1 or len(tasks) == 1:
+                    parts: Iterable[Any] = map(_scan_range, tasks)
+                else:
+                    pool = stack.enter_context(
+                        multiprocessing.Pool(min(threads, len(tasks)))
+                    )
+                    # Fasta ranges are joined in file order
+                    parts = pool.imap(_scan_range, tasks)
+                if input_format == 'fasta':
+                    stats = _join_fasta_ranges(parts)
+                else:
+                    stats = SequenceStats()
+                    for partial in parts:
+                        stats.merge(partial)
+    STATS.count('records_in', stats.record_count)
+    return stats
+
+
+def format_report(name: str, input_format: str, result: dict[str, Any]) -> str:
+    """Format statistics as tab separated sections."""
+    lines = [f'file\t{name}', f'format\t{input_format}']
+    for key, value in result.items():
+        if isinstance(value, (list, dict)):
+            continue
+        if isinstance(value, float):
+            value = f'{value:.2f}'
+        lines.append(f'{key}\t{value}')
+    lines.append(
+        'base_counts\t'
+        + ','.join(f'{base}:{count}' for base, count in result['base_counts'].items())
+    )
+    lines.append('')
+    lines.append('# length histogram')
+    lines.append('start\tend\tcount')
+    for row in result['length_histogram']:
+        lines.append(f"{row['start']}\t{row['end']}\t{row['count']}")
+    if 'per_position_quality' in result:
+        lines.append('')
+        lines.append('# per-position quality')
+        lines.append('position\tmean\tmin\tq1\tmedian\tq3\tmax')
+        for row in result['per_position_quality']:
+            lines.append(
+                f"{row['position']}\t{row['mean']:.2f}\t{row['min']}\t{row['q1']}\t"
+                + f"{row['median']}\t{row['q3']}\t{row['max']}"
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'fasta-stats',
+        description='Report record counts, N50/L50, length histogram, GC and N '
+        + 'content, and per-position quality for fasta/fastq files.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input', help="Path to fasta/fastq file. Reads from standard input if `-'"
+    )
+    input_options.add_argument(
+        '-f',
+        '--input-format',
+        dest='input_format',
+        choices=['fasta', 'fastq'],
+        default='fasta',
+        help="File format of input file. Default is `fasta'",
+    )
+    input_options.add_argument(
+        '-q',
+        '--quality-encoding',
+        dest='encoding',
+        choices=['phred33', 'phred64'],
+        default='phred33',
+        help="Quality encoding of fastq input. Default is `phred33'",
+    )
+    run_options = parser.add_argument_group('run options')
+    run_options.add_argument(
+        '-t',
+        '--threads',
+        type=int,
+        default=1,
+        help='Number of worker processes for large files. Default is 1',
+    )
+    run_options.add_argument(
+        '--chunk-size',
+        dest='chunk_size',
+        type=int,
+        default=64,
+        help='Size in MB of the file sections given to each worker. Default is 64',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to output file. Writes to standard out if `-'. Defaults to `-'",
+    )
+    output_options.add_argument(
+        '-b',
+        '--bins',
+        type=int,
+        default=10,
+        help='Number of equal-width bins in length histogram. Default is 10',
+    )
+    output_options.add_argument(
+        '--json',
+        action='store_true',
+        help='Write statistics as JSON instead of tab separated text',
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    with instrumentation.instrument(args, parser.prog):
+        stats = compute_stats(
+            args.input,
+            args.input_format,
+            args.threads,
+            args.chunk_size * 1024 * 1024,
+        )
+        result = stats.to_dict(
+            args.bins, {'phred33': 33, 'phred64': 64}[args.encoding]
+        )
+        if args.json:
+            report = json.dumps(
+                {'file': args.input, 'format': args.input_format, **result}, indent=2
+            ) + '\n'
+        else:
+            report = format_report(args.input, args.input_format, result)
+        if args.output == '-':
+            sys.stdout.write(report)
+        else:
+            with open(args.output, 'w', encoding='UTF-8') as out_file:
+                out_file.write(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""Fetch sequences of BED regions from an indexed fasta file."""
+from __future__ import annotations
+
+from typing import Iterable, Iterator, NamedTuple
+from operator import attrgetter
+import multiprocessing
+import contextlib
+import argparse
+import sys
+import os
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation, cache
+from rnaseeker.instrumentation import STATS
+
+
+class Region(NamedTuple):
+    """One BED interval, 0-based and end exclusive. Index is its line number
+    among the regions of the file, used to restore BED order."""
+
+    chromosome: str
+    start: int
+    end: int
+    name: str | None
+    strand: str | None
+    index: int
+
+
+# Index, header and sequence of one fetched region
+FetchedRegion = tuple[int, str, str]
+
+
+def read_bed(bed_path: str) -> Iterator[Region]:
+    """Yield regions of a BED file, skipping blank, comment, `track' and
+    `browser' lines.
+
+    Raises:
+        ValueError: Line has fewer than three columns or bad coordinates
+    """
+    with open(
+        sys.stdin.fileno() if bed_path == '-' else bed_path,
+        'r',
+        encoding='UTF-8',
+        closefd=bed_path != '-',
+    ) as bed_file:
+        index = 0
+        for line_number, line in enumerate(bed_file, start=1):
+            if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                continue
+            fields = line.rstrip('\r\n').split('\t')
+            try:
+                start, end = int(fields[1]), int(fields[2])
+            except (IndexError, ValueError):
+                raise ValueError(
+                    f'Invalid BED line {line_number} in {bed_path}: {line.rstrip()}'
+                ) from None
+            if start < 0 or end < start:
+                raise ValueError(
+                    f'Invalid coordinates on BED line {line_number} in {bed_path}: '
+                    + f'{start}-{end}'
+                )
+            yield Region(
+                fields[0],
+                start,
+                end,
+                fields[3] if len(fields) > 3 else None,
+                fields[5] if len(fields) > 5 else None,
+                index,
+            )
+            index += 1
+
+
+def merge_regions(
+    regions: Iterable[Region], gap: int = 0
+) -> Iterator[tuple[int, int, list[Region]]]:
+    """Group regions of one chromosome, sorted by start, into clusters that
+    overlap or lie at most gap bases apart.
+
+    Returns:
+        Iterator[tuple[int, int, list[Region]]]: Start, end and regions of
+    each cluster
+    """
+    cluster: list[Region] = []
+    cluster_start = cluster_end = 0
+    for region in regions:
+        if cluster and region.start > cluster_end + gap:
+            yield cluster_start, cluster_end, cluster
+            cluster = []
+        if not cluster:
+            cluster_start, cluster_end = region.start, region.end
+        cluster.append(region)
+        cluster_end = max(cluster_end, region.end)
+    if cluster:
+        yield cluster_start, cluster_end, cluster
+
+
+def region_header(region: Region, use_name: bool = True) -> str:
+    """Return header in the style of `bedtools getfasta -name -s'."""
+    header = f'{region.chromosome}:{region.start}-{region.end}'
+    if region.strand is not None:
+        header += f'({region.strand})'
+    if use_name and region.name is not None:
+        header = f'{region.name}::{header}'
+    return header
+
+
+def _fetch_chromosome(
+    task: tuple[str, str, tuple[int, int, int, int], list[Region], int, bool, bool]
+) -> tuple[list[FetchedRegion], int]:
+    """Read each cluster of regions on one chromosome with one seek and read,
+    in coordinate order, and cut the regions from it.
+
+    Returns:
+        tuple[list[FetchedRegion], int]: Fetched regions in coordinate order
+    and bytes read
+    """
+    fasta_path, chromosome, entry, regions, gap, use_name, ignore_strand = task
+    index = seqio.FastaIndex({chromosome: entry})
+    fetched: list[FetchedRegion] = []
+    bytes_read = 0
+    with STATS.suspended(), open(fasta_path, 'rb') as fasta_file:
+        for start, end, cluster in merge_regions(regions, gap):
+            sequence = index.fetch(fasta_file, chromosome, start, end)
+            first, last = index.byte_range(chromosome, start, end)
+            bytes_read += last - first
+            for region in cluster:
+                piece = sequence[region.start - start : region.end - start]
+                if ignore_strand:
+                    region = region._replace(strand=None)
+                elif region.strand == '-':
+                    piece = seqio.reverse_complement(piece)
+                fetched.append(
+                    (region.index, '>' + region_header(region, use_name), piece)
+                )
+    return fetched, bytes_read
+
+
+def _index_files(fasta_path: str, directory: str) -> None:
+    """Write fasta index and table of sequence lengths to directory, as
+    cached by extract-promoters."""
+    index = seqio.FastaIndex.build(fasta_path)
+    index.write(os.path.join(directory, 'sequences.fai'))
+    with open(os.path.join(directory, 'sizes.chr'), 'w', encoding='UTF-8') as sizes:
+        for name, (length, *_) in index.entries.items():
+            sizes.write(f'{name}\t{length}\n')
+
+
+def fetch_regions(
+    bed_path: str,
+    fasta_path: str,
+    output_path: str = '-',
+    threads: int = 1,
+    gap: int = 0,
+    use_name: bool = True,
+    ignore_strand: bool = False,
+    sort_output: bool = False,
+    index_path: str | None = None,
+    line_length: int = 0,
+    file_cache: cache.Cache | None = None,
+) -> int:
+    """Write the sequence of each BED region in fasta_path to output_path.
+
+    Regions are grouped by chromosome and sorted by start, and regions that
+    overlap, or lie at most gap bases apart, are read from disk together,
+    so each chromosome is read once, front to back. Chromosomes are read by
+    threads processes. Regions on the minus strand are reverse complemented
+    unless ignore_strand. Headers follow `bedtools getfasta -name -s':
+    `name::chromosome:start-end(strand)', without the name when use_name is
+    false or the BED file has no name column. Output is in BED order, or in
+    chromosome and coordinate order with sort_output, which does not hold
+    all sequences in memory. The `.fai' index is read from index_path, and
+    built there if missing. Without index_path it is read from file_cache,
+    and built there if missing, or else from fasta_path with `.fai'
+    appended. Regions on chromosomes not in the index or past the chromosome
+    end are skipped with a warning.
+
+    Returns:
+        int: Number of regions written
+    """
+    if seqio.is_gzip(fasta_path):
+        raise ValueError(
+            f'Cannot fetch regions from gzip-compressed fasta file {fasta_path}'
+        )
+    with STATS.timer('index'):
+        if index_path is None and file_cache is not None:
+            directory = file_cache.get_or_create(
+                'fasta-index',
+                [fasta_path],
+                {},
+                lambda directory: _index_files(fasta_path, directory),
+            )
+            index = seqio.FastaIndex.read(os.path.join(directory, 'sequences.fai'))
+        else:
+            index = seqio.FastaIndex.load(fasta_path, index_path)
+
+    with STATS.timer('read_bed'):
+        by_chromosome: dict[str, list[Region]] = {}
+        total = 0
+        for total, region in enumerate(read_bed(bed_path), start=1):
+            entry = index.entries.get(region.chromosome)
+            if entry is None:
+                sys.stderr.write(
+                    f'WARNING. chromosome ({region.chromosome}) was not found in '
+                    + 'the FASTA file. Skipping.\n'
+                )
+            elif region.end > entry[0]:
+                sys.stderr.write(
+                    f'Feature ({region.chromosome}:{region.start}-{region.end}) '
+                    + f'beyond length of {region.chromosome} size ({entry[0]} bp). '
+                    + 'Skipping.\n'
+                )
+            else:
+                by_chromosome.setdefault(region.chromosome, []).append(region)
+        STATS.count('records_in', total)
+    tasks = [
+        (
+            fasta_path,
+            chromosome,
+            index.entries[chromosome],
+            sorted(regions, key=attrgetter('start', 'end')),
+            gap,
+            use_name,
+            ignore_strand,
+        )
+        # Chromosomes in file order, for sequential reads without threads
+        for chromosome in index.entries
+        if (regions := by_chromosome.get(chromosome))
+    ]
+
+    written = 0
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(STATS.timer('fetch'))
+        writer = stack.enter_context(
+            seqio.FastaWriter(output_path, line_length, append=False)
+        )
+        results: Iterable[tuple[list[FetchedRegion], int]]
+        if threads > 1 and len(tasks) > 1:
+            pool = stack.enter_context(multiprocessing.Pool(min(threads, len(tasks))))
+            results = pool.imap(_fetch_chromosome, tasks)
+        else:
+            results = map(_fetch_chromosome, tasks)
+        pending: list[FetchedRegion] = []
+        for fetched, bytes_read in results:
+            STATS.count('bytes_read', bytes_read)
+            if sort_output:
+                for _, header, sequence in fetched:
+                    writer.write_sequence(seqio.SequenceRecord(sequence, header))
+                written += len(fetched)
+            else:
+                pending.extend(fetched)
+        pending.sort()
+        for _, header, sequence in pending:
+            writer.write_sequence(seqio.SequenceRecord(sequence, header))
+        written += len(pending)
+    return written
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'fetch-regions',
+        description='Fetch sequences of BED regions from a fasta file, reading '
+        + 'each chromosome once in coordinate order. Headers match '
+        + "`bedtools getfasta -name -s'.",
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        '-b',
+        '--bed',
+        required=True,
+        help="Path to BED file of regions. Reads from standard input if `-'",
+    )
+    input_options.add_argument(
+        '-i',
+        '--fasta',
+        required=True,
+        help='Path to uncompressed fasta file',
+    )
+    input_options.add_argument(
+        '-x',
+        '--index',
+        help="Path to `.fai' index of fasta file, built if missing. Defaults to "
+        + "an index in the cache, or with --no-cache to fasta path with `.fai' "
+        + 'appended',
+    )
+    fetch_options = parser.add_argument_group('fetch options')
+    fetch_options.add_argument(
+        '-s',
+        '--ignore-strand',
+        dest='ignore_strand',
+        action='store_true',
+        help='Do not reverse complement regions on the minus strand or add strand '
+        + 'to headers',
+    )
+    fetch_options.add_argument(
+        '-g',
+        '--merge-gap',
+        dest='gap',
+        type=int,
+        default=0,
+        help='Read regions at most this many bases apart from disk together. '
+        + 'Default is 0',
+    )
+    fetch_options.add_argument(
+        '-t',
+        '--threads',
+        type=int,
+        default=1,
+        help='Number of processes reading chromosomes. Default is 1',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to output fasta file. Writes to standard out if `-'. Defaults "
+        + "to `-'",
+    )
+    output_options.add_argument(
+        '-N',
+        '--no-name',
+        dest='use_name',
+        action='store_false',
+        help='Leave region names out of headers',
+    )
+    output_options.add_argument(
+        '-S',
+        '--sorted',
+        dest='sort_output',
+        action='store_true',
+        help='Write regions in chromosome and coordinate order instead of BED '
+        + 'order, without holding all sequences in memory',
+    )
+    output_options.add_argument(
+        '-l',
+        '--line-length',
+        dest='line_length',
+        type=int,
+        default=0,
+        help='Maximum line length for sequence lines in output fasta file. Give 0 '
+        + 'to place entire sequence on one line. Default is 0',
+    )
+    cache.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    with instrumentation.instrument(args, parser.prog):
+        written = fetch_regions(
+            args.bed,
+            args.fasta,
+            args.output,
+            args.threads,
+            args.gap,
+            args.use_name,
+            args.ignore_strand,
+            args.sort_output,
+            args.index,
+            args.line_length,
+            cache.from_arguments(args),
+        )
+    sys.stderr.write(f'Fetched {written} regions\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+"""Count canonical k-mers in fasta/fastq files."""
+from __future__ import annotations
+
+from typing import Any, BinaryIO, Generator, Iterable, Literal
+from collections import Counter
+from itertools import compress, repeat
+from array import array
+import multiprocessing
+import functools
+import argparse
+import tempfile
+import shutil
+import struct
+import sys
+import os
+import re
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+MAX_K = 31
+DUMP_MAGIC = b'RSKMER\x01'
+# Binary dump layout: magic, k (uint8), record count (uint64), then records of
+# 2-bit packed k-mer (uint64) and count (uint32), all little-endian
+DUMP_HEADER = struct.Struct('<7sBQ')
+DUMP_RECORD = struct.Struct('<QI')
+
+_MASK64 = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15
+_MAX_COUNT = 0xFFFFFFFF
+# A=0 C=1 G=2 T=3, so a k-mer read as a base-4 number is its 2-bit packing
+_TO_DIGITS = str.maketrans('ACGT', '0123')
+_COMPLEMENT_DIGITS = str.maketrans('0123', '3210')
+_NOT_ACGT = re.compile('[^ACGT]+')
+# Digit of each byte for numpy packing; anything but A, C, G or T is 4
+_DIGIT_TABLE = bytes(
+    {ord('A'): 0, ord('C'): 1, ord('G'): 2, ord('T'): 3}.get(byte, 4)
+    for byte in range(256)
+)
+# Bases packed at once with numpy; arrays of a batch take about 40 bytes a base
+_PACK_BASES = 1 << 20
+# Every byte of a packed k-mer decodes to four bases
+_BYTE_TO_BASES = [
+    ''.join('ACGT'[(byte >> shift) & 3] for shift in (6, 4, 2, 0))
+    for byte in range(256)
+]
+
+
+def encode_kmer(kmer: str) -> int:
+    """Return 2-bit packed form of a k-mer made of A, C, G and T."""
+    return int(kmer.translate(_TO_DIGITS), 4)
+
+
+def decode_kmer(key: int, k: int) -> str:
+    """Return k-mer string for a 2-bit packed k-mer."""
+    return ''.join(map(_BYTE_TO_BASES.__getitem__, key.to_bytes(8, 'big')))[-k:]
+
+
+def canonical_kmers(sequence: str, k: int) -> Iterable[int]:
+    """Return packed canonical k-mers of sequence. K-mers containing anything
+    other than A, C, G or T are skipped.
+
+    Every k-mer is parsed as a base-4 integer in C through chained `map'
+    calls rather than rolled base by base in Python, which is several times
+    faster for the same 2-bit packing.
+    """
+    kmers: list[int] = []
+    for fragment in _NOT_ACGT.split(sequence.upper()):
+        count = len(fragment) - k + 1
+        if count <= 0:
+            continue
+        forward_digits = fragment.translate(_TO_DIGITS)
+        reverse_digits = forward_digits.translate(_COMPLEMENT_DIGITS)[::-1]
+        windows = list(map(slice, range(count), range(k, count + k)))
+        forward = map(int, map(forward_digits.__getitem__, windows), repeat(4))
+        reverse = list(map(int, map(reverse_digits.__getitem__, windows), repeat(4)))
+        # Reverse complement of window i is window count - 1 - i of reverse
+        reverse.reverse()
+        kmers.extend(map(min, forward, reverse))
+    return kmers
+
+
+def import_numpy() -> Any:
+    """Return numpy, or None if it is not installed. With numpy, k-mers are
+    packed and counted a batch at a time and shards are merged by sorting
+    flat arrays; without it the same work is done with dicts."""
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return numpy
+
+
+def pack_canonical_kmers(numpy: Any, sequence: bytes, k: int) -> Any:
+    """Return packed canonical k-mers of sequence as a numpy uint64 array,
+    skipping k-mers containing anything other than A, C, G or T. Each of the
+    k digit positions is shifted into every window at once, so the work done
+    in Python is per base position of a k-mer, not per k-mer."""
+    count = len(sequence) - k + 1
+    if count <= 0:
+        return numpy.zeros(0, numpy.uint64)
+    digits = numpy.frombuffer(sequence.upper().translate(_DIGIT_TABLE), numpy.uint8)
+    invalid = numpy.zeros(len(digits) + 1, numpy.int64)
+    numpy.cumsum(digits > 3, out=invalid[1:])
+    valid = invalid[k:] == invalid[:-k]
+    digits = (digits & 3).astype(numpy.uint64)
+    forward = numpy.zeros(count, numpy.uint64)
+    reverse = numpy.zeros(count, numpy.uint64)
+    for position in range(k):
+        window = digits[position : position + count]
+        forward <<= numpy.uint64(2)
+        forward |= window
+        # Complement of the digit, at the mirrored position
+        reverse |= (numpy.uint64(3) - window) << numpy.uint64(2 * position)
+    return numpy.minimum(forward, reverse)[valid]
+
+
+def sum_counts(numpy: Any, keys: Any, counts: Any = None) -> tuple[Any, Any]:
+    """Return sorted unique keys and their summed counts, capped at the
+    largest count a dump can hold. Without counts, each key counts once."""
+    if not len(keys):
+        return keys, numpy.zeros(0, numpy.uint32)
+    if counts is None:
+        keys = numpy.sort(keys)
+    else:
+        order = numpy.argsort(keys)
+        keys = keys[order]
+    starts = numpy.flatnonzero(numpy.concatenate(([True], keys[1:] != keys[:-1])))
+    if counts is None:
+        totals = numpy.diff(numpy.append(starts, len(keys)))
+    else:
+        totals = numpy.add.reduceat(counts[order].astype(numpy.uint64), starts)
+    return keys[starts], numpy.minimum(totals, _MAX_COUNT).astype(numpy.uint32)
+
+
+def _shards_of(numpy: Any, keys: Any, shards: int) -> Any:
+    """Return shard of each packed k-mer in a numpy array, as `_write_spill'
+    assigns them. Multiplying uint64 arrays wraps like masking to 64 bits."""
+    mixed = keys * numpy.uint64(_MIX)
+    return (mixed >> numpy.uint64(32)) * numpy.uint64(shards) >> numpy.uint64(32)
+
+
+def _write_spill(counts: Counter[int], shards: int, paths: list[str]) -> None:
+    """Partition batch counts by shard and append them to shard spill files."""
+    shard_keys = [array('Q') for _ in range(shards)]
+    shard_counts = [array('I') for _ in range(shards)]
+    for key, count in counts.items():
+        # Top 32 bits of the mixed hash scaled into [0, shards)
+        shard = ((((key * _MIX) & _MASK64) >> 32) * shards) >> 32
+        shard_keys[shard].append(key)
+        shard_counts[shard].append(min(count, _MAX_COUNT))
+    for path, keys, values in zip(paths, shard_keys, shard_counts):
+        _append_spill(path, keys, values)
+
+
+def _write_spill_arrays(
+    numpy: Any, keys: Any, counts: Any, shards: int, paths: list[str]
+) -> None:
+    """Partition numpy arrays of batch counts by shard and append them to
+    shard spill files."""
+    shard_ids = _shards_of(numpy, keys, shards)
+    if shards <= 1 << 16:
+        # Stable sorts of 16-bit integers are radix sorts
+        shard_ids = shard_ids.astype(numpy.uint16)
+    order = numpy.argsort(shard_ids, kind='stable')
+    bounds = numpy.searchsorted(shard_ids[order], numpy.arange(shards + 1))
+    for shard, path in enumerate(paths):
+        selected = order[bounds[shard] : bounds[shard + 1]]
+        _append_spill(path, keys[selected], counts[selected])
+
+
+def _append_spill(path: str, keys: Any, counts: Any) -> None:
+    """Append one block of uint64 keys and uint32 counts, preceded by its
+    length. Spill files are read back by the same machine, so the length,
+    keys and counts are all native-endian."""
+    if not len(keys):
+        return
+    with open(path, 'ab') as spill_file:
+        spill_file.write(struct.pack('=Q', len(keys)))
+        spill_file.write(memoryview(keys).cast('B'))
+        spill_file.write(memoryview(counts).cast('B'))
+
+
+def _read_spill(path: str) -> Generator[tuple[array, array], None, None]:
+    with open(path, 'rb') as spill_file:
+        while True:
+            header = spill_file.read(8)
+            if not header:
+                return
+            (length,) = struct.unpack('=Q', header)
+            keys = array('Q')
+            keys.fromfile(spill_file, length)
+            counts = array('I')
+            counts.fromfile(spill_file, length)
+            yield keys, counts
+
+
+def _count_records(
+    numpy: Any,
+    records: Iterable[seqio.SequenceRecord],
+    k: int,
+    batch_size: int,
+    spill: Any,
+) -> tuple[int, int]:
+    """Count k-mers of records, calling spill each time about batch_size
+    k-mers are held: distinct k-mers in a Counter, or packed k-mers before
+    they are summed with numpy.
+
+    Returns:
+        tuple[int, int]: Records read and k-mers counted
+    """
+    record_count = 0
+    kmers = 0
+    if numpy is None:
+        counts: Counter[int] = Counter()
+        for record_count, record in enumerate(records, start=1):
+            batch = canonical_kmers(record.sequence, k)
+            counts.update(batch)
+            kmers += len(batch)  # type: ignore[arg-type]
+            if len(counts) >= batch_size:
+                spill(counts)
+                counts.clear()
+        spill(counts)
+        return record_count, kmers
+    # Sequences are joined by N so no k-mer spans two records
+    pending: list[bytes] = []
+    pending_bases = 0
+    packed: list[Any] = []
+    packed_count = 0
+
+    def pack() -> None:
+        nonlocal kmers, pending_bases, packed_count
+        codes = pack_canonical_kmers(numpy, b'N'.join(pending), k)
+        kmers += len(codes)
+        packed.append(codes)
+        packed_count += len(codes)
+        pending.clear()
+        pending_bases = 0
+
+    def flush() -> None:
+        nonlocal packed_count
+        if packed:
+            spill(*sum_counts(numpy, numpy.concatenate(packed)))
+        packed.clear()
+        packed_count = 0
+
+    for record_count, record in enumerate(records, start=1):
+        pending.append(record.sequence.encode())
+        pending_bases += len(record.sequence) + 1
+        if pending_bases >= _PACK_BASES:
+            pack()
+            if packed_count >= batch_size:
+                flush()
+    if pending:
+        pack()
+    flush()
+    return record_count, kmers
+
+
+def _count_part(
+    task: tuple[str, int, int | None, str, str, int, int, str, int]
+) -> tuple[int, int]:
+    """Count k-mers in part of the input and spill them by shard.
+
+    Returns:
+        tuple[int, int]: Records read and k-mers counted
+    """
+    path, start, end, input_format, encoding, k, shards, spill_prefix, batch_size = task
+    reader_type = seqio.FastaReader if input_format == 'fasta' else seqio.FastqReader
+    paths = [f'{spill_prefix}.shard{shard}' for shard in range(shards)]
+    numpy = import_numpy()
+    if numpy is None:
+        spill = functools.partial(_write_spill, shards=shards, paths=paths)
+    else:
+        spill = functools.partial(
+            _write_spill_arrays, numpy, shards=shards, paths=paths
+        )
+    with STATS.suspended(), reader_type(
+        path, encoding=encoding, start=start, end=end
+    ) as reader:
+        return _count_records(numpy, reader.parse(), k, batch_size, spill)
+
+
+def _merge_spills(numpy: Any, spill_paths: list[str]) -> tuple[Any, Any]:
+    """Sum the counts of every k-mer in spill files and remove them.
+
+    Returns:
+        tuple[Any, Any]: Packed k-mers in ascending order and their counts,
+    as numpy arrays, or lists without numpy
+    """
+    blocks = [
+        block
+        for spill_path in spill_paths
+        if os.path.exists(spill_path)
+        for block in _read_spill(spill_path)
+    ]
+    for spill_path in spill_paths:
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+    if numpy is not None:
+        if not blocks:
+            return numpy.zeros(0, numpy.uint64), numpy.zeros(0, numpy.uint32)
+        keys = numpy.concatenate(
+            [numpy.frombuffer(keys, numpy.uint64) for keys, _ in blocks]
+        )
+        counts = numpy.concatenate(
+            [numpy.frombuffer(counts, numpy.uint32) for _, counts in blocks]
+        )
+        del blocks
+        return sum_counts(numpy, keys, counts)
+    table: dict[int, int] = {}
+    get = table.get
+    for keys, counts in blocks:
+        for key, count in zip(keys, counts):
+            table[key] = get(key, 0) + count
+    del blocks
+    keys = sorted(table)
+    return keys, [min(table[key], _MAX_COUNT) for key in keys]
+
+
+def _merge_shard(
+    task: tuple[int, list[str], str, int, int, str]
+) -> tuple[int, Counter[int]]:
+    """Merge spill files for one shard and write its part of the output.
+
+    Returns:
+        tuple[int, Counter[int]]: Number of k-mers written and count spectrum
+    """
+    _, spill_paths, out_path, k, min_count, output_format = task
+    numpy = import_numpy()
+    keys, counts = _merge_spills(numpy, spill_paths)
+    with open(out_path, 'wb') as out_file:
+        if numpy is None:
+            spectrum = Counter(counts)
+            if min_count > 1:
+                selected = [count >= min_count for count in counts]
+                keys = list(compress(keys, selected))
+                counts = list(compress(counts, selected))
+            if output_format == 'binary':
+                out_file.write(b''.join(map(DUMP_RECORD.pack, keys, counts)))
+            else:
+                out_file.write(
+                    ''.join(
+                        f'{decode_kmer(key, k)}\t{count}\n'
+                        for key, count in zip(keys, counts)
+                    ).encode()
+                )
+            return len(keys), spectrum
+        values, frequencies = numpy.unique(counts, return_counts=True)
+        spectrum = Counter(dict(zip(values.tolist(), frequencies.tolist())))
+        if min_count > 1:
+            selected = counts >= min_count
+            keys = keys[selected]
+            counts = counts[selected]
+        if output_format == 'binary':
+            records = numpy.empty(len(keys), [('key', '<u8'), ('count', '<u4')])
+            records['key'] = keys
+            records['count'] = counts
+            out_file.write(records.tobytes())
+        else:
+            shifts = numpy.arange(2 * (k - 1), -1, -2, dtype=numpy.uint64)
+            letters = numpy.frombuffer(b'ACGT', numpy.uint8)[
+                (keys[:, None] >> shifts) & numpy.uint64(3)
+            ]
+            kmers = letters.view(f'S{k}').ravel().tolist()
+            out_file.write(
+                b''.join(
+                    b'%s\t%d\n' % pair for pair in zip(kmers, counts.tolist())
+                )
+            )
+    return len(keys), spectrum
+
+
+def count_kmers(
+    input_path: str,
+    output_path: str,
+    k: int,
+    input_format: Literal['fasta', 'fastq'] = 'fasta',
+    output_format: Literal['tsv', 'binary'] = 'tsv',
+    threads: int = 1,
+    shards: int = 16,
+    min_count: int = 1,
+    spectrum_path: str | None = None,
+    batch_size: int = 1 << 20,
+    chunk_size: int = 64 * 1024 * 1024,
+    encoding: Literal['phred33', 'phred64'] = 'phred33',
+) -> int:
+    """Count canonical k-mers and write them to output_path.
+
+    Input is split at record boundaries and counted by `threads' processes.
+    Each counts into a bounded batch and spills it partitioned by k-mer hash
+    prefix into `shards' temporary files. Shards are then merged in parallel,
+    so peak memory per process is the number of distinct k-mers divided by
+    shards. With numpy, k-mers are packed, counted and merged as flat arrays
+    of 12 bytes per k-mer; without it, with dicts. K-mers of each shard are
+    written in ascending order.
+
+    Returns:
+        int: Number of distinct k-mers written
+    """
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f'k must be between 1 and {MAX_K}')
+    if input_format not in ('fasta', 'fastq'):
+        raise ValueError(
+            f"Invalid format for input file: {input_format}. Must be either 'fasta' or 'fastq'"
+        )
+    temporary = tempfile.mkdtemp(prefix='rnaseeker-kmer-')
+    try:
+        if input_path == '-':
+            ranges: list[tuple[int, int | None]] = [(0, None)]
+        else:
+            STATS.count('bytes_read', os.path.getsize(input_path))
+            ranges = seqio.chunk_offsets(
+                input_path, chunk_size, input_format  # type: ignore
+            )
+        parts = [
+            (
+                input_path,
+                start,
+                end if input_path != '-' else None,
+                input_format,
+                encoding,
+                k,
+                shards,
+                os.path.join(temporary, f'part{index}'),
+                batch_size,
+            )
+            for index, (start, end) in enumerate(ranges)
+        ]
+        merges = [
+            (
+                shard,
+                [f'{part[7]}.shard{shard}' for part in parts],
+                os.path.join(temporary, f'out{shard}'),
+                k,
+                min_count,
+                output_format,
+            )
+            for shard in range(shards)
+        ]
+        spectrum: Counter[int] = Counter()
+        written = 0
+        with STATS.timer('count'):
+            if threads <= 1 or input_path == '-':
+                counted = list(map(_count_part, parts))
+            else:
+                with multiprocessing.Pool(min(threads, len(parts))) as pool:
+                    counted = pool.map(_count_part, parts)
+        STATS.count('records_in', sum(records for records, _ in counted))
+        STATS.count('kmers', sum(kmers for _, kmers in counted))
+        with STATS.timer('merge'):
+            if threads <= 1:
+                merged = list(map(_merge_shard, merges))
+            else:
+                with multiprocessing.Pool(min(threads, shards)) as pool:
+                    merged = pool.map(_merge_shard, merges)
+        for shard_written, shard_spectrum in merged:
+            written += shard_written
+            spectrum.update(shard_spectrum)
+        with STATS.timer('write'):
+            _concatenate(
+                output_path,
+                [merge[2] for merge in merges],
+                DUMP_HEADER.pack(DUMP_MAGIC, k, written)
+                if output_format == 'binary'
+                else b'',
+            )
+        STATS.count('records_out', written)
+        if spectrum_path is not None:
+            with open(spectrum_path, 'w', encoding='UTF-8') as spectrum_file:
+                spectrum_file.write('count\tkmers\n')
+                for count in sorted(spectrum):
+                    spectrum_file.write(f'{count}\t{spectrum[count]}\n')
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+    return written
+
+
+def _concatenate(output_path: str, part_paths: list[str], header: bytes) -> None:
+    out_file: BinaryIO
+    if output_path == '-':
+        out_file = sys.stdout.buffer
+    else:
+        out_file = open(output_path, 'wb')
+    try:
+        out_file.write(header)
+        for part_path in part_paths:
+            with open(part_path, 'rb') as part_file:
+                shutil.copyfileobj(part_file, out_file)
+    finally:
+        if output_path == '-':
+            out_file.flush()
+        else:
+            out_file.close()
+
+
+def read_dump(path: str) -> Generator[tuple[str, int], None, None]:
+    """Read a binary k-mer dump and yield (k-mer, count) pairs."""
+    with open(path, 'rb') as dump_file:
+        magic, k, _ = DUMP_HEADER.unpack(dump_file.read(DUMP_HEADER.size))
+        if magic != DUMP_MAGIC:
+            raise ValueError(f'{path} is not a rnaseeker k-mer dump')
+        while True:
+            block = dump_file.read(DUMP_RECORD.size * 65536)
+            if not block:
+                return
+            for key, count in DUMP_RECORD.iter_unpack(block):
+                yield decode_kmer(key, k), count
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'kmer-count', description='Count canonical k-mers in fasta/fastq files.'
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input', help="Path to fasta/fastq file. Reads from standard input if `-'"
+    )
+    input_options.add_argument(
+        '-f',
+        '--input-format',
+        dest='input_format',
+        choices=['fasta', 'fastq'],
+        default='fasta',
+        help="File format of input file. Default is `fasta'",
+    )
+    count_options = parser.add_argument_group('count options')
+    count_options.add_argument(
+        '-k',
+        '--kmer-length',
+        dest='k',
+        type=int,
+        required=True,
+        help=f'Length of k-mers to count. At most {MAX_K}',
+    )
+    count_options.add_argument(
+        '-m',
+        '--min-count',
+        dest='min_count',
+        type=int,
+        default=1,
+        help='Only write k-mers seen at least this many times. Default is 1',
+    )
+    run_options = parser.add_argument_group('run options')
+    run_options.add_argument(
+        '-t',
+        '--threads',
+        type=int,
+        default=1,
+        help='Number of worker processes. Default is 1',
+    )
+    run_options.add_argument(
+        '-s',
+        '--shards',
+        type=int,
+        default=16,
+        help='Number of hash-prefix shards. More shards lower peak memory per '
+        + 'process. Default is 16',
+    )
+    run_options.add_argument(
+        '--batch-size',
+        dest='batch_size',
+        type=int,
+        default=1 << 20,
+        help='K-mers to hold per worker before spilling to disk. Default is '
+        + '1048576',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to output file. Writes to standard out if `-'. Defaults to `-'",
+    )
+    output_options.add_argument(
+        '-F',
+        '--output-format',
+        dest='output_format',
+        choices=['tsv', 'binary'],
+        default='tsv',
+        help="`tsv' writes k-mer and count per line. `binary' writes a compact "
+        + "dump of packed k-mers and counts. Default is `tsv'",
+    )
+    output_options.add_argument(
+        '--spectrum',
+        metavar='PATH',
+        help='Write k-mer count spectrum (number of k-mers seen each number of '
+        + 'times) to given path',
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    with instrumentation.instrument(args, parser.prog):
+        count_kmers(
+            args.input,
+            args.output,
+            args.k,
+            args.input_format,
+            args.output_format,
+            args.threads,
+            args.shards,
+            args.min_count,
+            args.spectrum,
+            args.batch_size,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+"""Scan sequences on both strands for consensus motifs and position weight
+matrices."""
+from __future__ import annotations
+
+from typing import Any, Iterable, Iterator, Literal, NamedTuple, Optional
+from collections import deque
+import multiprocessing
+import itertools
+import bisect
+import argparse
+import math
+import sys
+import re
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+IUPAC = {
+    'A': 'A',
+    'C': 'C',
+    'G': 'G',
+    'T': 'T',
+    'U': 'T',
+    'R': 'AG',
+    'Y': 'CT',
+    'S': 'CG',
+    'W': 'AT',
+    'K': 'GT',
+    'M': 'AC',
+    'B': 'CGT',
+    'D': 'AGT',
+    'H': 'ACT',
+    'V': 'ACG',
+    'N': 'ACGT',
+}
+
+# Bases are encoded as 0-3 in this order; anything else is 4 and never matches
+_BASES = 'ACGT'
+_OTHER = 4
+_ENCODE = bytes(
+    _BASES.index(chr(byte).upper()) if chr(byte).upper() in _BASES else _OTHER
+    for byte in range(256)
+)
+
+# Sequence names written by fetch-regions and `bedtools getfasta'
+_REGION = re.compile(
+    r'(?:.*::)?(?P<chromosome>.+):(?P<start>\d+)-(?P<end>\d+)(?:\((?P<strand>[+.-])\))?'
+)
+
+# Record index, start, end, motif name, strand and score of one hit. Score
+# is None for consensus motifs
+Hit = tuple[int, int, int, str, str, Optional[float]]
+
+
+def import_numpy() -> Any:
+    """Import numpy, which is only needed for position weight matrices."""
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:
+        raise ImportError(
+            'Scanning position weight matrices requires numpy. Install it with '
+            + "`pip install rnaseeker[motif]'"
+        ) from exc
+    return numpy
+
+
+class ConsensusMotif(NamedTuple):
+    """A motif written as a string of IUPAC nucleotide codes."""
+
+    name: str
+    consensus: str
+
+
+class Matrix(NamedTuple):
+    """A position frequency matrix: one row of A, C, G and T frequencies per
+    position, each summing to 1, estimated from sites sequences."""
+
+    name: str
+    frequencies: list[list[float]]
+    sites: int
+
+
+def read_consensus(consensus_path: str) -> list[ConsensusMotif]:
+    """Read consensus motifs, one per line as `name<TAB>motif' or just
+    `motif'. Blank lines and `#' comments are skipped.
+
+    Raises:
+        ValueError: Motif has a character that is not an IUPAC code
+    """
+    motifs = []
+    with open(consensus_path, 'r', encoding='UTF-8') as consensus_file:
+        for line_number, line in enumerate(consensus_file, start=1):
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split()
+            consensus = fields[-1].upper()
+            if any(base not in IUPAC for base in consensus):
+                raise ValueError(
+                    f'Invalid consensus motif on line {line_number} in '
+                    + f'{consensus_path}: {consensus}'
+                )
+            motifs.append(ConsensusMotif(fields[0], consensus))
+    return motifs
+
+
+def _normalize(counts: list[list[float]]) -> list[list[float]]:
+    return [[count / sum(row) for count in row] for row in counts]
+
+
+def _read_jaspar(lines: list[str]) -> list[Matrix]:
+    """Parse JASPAR matrices: a `>ID name' header followed by one row of
+    counts per base, optionally labelled `A [ ... ]'."""
+    matrices = []
+    name = ''
+    rows: list[list[float]] = []
+
+    def add() -> None:
+        if not rows:
+            return
+        if len(rows) != 4 or len({len(row) for row in rows}) != 1:
+            raise ValueError(f'Matrix {name} needs four rows of equal length')
+        counts = [list(column) for column in zip(*rows)]
+        matrices.append(Matrix(name, _normalize(counts), round(sum(counts[0]))))
+
+    for line in lines:
+        if line.startswith('>'):
+            add()
+            fields = line[1:].split()
+            name = '_'.join(fields[:2]) if fields else f'matrix{len(matrices)}'
+            rows = []
+        elif line.strip():
+            values = re.sub(r'^\s*[ACGT]\s*|[\[\]]', ' ', line).split()
+            rows.append([float(value) for value in values])
+    add()
+    return matrices
+
+
+def _read_meme(lines: list[str]) -> tuple[list[Matrix], list[float] | None]:
+    """Parse MEME motif format: `MOTIF ID name' lines, each followed by a
+    `letter-probability matrix' with one row per position."""
+    matrices = []
+    background = None
+    lines_left = iter(lines)
+    for line in lines_left:
+        if line.startswith('Background letter frequencies'):
+            values = next(lines_left, '').split()
+            frequencies = dict(zip(values[::2], map(float, values[1::2])))
+            background = [frequencies.get(base, 0.25) for base in _BASES]
+        elif line.startswith('MOTIF'):
+            name = '_'.join(line.split()[1:3])
+        elif line.startswith('letter-probability matrix'):
+            width = int(re.search(r'w=\s*(\d+)', line).group(1))  # type: ignore
+            sites = re.search(r'nsites=\s*(\d+)', line)
+            rows = [
+                [float(value) for value in next(lines_left).split()]
+                for _ in range(width)
+            ]
+            matrices.append(
+                Matrix(name, _normalize(rows), int(sites.group(1)) if sites else 20)
+            )
+    return matrices, background
+
+
+def read_matrices(matrix_path: str) -> tuple[list[Matrix], list[float] | None]:
+    """Read position frequency matrices in JASPAR or MEME format.
+
+    Returns:
+        tuple[list[Matrix], list[float] | None]: Matrices and A, C, G and T
+    background frequencies, if the file gives them
+    """
+    with open(matrix_path, 'r', encoding='UTF-8') as matrix_file:
+        lines = matrix_file.read().splitlines()
+    if any(line.startswith('MEME version') for line in lines[:20]):
+        return _read_meme(lines)
+    return _read_jaspar(lines), None
+
+
+def log_odds(
+    matrix: Matrix, background: list[float], pseudocount: float = 0.8
+) -> list[list[float]]:
+    """Return log2 odds scores of each base at each position of matrix
+    against background, adding pseudocount sites spread by background."""
+    scores = []
+    for row in matrix.frequencies:
+        scores.append(
+            [
+                math.log2(
+                    (frequency * matrix.sites + pseudocount * expected)
+                    / (matrix.sites + pseudocount)
+                    / expected
+                )
+                for frequency, expected in zip(row, background)
+            ]
+        )
+    return scores
+
+
+def expand_consensus(consensus: str) -> Iterator[str]:
+    """Yield every sequence of A, C, G and T matching an IUPAC consensus."""
+    return map(''.join, itertools.product(*(IUPAC[base] for base in consensus)))
+
+
+class Automaton:
+    """Aho-Corasick automaton finding many patterns of A, C, G and T in one
+    pass over a sequence.
+
+    States are numbered in steps of five so that the next state is
+    `transitions[state + base]' for an encoded base, with any base that is
+    not A, C, G or T leading back to the root.
+    """
+
+    def __init__(self, patterns: Iterable[tuple[str, Any]]) -> None:
+        goto: list[list[int]] = [[-1] * 4]
+        matches: list[list[Any]] = [[]]
+        for pattern, value in patterns:
+            state = 0
+            for base in pattern:
+                code = _BASES.index(base)
+                if goto[state][code] < 0:
+                    goto[state][code] = len(goto)
+                    goto.append([-1] * 4)
+                    matches.append([])
+                state = goto[state][code]
+            matches[state].append(value)
+        # Breadth-first fill of failure links turns the trie into a complete
+        # transition table
+        failure = [0] * len(goto)
+        queue: deque[int] = deque()
+        for code in range(4):
+            child = goto[0][code]
+            if child < 0:
+                goto[0][code] = 0
+            else:
+                queue.append(child)
+        while queue:
+            state = queue.popleft()
+            matches[state].extend(matches[failure[state]])
+            for code in range(4):
+                child = goto[state][code]
+                if child < 0:
+                    goto[state][code] = goto[failure[state]][code]
+                else:
+                    failure[child] = goto[failure[state]][code]
+                    queue.append(child)
+        self.transitions = [5 * target for row in goto for target in (*row, 0)]
+        self.matches: list[tuple[Any, ...] | None] = [None] * len(self.transitions)
+        for state, found in enumerate(matches):
+            if found:
+                self.matches[5 * state] = tuple(found)
+        self.state_count = len(goto)
+
+    def find(self, codes: bytes) -> Iterator[tuple[int, Any]]:
+        """Yield end position and value of each pattern found in encoded
+        sequence, overlapping matches included."""
+        transitions = self.transitions
+        matches = self.matches
+        state = 0
+        for end, code in enumerate(codes, start=1):
+            state = transitions[state + code]
+            found = matches[state]
+            if found is not None:
+                for value in found:
+                    yield end, value
+
+
+class Scanner:
+    """Find consensus motifs and matrix hits on both strands of batches of
+    sequences.
+
+    Consensus motifs and their reverse complements are expanded to plain
+    sequences and found together by one Automaton pass. Matrices are scored
+    at every position with numpy: each batch is encoded once as an array of
+    base codes and a matrix's score is summed column by column from array
+    lookups, for the matrix and its reverse complement. A window reports a
+    hit if its score is at least threshold of the way from the matrix's
+    lowest to its highest possible score.
+    """
+
+    def __init__(
+        self,
+        consensus_motifs: list[ConsensusMotif] | None = None,
+        matrices: list[Matrix] | None = None,
+        threshold: float = 0.85,
+        background: list[float] | None = None,
+        pseudocount: float = 0.8,
+        max_expansion: int = 65536,
+    ) -> None:
+        self.consensus_motifs = consensus_motifs or []
+        self.matrices = matrices or []
+        self.background = background or [0.25] * 4
+        self.automaton: Automaton | None = None
+        if self.consensus_motifs:
+            patterns = []
+            for index, motif in enumerate(self.consensus_motifs):
+                expansions = math.prod(len(IUPAC[base]) for base in motif.consensus)
+                if expansions > max_expansion:
+                    raise ValueError(
+                        f'Consensus motif {motif.name} matches {expansions} '
+                        + f'sequences, more than {max_expansion}; give it as a matrix'
+                    )
+                reverse = seqio.reverse_complement(motif.consensus)
+                patterns.extend(
+                    (pattern, (index, '+'))
+                    for pattern in expand_consensus(motif.consensus)
+                )
+                patterns.extend(
+                    (pattern, (index, '-')) for pattern in expand_consensus(reverse)
+                )
+            self.automaton = Automaton(patterns)
+        # Scores of A, C, G, T and other bases for each matrix and its reverse
+        # complement, and the lowest score reported
+        self.scores: list[tuple[list[list[float]], list[list[float]], float]] = []
+        for matrix in self.matrices:
+            forward = log_odds(matrix, self.background, pseudocount)
+            low = sum(min(row) for row in forward)
+            high = sum(max(row) for row in forward)
+            reverse = [row[::-1] for row in forward[::-1]]
+            self.scores.append(
+                (
+                    [row + [-math.inf] for row in forward],
+                    [row + [-math.inf] for row in reverse],
+                    low + threshold * (high - low),
+                )
+            )
+
+    def scan(self, sequences: list[str]) -> list[Hit]:
+        """Return hits in sequences, ordered by sequence, start, motif and
+        strand. Record index of a hit is its sequence's index in the list."""
+        # One N between sequences keeps windows from spanning two of them
+        codes = 'N'.join(sequences).encode().translate(_ENCODE)
+        starts = [0]
+        for sequence in sequences:
+            starts.append(starts[-1] + len(sequence) + 1)
+        hits: list[tuple[int, Hit]] = []
+        if self.automaton is not None:
+            hits.extend(self._find_consensus(codes, starts))
+        if self.scores:
+            hits.extend(self._score_matrices(codes, starts))
+        hits.sort(key=lambda hit: (hit[1][0], hit[1][1], hit[0], hit[1][4]))
+        return [hit for _, hit in hits]
+
+    def _find_consensus(
+        self, codes: bytes, starts: list[int]
+    ) -> Iterator[tuple[int, Hit]]:
+        """Yield motif index and hit of each consensus match."""
+        assert self.automaton is not None
+        lengths = [len(motif.consensus) for motif in self.consensus_motifs]
+        names = [motif.name for motif in self.consensus_motifs]
+        for end, (index, strand) in self.automaton.find(codes):
+            position = end - lengths[index]
+            record = bisect.bisect_right(starts, position) - 1
+            start = position - starts[record]
+            end = start + lengths[index]
+            yield index, (record, start, end, names[index], strand, None)
+
+    def _score_matrices(
+        self, codes: bytes, starts: list[int]
+    ) -> Iterator[tuple[int, Hit]]:
+        """Yield matrix index, after the consensus motifs, and hit of each
+        window scoring at least the threshold."""
+        np = import_numpy()
+        encoded = np.frombuffer(codes, dtype=np.uint8)
+        offset = len(self.consensus_motifs)
+        record_starts = np.array(starts)
+        for number, (matrix, (forward, reverse, minimum)) in enumerate(
+            zip(self.matrices, self.scores)
+        ):
+            width = len(forward)
+            windows = len(encoded) - width + 1
+            if windows <= 0:
+                continue
+            for strand, scores in (('+', forward), ('-', reverse)):
+                table = np.array(scores)
+                total = table[0][encoded[:windows]]
+                for column in range(1, width):
+                    total += table[column][encoded[column : column + windows]]
+                positions = np.flatnonzero(total >= minimum - 1e-9)
+                if not len(positions):
+                    continue
+                records = np.searchsorted(record_starts, positions, 'right') - 1
+                local = positions - record_starts[records]
+                for record, start, score in zip(
+                    records.tolist(), local.tolist(), total[positions].tolist()
+                ):
+                    yield offset + number, (
+                        record,
+                        start,
+                        start + width,
+                        matrix.name,
+                        strand,
+                        score,
+                    )
+
+
+# Scanner of a worker process, sent once when the pool starts rather than
+# pickled with every batch
+_worker_scanner: Scanner | None = None
+
+
+def _init_worker(scanner: Scanner) -> None:
+    global _worker_scanner  # pylint: disable=global-statement
+    _worker_scanner = scanner
+
+
+def _scan_batch(sequences: list[str]) -> list[Hit]:
+    assert _worker_scanner is not None, 'Worker was started without a scanner'
+    return _worker_scanner.scan(sequences)
+
+
+def _batches(
+    records: Iterable[seqio.SequenceRecord], batch_bases: int
+) -> Iterator[tuple[list[str], list[str]]]:
+    """Group names and sequences of records into batches of about
+    batch_bases bases."""
+    names: list[str] = []
+    sequences: list[str] = []
+    size = 0
+    for record in records:
+        names.append(record.name)
+        sequences.append(record.sequence)
+        size += len(record.sequence)
+        if size >= batch_bases:
+            yield names, sequences
+            names, sequences = [], []
+            size = 0
+    if sequences:
+        yield names, sequences
+
+
+def genome_position(
+    name: str, start: int, end: int, strand: str
+) -> tuple[str, int, int, str]:
+    """Convert a hit in a sequence named `name::chromosome:start-end(strand)',
+    as written by fetch-regions, to genome coordinates. Sequences on the
+    minus strand were reverse complemented, so their hits are flipped.
+
+    Raises:
+        ValueError: Name does not give a genome region
+    """
+    match = _REGION.fullmatch(name)
+    if match is None:
+        raise ValueError(f'Sequence name {name} does not give a genome region')
+    region_start, region_end = int(match['start']), int(match['end'])
+    if match['strand'] == '-':
+        return (
+            match['chromosome'],
+            region_end - end,
+            region_end - start,
+            '+' if strand == '-' else '-',
+        )
+    return match['chromosome'], region_start + start, region_start + end, strand
+
+
+def scan_motifs(
+    input_path: str,
+    output_path: str,
+    scanner: Scanner,
+    output_format: Literal['bed', 'tsv'] = 'bed',
+    genome_coordinates: bool = False,
+    threads: int = 1,
+    batch_bases: int = 1_000_000,
+) -> int:
+    """Scan every sequence of a fasta file with scanner and write hits.
+
+    Batches of about batch_bases bases are scanned by `threads' worker
+    processes and hits are written in input order. BED output has the
+    sequence name, start, end, motif name, score (`.' for consensus motifs)
+    and strand of each hit; TSV output adds a header and the matched
+    sequence, read on the hit's strand. With genome_coordinates, hits in
+    sequences named by fetch-regions or `bedtools getfasta' are placed on
+    the genome.
+
+    Returns:
+        int: Number of hits written
+    """
+    if output_format not in ('bed', 'tsv'):
+        raise ValueError(
+            f'Invalid output format: {output_format}. Must be either bed or tsv'
+        )
+    written = 0
+    with seqio.FastaReader(input_path) as reader, open(
+        sys.stdout.fileno() if output_path == '-' else output_path,
+        'w',
+        encoding='UTF-8',
+        closefd=output_path != '-',
+    ) as output_file:
+        # Batches wait here from being handed to a worker until their hits
+        # are written, which labels the hits
+        pending: deque[tuple[list[str], list[str]]] = deque()
+
+        def tasks() -> Iterator[list[str]]:
+            for names, sequences in _batches(reader.parse(), batch_bases):
+                pending.append((names, sequences))
+                yield sequences
+
+        if output_format == 'tsv':
+            output_file.write('sequence\tstart\tend\tmotif\tscore\tstrand\tmatch\n')
+
+        def write(results: Iterable[list[Hit]]) -> None:
+            nonlocal written
+            for hits in results:
+                names, sequences = pending.popleft()
+                lines = []
+                for record, start, end, motif, strand, score in hits:
+                    name = names[record]
+                    score_text = '.' if score is None else f'{score:.3f}'
+                    if genome_coordinates:
+                        chromosome, first, last, genome_strand = genome_position(
+                            name, start, end, strand
+                        )
+                    else:
+                        chromosome, first, last, genome_strand = (
+                            name,
+                            start,
+                            end,
+                            strand,
+                        )
+                    line = (
+                        f'{chromosome}\t{first}\t{last}\t{motif}\t{score_text}\t'
+                        + genome_strand
+                    )
+                    if output_format == 'tsv':
+                        matched = sequences[record][start:end]
+                        if strand == '-':
+                            matched = seqio.reverse_complement(matched)
+                        line += '\t' + matched
+                    lines.append(line + '\n')
+                output_file.writelines(lines)
+                written += len(hits)
+
+        with STATS.timer('scan'):
+            if threads <= 1:
+                write(map(scanner.scan, tasks()))
+            else:
+                with multiprocessing.Pool(threads, _init_worker, (scanner,)) as pool:
+                    write(pool.imap(_scan_batch, tasks()))
+    STATS.count('hits', written)
+    return written
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'motif-scan',
+        description='Scan both strands of fasta sequences, such as extracted '
+        + 'promoters, for IUPAC consensus motifs and JASPAR or MEME position '
+        + 'weight matrices. Matrices require numpy.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input',
+        help="Path to fasta file, optionally gzip-compressed. Reads from standard "
+        + "input if `-'",
+    )
+    input_options.add_argument(
+        '-c',
+        '--consensus',
+        help='Path to file of consensus motifs in IUPAC codes, one per line, '
+        + 'optionally after a name and a tab',
+    )
+    input_options.add_argument(
+        '-m',
+        '--matrices',
+        help='Path to position frequency matrices in JASPAR or MEME format',
+    )
+    scan_options = parser.add_argument_group('scan options')
+    scan_options.add_argument(
+        '-r',
+        '--threshold',
+        type=float,
+        default=0.85,
+        help="Report matrix windows scoring at least this fraction of the way from "
+        + "the matrix's lowest to highest possible score. Default is 0.85",
+    )
+    scan_options.add_argument(
+        '-b',
+        '--background',
+        type=float,
+        nargs=4,
+        metavar=('A', 'C', 'G', 'T'),
+        help='Background base frequencies for matrix scores. Defaults to those in '
+        + 'a MEME file, or 0.25 each',
+    )
+    scan_options.add_argument(
+        '-P',
+        '--pseudocount',
+        type=float,
+        default=0.8,
+        help='Pseudocount sites added to matrices. Default is 0.8',
+    )
+    scan_options.add_argument(
+        '-t',
+        '--threads',
+        type=int,
+        default=1,
+        help='Number of processes scanning batches of sequences. Default is 1',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to output file. Writes to standard out if `-'. Defaults to `-'",
+    )
+    output_options.add_argument(
+        '-F',
+        '--output-format',
+        dest='output_format',
+        choices=['bed', 'tsv'],
+        default='bed',
+        help='Write hits as BED, or as TSV with a header and matched sequences. '
+        + 'Default is bed',
+    )
+    output_options.add_argument(
+        '-g',
+        '--genome-coordinates',
+        dest='genome_coordinates',
+        action='store_true',
+        help='Place hits on the genome using sequence names written by '
+        + "fetch-regions or extract-promoters (`name::chromosome:start-end(strand)')",
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    if args.consensus is None and args.matrices is None:
+        parser.error('Give consensus motifs (-c), matrices (-m) or both')
+    with instrumentation.instrument(args, parser.prog):
+        consensus_motifs = read_consensus(args.consensus) if args.consensus else []
+        matrices: list[Matrix] = []
+        background = args.background
+        if args.matrices is not None:
+            import_numpy()
+            matrices, file_background = read_matrices(args.matrices)
+            background = background or file_background
+        scanner = Scanner(
+            consensus_motifs, matrices, args.threshold, background, args.pseudocount
+        )
+        hits = scan_motifs(
+            args.input,
+            args.output,
+            scanner,
+            args.output_format,
+            args.genome_coordinates,
+            args.threads,
+        )
+    sys.stderr.write(
+        f'Found {hits} hits of {len(consensus_motifs) + len(matrices)} motifs\n'
+    )
+
+
+if __name__ == '__main__':
+    main()
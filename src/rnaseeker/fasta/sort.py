@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""Sort fasta/fastq files by name, length or sequence in bounded memory."""
+from __future__ import annotations
+
+from typing import Any, BinaryIO, Iterable, Iterator, Literal
+from operator import itemgetter
+import multiprocessing
+import argparse
+import tempfile
+import pickle
+import shutil
+import heapq
+import os
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+SortKey = Literal['name', 'length', 'sequence']
+
+# Sort key, description, sequence and quality of one record
+CompactRecord = tuple[Any, str, str, str]
+
+# Runs merged at once at most; more runs are merged in several passes
+_MAX_FAN_IN = 256
+# Smallest block of records pickled together in a run file, in estimated
+# bytes. A merge holds one block per run, so fan-in is the memory budget
+# divided by the block size.
+_MIN_BLOCK_BYTES = 64 * 1024
+# Estimated bytes per record on top of its strings
+_RECORD_OVERHEAD = 250
+
+_KEYS = {
+    'name': lambda record: record.name,
+    'length': lambda record: len(record.sequence),
+    'sequence': lambda record: record.sequence,
+}
+
+
+def _record_size(record: CompactRecord) -> int:
+    return len(record[1]) + len(record[2]) + len(record[3]) + _RECORD_OVERHEAD
+
+
+def block_bytes(memory: int) -> int:
+    """Return estimated bytes of records per run file block for a memory
+    budget, so that a merge of up to _MAX_FAN_IN runs fits the budget."""
+    return max(memory // _MAX_FAN_IN, _MIN_BLOCK_BYTES)
+
+
+def fan_in(memory: int) -> int:
+    """Return number of runs merged at once within a memory budget."""
+    return max(2, min(_MAX_FAN_IN, memory // block_bytes(memory)))
+
+
+def _write_blocks(
+    records: Iterable[CompactRecord], run_file: BinaryIO, size: int
+) -> None:
+    """Pickle records to run_file in blocks of about size estimated bytes."""
+    block: list[CompactRecord] = []
+    block_size = 0
+    for record in records:
+        block.append(record)
+        block_size += _record_size(record)
+        if block_size >= size:
+            pickle.dump(block, run_file, pickle.HIGHEST_PROTOCOL)
+            block = []
+            block_size = 0
+    if block:
+        pickle.dump(block, run_file, pickle.HIGHEST_PROTOCOL)
+
+
+def _write_run(records: list[CompactRecord], path: str, memory: int) -> None:
+    with open(path, 'wb') as run_file:
+        _write_blocks(records, run_file, block_bytes(memory))
+
+
+def _read_run(path: str) -> Iterator[CompactRecord]:
+    with open(path, 'rb') as run_file:
+        while True:
+            try:
+                block = pickle.load(run_file)
+            except EOFError:
+                return
+            yield from block
+
+
+def sorted_runs(
+    records: Iterable[seqio.SequenceRecord],
+    key: SortKey,
+    memory: int,
+    prefix: str,
+    reverse: bool = False,
+) -> tuple[list[str], int]:
+    """Sort records in runs of about `memory' bytes and spill each run to a
+    file named from prefix.
+
+    Returns:
+        tuple[list[str], int]: Run file paths and number of records
+    """
+    get_key = _KEYS[key]
+    runs: list[str] = []
+    run: list[CompactRecord] = []
+    size = 0
+    count = 0
+
+    def spill() -> None:
+        run.sort(key=itemgetter(0), reverse=reverse)
+        path = f'{prefix}.run{len(runs)}'
+        _write_run(run, path, memory)
+        runs.append(path)
+        run.clear()
+
+    for count, record in enumerate(records, start=1):
+        run.append(
+            (get_key(record), record.description, record.sequence, record.quality)
+        )
+        size += _record_size(run[-1])
+        if size >= memory:
+            spill()
+            size = 0
+    if run:
+        spill()
+    return runs, count
+
+
+def _sort_range(
+    task: tuple[str, int, int, str, SortKey, int, str, bool]
+) -> tuple[list[str], int]:
+    """Sort the records in a byte range of the input into runs."""
+    path, start, end, input_format, key, memory, prefix, reverse = task
+    reader_type = seqio.FastaReader if input_format == 'fasta' else seqio.FastqReader
+    with STATS.suspended(), reader_type(path, start=start, end=end) as reader:
+        return sorted_runs(reader.parse(), key, memory, prefix, reverse)
+
+
+def merge_runs(
+    runs: list[str],
+    directory: str,
+    reverse: bool = False,
+    memory: int = 512 * 1024 * 1024,
+) -> Iterator[CompactRecord]:
+    """Merge sorted run files with a heap, first merging groups of runs into
+    longer runs if there are too many to merge within memory at once.
+    Records with equal keys keep the order of the runs they came from."""
+    size = block_bytes(memory)
+    group_size = fan_in(memory)
+    generation = 0
+    while len(runs) > group_size:
+        merged = []
+        for index in range(0, len(runs), group_size):
+            group = runs[index : index + group_size]
+            path = os.path.join(directory, f'merge{generation}.{index}')
+            with open(path, 'wb') as run_file:
+                _write_blocks(
+                    heapq.merge(
+                        *map(_read_run, group), key=itemgetter(0), reverse=reverse
+                    ),
+                    run_file,
+                    size,
+                )
+            for run in group:
+                os.remove(run)
+            merged.append(path)
+        runs = merged
+        generation += 1
+    return heapq.merge(*map(_read_run, runs), key=itemgetter(0), reverse=reverse)
+
+
+def sort_file(
+    input_path: str,
+    output_path: str,
+    input_format: Literal['fasta', 'fastq'] = 'fasta',
+    key: SortKey = 'name',
+    reverse: bool = False,
+    memory: int = 512 * 1024 * 1024,
+    threads: int = 1,
+    temporary_directory: str | None = None,
+    line_length: int = 80,
+) -> int:
+    """Sort records of a fasta/fastq file by name, length or sequence.
+
+    Records are sorted in runs and spilled to temporary files, then merged,
+    both within about memory bytes of records.
+    With threads, byte ranges of the input are read and sorted by that many
+    processes, each holding about memory / threads bytes of records.
+    Standard input and gzip-compressed files are sorted in this process.
+    Records with equal keys keep their input order.
+
+    Returns:
+        int: Number of records sorted
+    """
+    if input_format not in ('fasta', 'fastq'):
+        raise ValueError(
+            f"Invalid format for input file: {input_format}. Must be either 'fasta' or 'fastq'"
+        )
+    if key not in _KEYS:
+        raise ValueError(
+            f'Invalid sort key: {key}. Must be one of ' + ', '.join(_KEYS)
+        )
+    writer_type = seqio.FastaWriter if input_format == 'fasta' else seqio.FastqWriter
+    reader_type = seqio.FastaReader if input_format == 'fasta' else seqio.FastqReader
+    temporary = tempfile.mkdtemp(prefix='rnaseeker-sort-', dir=temporary_directory)
+    try:
+        with STATS.timer('sort'):
+            if threads <= 1 or input_path == '-' or seqio.is_gzip(input_path):
+                with reader_type(input_path) as reader:
+                    runs, count = sorted_runs(
+                        reader.parse(),
+                        key,
+                        memory,
+                        os.path.join(temporary, 'part0'),
+                        reverse,
+                    )
+            else:
+                budget = max(memory // threads, 1)
+                STATS.count('bytes_read', os.path.getsize(input_path))
+                # Python objects take about twice the space of the file text
+                ranges = seqio.chunk_offsets(input_path, budget // 2, input_format)
+                tasks = [
+                    (
+                        input_path,
+                        start,
+                        end,
+                        input_format,
+                        key,
+                        budget,
+                        os.path.join(temporary, f'part{index}'),
+                        reverse,
+                    )
+                    for index, (start, end) in enumerate(ranges)
+                ]
+                with multiprocessing.Pool(min(threads, len(tasks))) as pool:
+                    sorted_parts = pool.map(_sort_range, tasks)
+                runs = [run for part_runs, _ in sorted_parts for run in part_runs]
+                count = sum(part_count for _, part_count in sorted_parts)
+                STATS.count('records_in', count)
+        STATS.count('runs', len(runs))
+        with STATS.timer('merge'), writer_type(
+            output_path, line_length, append=False
+        ) as writer:
+            for _, description, sequence, quality in merge_runs(
+                runs, temporary, reverse, memory
+            ):
+                writer.write_sequence(
+                    seqio.SequenceRecord(sequence, description, quality)
+                )
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+    return count
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'sort',
+        description='Sort fasta/fastq files by name, length or sequence using '
+        + 'temporary files, so inputs larger than memory can be sorted.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input',
+        help="Path to fasta/fastq file, optionally gzip-compressed. Reads from "
+        + "standard input if `-'",
+    )
+    input_options.add_argument(
+        '-f',
+        '--input-format',
+        dest='input_format',
+        choices=['fasta', 'fastq'],
+        default='fasta',
+        help='Format of input file. Default is fasta',
+    )
+    sort_options = parser.add_argument_group('sort options')
+    sort_options.add_argument(
+        '-k',
+        '--key',
+        choices=list(_KEYS),
+        default='name',
+        help='Sort records by name, sequence length or sequence. Default is name',
+    )
+    sort_options.add_argument(
+        '-r',
+        '--reverse',
+        action='store_true',
+        help='Sort in descending order',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to output file. Writes to standard out if `-'. Defaults to `-'",
+    )
+    output_options.add_argument(
+        '-l',
+        '--line-length',
+        dest='line_length',
+        type=int,
+        default=80,
+        help='Maximum line length for sequence lines in output fasta file. Give 0 '
+        + 'to place entire sequence on one line. Default is 80',
+    )
+    memory_options = parser.add_argument_group('memory options')
+    memory_options.add_argument(
+        '-M',
+        '--memory',
+        type=int,
+        default=512,
+        help='Approximate memory for records being sorted or merged, in '
+        + 'megabytes, shared by all processes. Default is 512',
+    )
+    memory_options.add_argument(
+        '-t',
+        '--threads',
+        type=int,
+        default=1,
+        help='Number of processes sorting parts of the input. Default is 1',
+    )
+    memory_options.add_argument(
+        '-T',
+        '--temporary-directory',
+        dest='temporary_directory',
+        help='Directory for sorted runs. Defaults to system temporary directory',
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    with instrumentation.instrument(args, parser.prog):
+        sort_file(
+            args.input,
+            args.output,
+            args.input_format,
+            args.key,
+            args.reverse,
+            args.memory * 1024 * 1024,
+            args.threads,
+            args.temporary_directory,
+            args.line_length,
+        )
+
+
+if __name__ == '__main__':
+    main()
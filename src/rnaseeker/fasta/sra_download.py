@@ -1,38 +1,519 @@
 #!/usr/bin/env python3
+"""Download fastq files for SRA run accessions from ENA."""
+from __future__ import annotations
+
+from typing import BinaryIO, Iterable, Literal
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import urllib.parse
+import http.client
+import threading
 import argparse
+import hashlib
+import zlib
 import sys
 import os
 
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+DEFAULT_BASE_URL = "https://www.ebi.ac.uk/ena/portal/api"
+_CHUNK_SIZE = 1 << 16
+_EXTENSIONS = {"fastq.gz": ".fastq.gz", "fastq": ".fastq", "fasta": ".fasta"}
+
+
+@dataclass
+class RemoteFile:
+    """One fastq file of a run, as listed by the ENA file report."""
+
+    accession: str
+    url: str
+    md5: str
+    size: int
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(urllib.parse.urlsplit(self.url).path)
+
+
+class ConnectionPool:
+    """Keep one persistent HTTP connection per host for each thread, so
+    requests from a worker thread reuse its connections."""
+
+    def __init__(self, timeout: float = 60) -> None:
+        self.timeout = timeout
+        self._local = threading.local()
+        self._opened: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def request(
+        self, url: str, headers: dict[str, str] | None = None
+    ) -> http.client.HTTPResponse:
+        """Send a GET request and return the response. Read the response to
+        the end before the next request from the same thread."""
+        parts = urllib.parse.urlsplit(url)
+        connections = self._local.__dict__.setdefault("connections", {})
+        key = (parts.scheme, parts.netloc)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        # A kept-alive connection may have been closed by the server; retry
+        # once on a fresh one
+        for fresh in (False, True):
+            connection = connections.get(key)
+            if connection is None or fresh:
+                if connection is not None:
+                    connection.close()
+                connection_type = (
+                    http.client.HTTPSConnection
+                    if parts.scheme == "https"
+                    else http.client.HTTPConnection
+                )
+                connection = connections[key] = connection_type(
+                    parts.netloc, timeout=self.timeout
+                )
+                with self._lock:
+                    self._opened.append(connection)
+            try:
+                connection.request("GET", path, headers=headers or {})
+                return connection.getresponse()
+            except (
+                http.client.RemoteDisconnected,
+                http.client.ImproperConnectionState,
+                ConnectionError,
+            ):
+                if fresh:
+                    raise
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        """Close connections of all threads. Call once no requests are running."""
+        with self._lock:
+            for connection in self._opened:
+                connection.close()
+            self._opened.clear()
+
+
+def accession_range(
+    start: int, end: int, include: bool = True, prefix: str = "SRR"
+) -> list[str]:
+    """Return run accessions numbered from start to end."""
+    return [f"{prefix}{i}" for i in range(start, end + include)]
+
+
+def list_files(
+    accession: str, pool: ConnectionPool, base_url: str = DEFAULT_BASE_URL
+) -> list[RemoteFile]:
+    """Look up the fastq files of a run accession in the ENA file report.
+
+    File locations without a scheme are fetched with the scheme of base_url.
+    """
+    query = urllib.parse.urlencode(
+        {
+            "accession": accession,
+            "result": "read_run",
+            "fields": "run_accession,fastq_ftp,fastq_md5,fastq_bytes",
+            "format": "tsv",
+        }
+    )
+    response = pool.request(f"{base_url.rstrip('/')}/filereport?{query}")
+    body = response.read().decode()
+    if response.status != 200:
+        raise OSError(f"File report for {accession} failed: HTTP {response.status}")
+    lines = body.splitlines()
+    if len(lines) < 2:
+        raise ValueError(f"No runs found for accession {accession}")
+    header = lines[0].split("\t")
+    scheme = urllib.parse.urlsplit(base_url).scheme
+    files = []
+    for line in lines[1:]:
+        row = dict(zip(header, line.split("\t")))
+        if not row.get("fastq_ftp"):
+            continue
+        for url, md5, size in zip(
+            row["fastq_ftp"].split(";"),
+            row["fastq_md5"].split(";"),
+            row["fastq_bytes"].split(";"),
+        ):
+            if "://" not in url:
+                url = f"{scheme}://{url}"
+            files.append(RemoteFile(row["run_accession"], url, md5, int(size)))
+    if not files:
+        raise ValueError(f"No fastq files available for accession {accession}")
+    return files
+
+
+class _Pipeline:
+    """Carry downloaded bytes through the partial download file, a checksum
+    and, if requested, decompression and conversion to fasta. Nothing is
+    staged in memory beyond one chunk and one unfinished record."""
+
+    def __init__(
+        self,
+        part_path: str,
+        output_path: str | None,
+        output_format: Literal["fastq.gz", "fastq", "fasta"],
+        line_length: int,
+    ) -> None:
+        self.part = open(part_path, "ab")
+        self.md5 = hashlib.md5()
+        self.output_format = output_format
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        self._output: BinaryIO | None = None
+        self._fasta: seqio.FastaWriter | None = None
+        self._pending = b""
+        self._lines: list[bytes] = []
+        if output_format == "fastq":
+            assert output_path is not None
+            self._output = open(output_path, "wb")
+        elif output_format == "fasta":
+            assert output_path is not None
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            self._fasta = seqio.FastaWriter(output_path, line_length).__enter__()
+
+    def replay(self, path: str) -> int:
+        """Feed bytes already on disk from an earlier, interrupted download."""
+        size = 0
+        with open(path, "rb") as part:
+            while chunk := part.read(_CHUNK_SIZE):
+                self._convert(chunk)
+                size += len(chunk)
+        return size
+
+    def feed(self, data: bytes) -> None:
+        self.part.write(data)
+        self._convert(data)
+
+    def _convert(self, data: bytes) -> None:
+        self.md5.update(data)
+        if self.output_format == "fastq.gz":
+            return
+        # Files may hold several gzip members back to back
+        while data:
+            self._emit(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            data = self._decompressor.unused_data
+            self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    def _emit(self, data: bytes) -> None:
+        if self._output is not None:
+            self._output.write(data)
+            return
+        assert self._fasta is not None
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        self._lines.extend(lines)
+        records = len(self._lines) // 4 * 4
+        for i in range(0, records, 4):
+            header, sequence = self._lines[i : i + 2]
+            self._fasta.write_sequence(
+                seqio.SequenceRecord(
+                    sequence.decode().rstrip(), ">" + header.decode().rstrip()[1:]
+                )
+            )
+        del self._lines[:records]
+
+    def close(self) -> None:
+        self.part.close()
+        if self._output is not None:
+            self._output.close()
+        if self._fasta is not None:
+            if self._pending:
+                self._emit(b"\n")
+            self._fasta.__exit__(None, None, None)  # type: ignore[arg-type]
+
 
-def download_sras(start: int, end: int, include: bool = True):
-    for i in range(start, end + include):
-        accession = f"SRR{i}"
-        print(accession)
+def fetch_file(
+    remote: RemoteFile,
+    directory: str,
+    pool: ConnectionPool,
+    output_format: Literal["fastq.gz", "fastq", "fasta"] = "fastq.gz",
+    retries: int = 3,
+    line_length: int = 80,
+) -> tuple[str, int]:
+    """Download one file into directory, resuming an earlier partial
+    download and retrying interrupted transfers with Range requests, and
+    verify its MD5 checksum. With output_format `fastq' or `fasta' the
+    file is decompressed, and converted, while it downloads.
 
+    Returns:
+        tuple[str, int]: Output path and number of bytes downloaded
 
-def main(args: list[str] | None = None):
+    Raises:
+        OSError: Download failed after retries
+        ValueError: Checksum or size of the download does not match
+    """
+    stem = remote.name.removesuffix(".gz").removesuffix(".fastq").removesuffix(".fq")
+    output_path = os.path.join(directory, stem + _EXTENSIONS[output_format])
+    if os.path.exists(output_path):
+        return output_path, 0
+    part_path = os.path.join(directory, remote.name + ".part")
+    converted_path = None if output_format == "fastq.gz" else output_path + ".tmp"
+
+    def discard() -> None:
+        for path in (part_path, converted_path):
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+    downloaded = 0
+    for attempt in range(retries + 1):
+        pipeline = _Pipeline(part_path, converted_path, output_format, line_length)
+        try:
+            offset = pipeline.replay(part_path)
+            if offset < remote.size:
+                headers = {"Range": f"bytes={offset}-"} if offset else {}
+                response = pool.request(remote.url, headers)
+                if response.status == 200 and offset:
+                    # Server ignored the range and sent the whole file; start
+                    # over from this response
+                    pipeline.close()
+                    open(part_path, "wb").close()
+                    pipeline = _Pipeline(
+                        part_path, converted_path, output_format, line_length
+                    )
+                    offset = 0
+                if response.status not in (200, 206):
+                    response.read()
+                    raise OSError(f"{remote.url} failed: HTTP {response.status}")
+                received = 0
+                while chunk := response.read(_CHUNK_SIZE):
+                    pipeline.feed(chunk)
+                    received += len(chunk)
+                downloaded += received
+                if offset + received < remote.size:
+                    raise http.client.IncompleteRead(b"", remote.size - offset)
+        except zlib.error as exc:
+            pipeline.close()
+            discard()
+            raise ValueError(
+                f"{remote.name} is not valid gzip data; removed download"
+            ) from exc
+        except (OSError, http.client.HTTPException):
+            pipeline.close()
+            if attempt == retries:
+                raise
+            continue
+        pipeline.close()
+        break
+    else:
+        raise OSError(f"{remote.url} could not be resumed")
+    size = os.path.getsize(part_path)
+    if size != remote.size or (remote.md5 and pipeline.md5.hexdigest() != remote.md5):
+        discard()
+        raise ValueError(f"Checksum mismatch for {remote.name}; removed download")
+    if converted_path is None:
+        os.replace(part_path, output_path)
+    else:
+        os.replace(converted_path, output_path)
+        os.remove(part_path)
+    return output_path, downloaded
+
+
+def download_sras(
+    accessions: Iterable[str],
+    directory: str = ".",
+    base_url: str = DEFAULT_BASE_URL,
+    jobs: int = 4,
+    output_format: Literal["fastq.gz", "fastq", "fasta"] = "fastq.gz",
+    retries: int = 3,
+    timeout: float = 60,
+    line_length: int = 80,
+) -> list[tuple[str, str | Exception]]:
+    """Download fastq files of run accessions with up to `jobs' concurrent
+    transfers. A failure is reported for its file or accession and does not
+    stop the others.
+
+    Returns:
+        list[tuple[str, str | Exception]]: Accession or file name with the
+    output path or the exception that stopped it
+    """
+    if output_format not in _EXTENSIONS:
+        raise ValueError(
+            f"Invalid output format: {output_format}. Must be one of "
+            + ", ".join(_EXTENSIONS)
+        )
+    os.makedirs(directory, exist_ok=True)
+    pool = ConnectionPool(timeout)
+    results: list[tuple[str, str | Exception]] = []
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        with STATS.timer("resolve"):
+            listings = {
+                executor.submit(list_files, accession, pool, base_url): accession
+                for accession in accessions
+            }
+            remotes: list[RemoteFile] = []
+            for future in as_completed(listings):
+                try:
+                    remotes.extend(future.result())
+                except (OSError, ValueError, http.client.HTTPException) as exc:
+                    results.append((listings[future], exc))
+        with STATS.timer("download"):
+            transfers = {
+                executor.submit(
+                    fetch_file,
+                    remote,
+                    directory,
+                    pool,
+                    output_format,
+                    retries,
+                    line_length,
+                ): remote
+                for remote in remotes
+            }
+            for future in as_completed(transfers):
+                remote = transfers[future]
+                try:
+                    path, downloaded = future.result()
+                except (OSError, ValueError, http.client.HTTPException) as exc:
+                    results.append((remote.name, exc))
+                    continue
+                STATS.count("bytes_downloaded", downloaded)
+                STATS.count("files", 1)
+                results.append((remote.name, path))
+    pool.close()
+    return results
+
+
+def read_accessions(path: str) -> list[str]:
+    """Read whitespace-separated accessions from a file or standard input."""
+    if path == "-":
+        return sys.stdin.read().split()
+    with open(path, "r", encoding="UTF-8") as accession_file:
+        return accession_file.read().split()
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
     parser = argparse.ArgumentParser(
-        "sra-download", description="Download sequential SRA accessions"
+        "sra-download",
+        description="Download fastq files of SRA run accessions from ENA. "
+        + "Interrupted downloads resume where they stopped when run again.",
     )
     parser.add_argument(
-        "start", type=int, help="First SRA accession number in sequence to download"
+        "-v",
+        "--version",
+        action="version",
+        version=f"rnaseeker: {parser.prog} {__version__}",
     )
-    parser.add_argument(
-        "end", type=int, help="Last SRA accession number in sequence to download"
+    input_options = parser.add_argument_group("input options")
+    input_options.add_argument(
+        "accessions", nargs="*", help="Run accessions to download, e.g. SRR1553607"
     )
-    parser.add_argument(
+    input_options.add_argument(
+        "-r",
+        "--range",
+        dest="accession_range",
+        nargs=2,
+        type=int,
+        metavar=("START", "END"),
+        help="Download sequential run accessions numbered START to END",
+    )
+    input_options.add_argument(
         "--no-include",
-        dest="no_include",
+        dest="include",
         action="store_false",
-        help="Do not include `end' in sequence to download",
+        help="Do not include `END' in sequence to download",
+    )
+    input_options.add_argument(
+        "-p",
+        "--prefix",
+        default="SRR",
+        help="Accession prefix for numbers given with -r. Default is SRR",
+    )
+    input_options.add_argument(
+        "-i",
+        "--input",
+        help="Path to file with accessions separated by whitespace. Reads from "
+        + "standard input if `-'",
+    )
+    output_options = parser.add_argument_group("output options")
+    output_options.add_argument(
+        "-d",
+        "--directory",
+        default=".",
+        help="Directory to download files to. Default is current directory",
+    )
+    output_options.add_argument(
+        "-F",
+        "--output-format",
+        dest="output_format",
+        choices=list(_EXTENSIONS),
+        default="fastq.gz",
+        help="Keep files gzip-compressed, or decompress them, and optionally "
+        + "convert them to fasta, while they download. Default is fastq.gz",
+    )
+    output_options.add_argument(
+        "-l",
+        "--line-length",
+        dest="line_length",
+        type=int,
+        default=80,
+        help="Maximum line length for sequence lines with -F fasta. Give 0 to place "
+        + "entire sequence on one line. Default is 80",
     )
-    arguments = parser.parse_args(args)
-    download_sras(arguments.start, arguments.end, arguments.no_include)
-    sys.exit(0)
+    network_options = parser.add_argument_group("network options")
+    network_options.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent downloads. Default is 4",
+    )
+    network_options.add_argument(
+        "-u",
+        "--base-url",
+        dest="base_url",
+        default=DEFAULT_BASE_URL,
+        help=f"Base URL of the ENA portal API. Default is {DEFAULT_BASE_URL}",
+    )
+    network_options.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Number of times to resume an interrupted download. Default is 3",
+    )
+    network_options.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Seconds to wait for the server before retrying. Default is 60",
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    accessions = list(args.accessions)
+    if args.accession_range is not None:
+        accessions.extend(
+            accession_range(*args.accession_range, args.include, args.prefix)
+        )
+    if args.input is not None:
+        accessions.extend(read_accessions(args.input))
+    if not accessions:
+        parser.error("Give accessions, -r/--range or -i/--input")
+    with instrumentation.instrument(args, parser.prog):
+        results = download_sras(
+            accessions,
+            args.directory,
+            args.base_url,
+            args.jobs,
+            args.output_format,
+            args.retries,
+            args.timeout,
+            args.line_length,
+        )
+    failed = 0
+    for name, result in results:
+        if isinstance(result, Exception):
+            failed += 1
+            sys.stderr.write(f"{name}: failed: {result}\n")
+        else:
+            sys.stderr.write(f"{name}: {result}\n")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    if os.path.basename(sys.argv[0]) == os.path.basename(__file__):
-        main(sys.argv[1:])
-    else:
-        main(sys.argv[2:])
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Randomly subsample reads or read pairs from fasta/fastq files."""
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Literal, TypeVar
+import contextlib
+import argparse
+import random
+import sys
+import os
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+T = TypeVar('T')
+
+# Description, sequence and quality of one record, kept instead of the
+# record object while it waits in the reservoir
+CompactRecord = tuple[str, str, str]
+
+
+def sample_fraction(
+    items: Iterable[T], fraction: float, rng: random.Random
+) -> Iterator[T]:
+    """Yield each item with probability fraction in a single pass."""
+    draw = rng.random
+    return (item for item in items if draw() < fraction)
+
+
+def reservoir_sample(
+    items: Iterable[T], number: int, rng: random.Random
+) -> tuple[list[tuple[int, T]], int]:
+    """Choose number items uniformly at random from a stream of unknown
+    length, holding at most number items at a time.
+
+    Returns:
+        tuple[list[tuple[int, T]], int]: Chosen (position, item) pairs in
+    input order and number of items seen
+    """
+    reservoir: list[tuple[int, T]] = []
+    draw = rng.random
+    seen = 0
+    for seen, item in enumerate(items, start=1):
+        if seen <= number:
+            reservoir.append((seen - 1, item))
+            continue
+        slot = int(draw() * seen)
+        if slot < number:
+            reservoir[slot] = (seen - 1, item)
+    reservoir.sort(key=lambda entry: entry[0])
+    return reservoir, seen
+
+
+def _is_indexable(path: str) -> bool:
+    """Return whether records can be fetched again by byte offset."""
+    return path != '-' and not seqio.is_gzip(path)
+
+
+def _sample_offsets(
+    input_paths: list[str],
+    input_format: Literal['fasta', 'fastq'],
+    number: int,
+    rng: random.Random,
+) -> tuple[seqio.Reads, int]:
+    """Reservoir sample record byte ranges, then fetch the chosen records."""
+    scans = [seqio.record_ranges(path, input_format) for path in input_paths]
+    with STATS.timer('sample'):
+        chosen, total = reservoir_sample(_ranges_in_step(scans), number, rng)
+    STATS.count('records_in', total * len(input_paths))
+    for path in input_paths:
+        STATS.count('bytes_read', os.path.getsize(path))
+    # Ranges of each mate are listed now: a generator would look up `mate'
+    # only once the comprehension has moved on to the last mate
+    fetched = [
+        seqio.fetch_records(path, [ranges[mate] for _, ranges in chosen], input_format)
+        for mate, path in enumerate(input_paths)
+    ]
+    reads: seqio.Reads = zip(*fetched)
+    if len(input_paths) == 2:
+        reads = _check_names(reads)
+    return reads, total
+
+
+def _ranges_in_step(
+    scans: list[Iterator[tuple[int, int]]]
+) -> Iterator[tuple[tuple[int, int], ...]]:
+    if len(scans) == 1:
+        return ((ranges,) for ranges in scans[0])
+    return _paired_ranges(scans)
+
+
+def _paired_ranges(
+    scans: list[Iterator[tuple[int, int]]]
+) -> Iterator[tuple[tuple[int, int], ...]]:
+    yield from zip(*scans)
+    if any(next(scan, None) is not None for scan in scans):
+        raise ValueError('Paired fastq files have different numbers of records')
+
+
+def _check_names(pairs: seqio.Reads) -> seqio.Reads:
+    for pair in pairs:
+        if not seqio.is_mate_pair(pair[0].name, pair[1].name):
+            raise ValueError(
+                f'Paired fastq files are out of step: {pair[0].name} and {pair[1].name}'
+            )
+        yield pair
+
+
+def _sample_records(
+    input_paths: list[str],
+    input_format: Literal['fasta', 'fastq'],
+    number: int,
+    rng: random.Random,
+) -> tuple[seqio.Reads, int]:
+    """Reservoir sample compact records from input that cannot be read twice."""
+    with seqio.open_reads(input_paths, input_format) as records:
+        compact: Iterator[tuple[CompactRecord, ...]] = (
+            tuple(
+                (record.description, record.sequence, record.quality)
+                for record in pair
+            )
+            for pair in records
+        )
+        with STATS.timer('sample'):
+            chosen, total = reservoir_sample(compact, number, rng)
+    reads: seqio.Reads = (
+        tuple(
+            seqio.SequenceRecord(sequence, description, quality)
+            for description, sequence, quality in pair
+        )
+        for _, pair in chosen
+    )
+    return reads, total
+
+
+def subsample(
+    input_paths: list[str],
+    output_paths: list[str],
+    input_format: Literal['fasta', 'fastq'] = 'fasta',
+    number: int | None = None,
+    fraction: float | None = None,
+    seed: int | None = 0,
+    line_length: int = 80,
+) -> tuple[int, int]:
+    """Write a random subsample of reads from input_paths to output_paths.
+
+    Give either fraction, to keep each read with that probability in one
+    streaming pass, or number, to keep exactly that many reads (or all reads
+    if there are fewer). With number, uncompressed input files are first
+    scanned for record offsets only and the chosen records are then read
+    back by offset; standard input and gzip-compressed files keep the chosen
+    records themselves. Either way memory is proportional to number, not to
+    the size of the input. Give two input and output paths for paired fastq
+    reads; mates are sampled together. Output keeps input order.
+
+    Returns:
+        tuple[int, int]: Number of reads (or pairs) read and written
+    """
+    if input_format not in ('fasta', 'fastq'):
+        raise ValueError(
+            f"Invalid format for input file: {input_format}. Must be either 'fasta' or 'fastq'"
+        )
+    if len(input_paths) != len(output_paths):
+        raise ValueError('Give one output path for each input path')
+    if (number is None) == (fraction is None):
+        raise ValueError('Give exactly one of number or fraction')
+    if number is not None and number < 0:
+        raise ValueError('number must not be negative')
+    if fraction is not None and not 0 <= fraction <= 1:
+        raise ValueError('fraction must be between 0 and 1')
+    rng = random.Random(seed)
+    writer_type = seqio.FastaWriter if input_format == 'fasta' else seqio.FastqWriter
+
+    written = 0
+    with contextlib.ExitStack() as stack:
+        if fraction is not None:
+            records = stack.enter_context(
+                seqio.open_reads(input_paths, input_format)
+            )
+            total = 0
+
+            def counted(records: seqio.Reads) -> seqio.Reads:
+                nonlocal total
+                for total, pair in enumerate(records, start=1):
+                    yield pair
+
+            reads = sample_fraction(counted(records), fraction, rng)
+        elif all(map(_is_indexable, input_paths)):
+            reads, total = _sample_offsets(
+                input_paths, input_format, number, rng  # type: ignore[arg-type]
+            )
+        else:
+            reads, total = _sample_records(
+                input_paths, input_format, number, rng  # type: ignore[arg-type]
+            )
+        writers = [
+            stack.enter_context(writer_type(path, line_length, append=False))
+            for path in output_paths
+        ]
+        for written, pair in enumerate(reads, start=1):
+            for writer, record in zip(writers, pair):
+                writer.write_sequence(record)
+    return total, written
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'subsample',
+        description='Randomly subsample reads, or read pairs, from fasta/fastq '
+        + 'files by fraction or to an exact number.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input',
+        help="Path to fasta/fastq file, optionally gzip-compressed. Reads from "
+        + "standard input if `-'",
+    )
+    input_options.add_argument(
+        '-2',
+        '--input2',
+        help='Path to fastq file with second mates. Pairs are sampled together. '
+        + 'Requires -f fastq',
+    )
+    input_options.add_argument(
+        '-f',
+        '--input-format',
+        dest='input_format',
+        choices=['fasta', 'fastq'],
+        default='fasta',
+        help='Format of input file. Default is fasta',
+    )
+    sample_options = parser.add_argument_group('sampling options')
+    amount = sample_options.add_mutually_exclusive_group(required=True)
+    amount.add_argument(
+        '-n',
+        '--number',
+        type=int,
+        help='Keep exactly this many reads, or all reads if there are fewer',
+    )
+    amount.add_argument(
+        '-p',
+        '--fraction',
+        type=float,
+        help='Keep each read with this probability, between 0 and 1',
+    )
+    sample_options.add_argument(
+        '-s',
+        '--seed',
+        type=int,
+        default=0,
+        help='Seed for the random number generator. Default is 0',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to output file. Writes to standard out if `-'. Defaults to `-'",
+    )
+    output_options.add_argument(
+        '-O',
+        '--output2',
+        help='Path to output fastq file for second mates. Required with -2',
+    )
+    output_options.add_argument(
+        '-l',
+        '--line-length',
+        dest='line_length',
+        type=int,
+        default=80,
+        help='Maximum line length for sequence lines in output fasta file. Give 0 '
+        + 'to place entire sequence on one line. Default is 80',
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    input_paths = [args.input]
+    output_paths = [args.output]
+    if args.input2 is not None:
+        if args.input_format != 'fastq':
+            parser.error('-2/--input2 requires -f fastq')
+        if args.output2 is None:
+            parser.error('-O/--output2 is required with -2/--input2')
+        input_paths.append(args.input2)
+        output_paths.append(args.output2)
+    with instrumentation.instrument(args, parser.prog):
+        read, written = subsample(
+            input_paths,
+            output_paths,
+            args.input_format,
+            args.number,
+            args.fraction,
+            args.seed,
+            args.line_length,
+        )
+    sys.stderr.write(f'Kept {written} of {read} reads\n')
+
+
+if __name__ == '__main__':
+    main()
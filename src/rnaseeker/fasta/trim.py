@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""Trim low-quality ends and adapters from fastq reads."""
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Literal
+from collections import Counter
+import multiprocessing
+import itertools
+import argparse
+import sys
+
+from rnaseeker.sequence import sequence_io as seqio
+from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker.instrumentation import STATS
+
+# Description, sequence and quality of one read, sent to and from workers
+# instead of SequenceRecord objects, which are slower to pickle
+Read = tuple[str, str, str]
+
+_PHRED_OFFSETS = {'phred33': 33, 'phred64': 64}
+
+
+def quality_trim_3prime(quality: bytes, cutoff: int, offset: int = 33) -> int:
+    """Return length to keep after trimming the 3' end of a read.
+
+    Uses the BWA algorithm: the cut maximizes the sum of (cutoff - quality)
+    over the trimmed bases. The scan stops at the first position where that
+    sum drops below zero, so reads with a good 3' end cost one step.
+    """
+    threshold = cutoff + offset
+    total = 0
+    best = 0
+    keep = len(quality)
+    for position in range(len(quality) - 1, -1, -1):
+        total += threshold - quality[position]
+        if total < 0:
+            break
+        if total > best:
+            best = total
+            keep = position
+    return keep
+
+
+def sliding_window_trim(
+    quality: bytes, window: int, cutoff: int, offset: int = 33, low: bytes = b''
+) -> int:
+    """Return length to keep after cutting a read at the start of the first
+    window, scanning from 5' to 3', whose mean quality is below cutoff.
+
+    A failing window must hold a base below cutoff, so the scan starts one
+    window before the first such base, found with `bytes.translate' and
+    `bytes.find' instead of a Python loop. Give low, a translate table
+    mapping bases below cutoff to 1, to avoid building it for every read.
+    """
+    threshold = cutoff + offset
+    if not low:
+        low = bytes(int(value < threshold) for value in range(256))
+    first_low = quality.translate(low).find(1)
+    if first_low < 0:
+        return len(quality)
+    window = min(window, len(quality))
+    minimum = window * threshold
+    for start in range(max(0, first_low - window + 1), len(quality) - window + 1):
+        if sum(quality[start : start + window]) < minimum:
+            return start
+    return len(quality)
+
+
+class Adapter:
+    """3' adapter found with Myers' bit-parallel approximate matching.
+
+    One column of the edit distance matrix is held in two Python integers
+    whose bits are the vertical differences down the adapter, so each read
+    base costs a handful of integer operations regardless of adapter
+    length. An adapter may also overhang the 3' end of a read by all but
+    min_overlap bases.
+
+    Most reads hold no adapter, so the scan is seeded: a match with k errors
+    contains one of k + 1 adapter pieces exactly, and pieces are found with
+    `str.find' in C. Reads without a piece only need their last few bases
+    checked for a partial adapter.
+    """
+
+    def __init__(
+        self, sequence: str, error_rate: float = 0.1, min_overlap: int = 3
+    ) -> None:
+        if not sequence:
+            raise ValueError('Adapter sequence must not be empty')
+        self.sequence = sequence.upper()
+        self.error_rate = error_rate
+        self.min_overlap = max(1, min(min_overlap, len(sequence)))
+        self.max_errors = int(error_rate * len(sequence))
+        self._forward = self._match_masks(self.sequence)
+        # Reversed adapter prefixes by length, for finding where matches start
+        self._reverse: dict[int, dict[str, int]] = {}
+        pieces = self.max_errors + 1
+        bounds = [len(sequence) * piece // pieces for piece in range(pieces + 1)]
+        self._pieces = [
+            (start, self.sequence[start:end])
+            for start, end in zip(bounds, bounds[1:])
+            if end > start
+        ]
+
+    @staticmethod
+    def _match_masks(pattern: str) -> dict[str, int]:
+        masks: dict[str, int] = {}
+        for position, base in enumerate(pattern):
+            masks[base] = masks.get(base, 0) | 1 << position
+        return masks
+
+    @staticmethod
+    def _scan(
+        masks: dict[str, int], length: int, text: str, max_errors: int
+    ) -> tuple[int, int, int, int]:
+        """Run Myers' algorithm over text, stopping at the first position
+        where the whole pattern matches with at most max_errors.
+
+        Returns:
+            tuple[int, int, int, int]: End position of the first match, or
+        -1, its errors, and the final vertical positive and negative
+        difference vectors
+        """
+        mask = (1 << length) - 1
+        high = 1 << (length - 1)
+        positive = mask
+        negative = 0
+        score = length
+        get = masks.get
+        for position, base in enumerate(text):
+            equal = get(base, 0)
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+            horizontal_positive = negative | (~(horizontal | positive) & mask)
+            horizontal_negative = positive & horizontal
+            if horizontal_positive & high:
+                score += 1
+            elif horizontal_negative & high:
+                score -= 1
+            horizontal_positive = (horizontal_positive << 1) & mask
+            horizontal_negative = (horizontal_negative << 1) & mask
+            positive = horizontal_negative | (
+                ~(vertical | horizontal_positive) & mask
+            )
+            negative = horizontal_positive & vertical
+            if score <= max_errors:
+                return position, score, positive, negative
+        return -1, score, positive, negative
+
+    def _start(self, text: str, end: int, length: int, max_errors: int) -> int:
+        """Return where the best alignment of the first length adapter bases
+        ending at end begins, by scanning backwards with the reversed
+        pattern. Ties go to the longer alignment."""
+        masks = self._reverse.get(length)
+        if masks is None:
+            masks = self._reverse[length] = self._match_masks(
+                self.sequence[:length][::-1]
+            )
+        get = masks.get
+        window = text[max(0, end - length - max_errors + 1) : end + 1][::-1]
+        best = length + 1
+        start = end - length + 1
+        mask = (1 << length) - 1
+        high = 1 << (length - 1)
+        positive = mask
+        negative = 0
+        score = length
+        for position, base in enumerate(window):
+            equal = get(base, 0)
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+            horizontal_positive = negative | (~(horizontal | positive) & mask)
+            horizontal_negative = positive & horizontal
+            if horizontal_positive & high:
+                score += 1
+            elif horizontal_negative & high:
+                score -= 1
+            # Anchor the alignment at end: the first row starts at distance
+            # position + 1 rather than 0
+            horizontal_positive = ((horizontal_positive << 1) | 1) & mask
+            horizontal_negative = (horizontal_negative << 1) & mask
+            positive = horizontal_negative | (
+                ~(vertical | horizontal_positive) & mask
+            )
+            negative = horizontal_positive & vertical
+            if score <= best:
+                best = score
+                start = end - position
+        return start
+
+    def locate(self, sequence: str) -> int:
+        """Return position where the adapter starts in sequence, or -1.
+
+        The leftmost full match with at most error_rate errors wins;
+        otherwise the longest adapter prefix of at least min_overlap bases
+        that matches the 3' end of the read.
+        """
+        length = len(self.sequence)
+        # No match starts more than max_errors before a piece's position
+        # minus its offset in the adapter
+        seeds = [
+            found - offset
+            for offset, piece in self._pieces
+            if (found := sequence.find(piece)) >= 0
+        ]
+        if seeds:
+            begin = max(0, min(seeds) - self.max_errors)
+            end, _, _, _ = self._scan(
+                self._forward, length, sequence[begin:], self.max_errors
+            )
+            if end >= 0:
+                return self._start(sequence, begin + end, length, self.max_errors)
+        if not sequence:
+            return -1
+        # A partial adapter with at most max_errors errors fits in the tail
+        tail = max(0, len(sequence) - length + 1 - self.max_errors)
+        _, _, positive, negative = self._scan(
+            self._forward, length, sequence[tail:], -1
+        )
+        # Distances of every adapter prefix ending at the last read base are
+        # running sums of the final vertical differences
+        distances = []
+        distance = 0
+        for row in range(length - 1):
+            distance += (positive >> row & 1) - (negative >> row & 1)
+            distances.append(distance)
+        for prefix in range(min(length - 1, len(sequence)), self.min_overlap - 1, -1):
+            max_errors = int(self.error_rate * prefix)
+            if distances[prefix - 1] <= max_errors:
+                return self._start(sequence, len(sequence) - 1, prefix, max_errors)
+        return -1
+
+
+class Trimmer:
+    """Settings for trimming reads; sent to every worker with each batch."""
+
+    def __init__(
+        self,
+        adapters: Iterable[str] = (),
+        quality_cutoff: int = 0,
+        window: int = 0,
+        minimum_length: int = 1,
+        error_rate: float = 0.1,
+        min_overlap: int = 3,
+        encoding: Literal['phred33', 'phred64'] = 'phred33',
+    ) -> None:
+        self.adapters = [
+            Adapter(sequence, error_rate, min_overlap) for sequence in adapters
+        ]
+        self.quality_cutoff = quality_cutoff
+        self.window = window
+        self.minimum_length = minimum_length
+        self.offset = _PHRED_OFFSETS[encoding]
+        threshold = quality_cutoff + self.offset
+        self._low = bytes(int(value < threshold) for value in range(256))
+
+    def trim(self, read: Read, counts: Counter[str]) -> Read | None:
+        """Return trimmed read, or None if it is shorter than minimum_length
+        after trimming. Quality is trimmed before adapters."""
+        description, sequence, quality = read
+        keep = len(sequence)
+        if self.quality_cutoff > 0:
+            scores = quality.encode('ascii')
+            if self.window > 0:
+                keep = sliding_window_trim(
+                    scores, self.window, self.quality_cutoff, self.offset, self._low
+                )
+            else:
+                keep = quality_trim_3prime(scores, self.quality_cutoff, self.offset)
+            if keep < len(sequence):
+                counts['quality_trimmed_bases'] += len(sequence) - keep
+                sequence = sequence[:keep]
+        for adapter in self.adapters:
+            start = adapter.locate(sequence)
+            if start >= 0:
+                counts['adapters_found'] += 1
+                counts['adapter_trimmed_bases'] += len(sequence) - start
+                sequence = sequence[:start]
+        if len(sequence) < self.minimum_length:
+            counts['too_short'] += 1
+            return None
+        return description, sequence, quality[: len(sequence)]
+
+
+def _trim_reads(trimmer: Trimmer, batch: list[Read]) -> tuple[list[Read], Counter[str]]:
+    counts: Counter[str] = Counter()
+    trimmed = []
+    for read in batch:
+        result = trimmer.trim(read, counts)
+        if result is not None:
+            trimmed.append(result)
+    return trimmed, counts
+
+
+# Trimmer of a worker process, sent once when the pool starts rather than
+# pickled with every batch
+_worker_trimmer: Trimmer | None = None
+
+
+def _init_worker(trimmer: Trimmer) -> None:
+    global _worker_trimmer  # pylint: disable=global-statement
+    _worker_trimmer = trimmer
+
+
+def _trim_batch(batch: list[Read]) -> tuple[list[Read], Counter[str]]:
+    assert _worker_trimmer is not None, 'Worker was started without a trimmer'
+    return _trim_reads(_worker_trimmer, batch)
+
+
+def _batches(
+    records: Iterator[seqio.SequenceRecord], batch_size: int
+) -> Iterator[list[Read]]:
+    reads = (
+        (record.description, record.sequence, record.quality) for record in records
+    )
+    while batch := list(itertools.islice(reads, batch_size)):
+        yield batch
+
+
+def trim_reads(
+    input_path: str,
+    output_path: str,
+    trimmer: Trimmer,
+    threads: int = 1,
+    batch_size: int = 4096,
+    encoding: Literal['phred33', 'phred64'] = 'phred33',
+) -> Counter[str]:
+    """Trim reads from a fastq file and write survivors to a fastq file.
+
+    Batches of reads are trimmed by `threads' worker processes and written
+    in input order while the next batches are being trimmed.
+
+    Returns:
+        Counter[str]: Reads, written reads, too short reads, adapters found,
+    and bases trimmed for quality and adapters
+    """
+    counts: Counter[str] = Counter()
+    with seqio.FastqReader(input_path, encoding) as reader, seqio.FastqWriter(
+        output_path, encoding=encoding, append=False
+    ) as writer:
+        tasks = _batches(reader.parse(), batch_size)
+
+        def write(results: Iterable[tuple[list[Read], Counter[str]]]) -> None:
+            for trimmed, batch_counts in results:
+                counts.update(batch_counts)
+                counts['reads'] += len(trimmed) + batch_counts['too_short']
+                counts['written'] += len(trimmed)
+                writer.write_sequences(
+                    seqio.SequenceRecord(sequence, description, quality, encoding)
+                    for description, sequence, quality in trimmed
+                )
+
+        if threads <= 1:
+            write(_trim_reads(trimmer, batch) for batch in tasks)
+        else:
+            with multiprocessing.Pool(threads, _init_worker, (trimmer,)) as pool:
+                write(pool.imap(_trim_batch, tasks))
+    for name, value in counts.items():
+        STATS.count(name, value)
+    return counts
+
+
+def main(arguments: list[str] | None = None) -> None:
+    """Parse arguments and call function."""
+    parser = argparse.ArgumentParser(
+        'trim',
+        description='Trim low-quality 3\' ends and adapters from fastq reads and '
+        + 'drop reads that become too short.',
+    )
+    parser.add_argument(
+        '-v',
+        '--version',
+        action='version',
+        version=f'rnaseeker: {parser.prog} {__version__}',
+    )
+    input_options = parser.add_argument_group('input options')
+    input_options.add_argument(
+        'input',
+        help="Path to fastq file, optionally gzip-compressed. Reads from standard "
+        + "input if `-'",
+    )
+    input_options.add_argument(
+        '-e',
+        '--encoding',
+        choices=['phred33', 'phred64'],
+        default='phred33',
+        help='Quality score encoding of input file. Default is phred33',
+    )
+    trim_options = parser.add_argument_group('trimming options')
+    trim_options.add_argument(
+        '-q',
+        '--quality-cutoff',
+        dest='quality_cutoff',
+        type=int,
+        default=0,
+        help="Trim low-quality bases from the 3' end with the BWA algorithm, or "
+        + 'with a sliding window if -w is given. Give 0 to skip quality trimming. '
+        + 'Default is 0',
+    )
+    trim_options.add_argument(
+        '-w',
+        '--window',
+        type=int,
+        default=0,
+        help='Cut reads at the first window of this many bases whose mean quality '
+        + 'is below -q. Default is 0, which trims with the BWA algorithm instead',
+    )
+    trim_options.add_argument(
+        '-a',
+        '--adapter',
+        dest='adapters',
+        metavar='ADAPTER',
+        action='append',
+        default=[],
+        help="Sequence of a 3' adapter to remove along with everything after it. "
+        + 'Give more than once for multiple adapters',
+    )
+    trim_options.add_argument(
+        '-E',
+        '--error-rate',
+        dest='error_rate',
+        type=float,
+        default=0.1,
+        help='Maximum edit distance of an adapter match as a fraction of the '
+        + 'matched adapter length. Default is 0.1',
+    )
+    trim_options.add_argument(
+        '-O',
+        '--overlap',
+        type=int,
+        default=3,
+        help="Minimum number of adapter bases to trim at the 3' end of a read. "
+        + 'Default is 3',
+    )
+    trim_options.add_argument(
+        '-m',
+        '--minimum-length',
+        dest='minimum_length',
+        type=int,
+        default=1,
+        help='Drop reads shorter than this after trimming. Give 0 to keep reads '
+        + 'trimmed to nothing as empty records. Default is 1',
+    )
+    output_options = parser.add_argument_group('output options')
+    output_options.add_argument(
+        '-o',
+        '--output',
+        default='-',
+        help="Path to output fastq file. Writes to standard out if `-'. "
+        + "Defaults to `-'",
+    )
+    performance_options = parser.add_argument_group('performance options')
+    performance_options.add_argument(
+        '-t',
+        '--threads',
+        type=int,
+        default=1,
+        help='Number of worker processes. Default is 1',
+    )
+    performance_options.add_argument(
+        '--batch-size',
+        dest='batch_size',
+        type=int,
+        default=4096,
+        help='Number of reads sent to a worker at a time. Default is 4096',
+    )
+    instrumentation.add_arguments(parser)
+
+    args = parser.parse_args(arguments)
+    trimmer = Trimmer(
+        args.adapters,
+        args.quality_cutoff,
+        args.window,
+        args.minimum_length,
+        args.error_rate,
+        args.overlap,
+        args.encoding,
+    )
+    with instrumentation.instrument(args, parser.prog):
+        counts = trim_reads(
+            args.input,
+            args.output,
+            trimmer,
+            args.threads,
+            args.batch_size,
+            args.encoding,
+        )
+    sys.stderr.write(
+        f"Kept {counts['written']} of {counts['reads']} reads; "
+        + f"found {counts['adapters_found']} adapters\n"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -6,22 +6,45 @@
 # github: https://github.com/jtompkin/RNAseq
 from __future__ import annotations
 
+import os
 import sys
 import csv
 import argparse
 from typing import TextIO
 
 from rnaseeker.version import __version__
+from rnaseeker import instrumentation
+from rnaseeker import cache
+from rnaseeker.instrumentation import STATS
 
 _VERSION = __version__
 
 
+def read_terms(
+    in_file: TextIO, delimiter: str = ',', file_cache: cache.Cache | None = None
+) -> list[list[str]]:
+    """Read rows of gene ontology terms from input file. With file_cache, rows
+    parsed from a file on disk are reused for the same file and delimiter."""
+
+    def parse() -> list[list[str]]:
+        with instrumentation.count_reads(in_file) as counted_file:
+            return list(csv.reader(counted_file, delimiter=delimiter))
+
+    path = getattr(in_file, 'name', None)
+    if file_cache is None or not isinstance(path, str) or not os.path.isfile(path):
+        return parse()
+    return file_cache.pickled(
+        'gprofiler-terms', [path], {'delimiter': delimiter}, parse
+    )
+
+
 def filter_terms(
     in_file: TextIO,
     delimiter: str = ',',
     term_column: int = 1,
     to_filter: str = '',
     filter_path: str | None = None,
+    file_cache: cache.Cache | None = None,
 ) -> list[list[str]]:
     """Filter gene ontology terms from input file"""
     if filter_path:
@@ -29,9 +52,12 @@ def filter_terms(
             terms_to_filter = [i.rstrip() for i in filter_file.readlines()]
     else:
         terms_to_filter = [i.lstrip() for i in to_filter.split(';')]
-    with in_file:
-        in_reader = csv.reader(in_file, delimiter=delimiter)
-        return [row for row in in_reader if row[term_column] not in terms_to_filter]
+    with STATS.timer('parse'):
+        rows = read_terms(in_file, delimiter, file_cache)
+        terms = [row for row in rows if row[term_column] not in terms_to_filter]
+        STATS.count('records_in', len(rows))
+        STATS.count('records_out', len(terms))
+        return terms
 
 
 def write_terms(
@@ -44,7 +70,7 @@ def write_terms(
     pval_column: int = 4,
 ) -> None:
     """Write gene ontology terms. Optionally format output for Revigo"""
-    with out_file:
+    with STATS.timer('write'), instrumentation.count_writes(out_file) as out_file:
         if format_out:
             out_writer = csv.writer(
                 out_file, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL
@@ -158,24 +184,28 @@ def main(arguments: list[str] | None = None):
         help='Path to file containing gene ontology terms to filter. '
         + 'One gene ontology term per line. Not compatible with -f.',
     )
+    cache.add_arguments(parser)
+    instrumentation.add_arguments(parser)
 
     args = parser.parse_args(arguments)
 
-    filtered_terms = filter_terms(
-        args.gProfiler_file,
-        delimiter=args.in_delimiter,
-        to_filter=args.filter_terms,
-        filter_path=args.filter_path,
-    )
-    write_terms(
-        args.out_file,
-        terms=filtered_terms,
-        delimiter=args.out_delimiter,
-        format_out=args.format_out,
-        header=args.write_header,
-        id_column=args.id_column,
-        pval_column=args.pval_column,
-    )
+    with instrumentation.instrument(args, parser.prog):
+        filtered_terms = filter_terms(
+            args.gProfiler_file,
+            delimiter=args.in_delimiter,
+            to_filter=args.filter_terms,
+            filter_path=args.filter_path,
+            file_cache=cache.from_arguments(args),
+        )
+        write_terms(
+            args.out_file,
+            terms=filtered_terms,
+            delimiter=args.out_delimiter,
+            format_out=args.format_out,
+            header=args.write_header,
+            id_column=args.id_column,
+            pval_column=args.pval_column,
+        )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,331 @@
+"""Count bytes and records, time pipeline stages and profile sub-programs.
+
+Instrumentation is off by default. Readers, writers and sub-programs check
+`STATS.enabled' once when they open a stream or start a loop and only wrap
+their hot paths when it is set, so a disabled run pays for a handful of
+attribute lookups and nothing per record.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Generator, Iterable, Iterator, TextIO, TypeVar
+from collections import Counter
+import contextlib
+import argparse
+import cProfile
+import platform
+import signal
+import json
+import time
+import sys
+import os
+
+T = TypeVar('T')
+
+
+class Stats:
+    """Accumulate counters and stage timings for a single run."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.counters: Counter[str] = Counter()
+        self.timers: Counter[str] = Counter()
+        self._start = 0.0
+
+    def reset(self) -> None:
+        """Clear all counters and timers."""
+        self.counters.clear()
+        self.timers.clear()
+        self._start = time.perf_counter()
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add value to counter `name'."""
+        if self.enabled:
+            self.counters[name] += value
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Add seconds to timer `name'."""
+        if self.enabled:
+            self.timers[name] += seconds
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> Generator[None, None, None]:
+        """Time the body of a with block under `name'. Meant for coarse stages,
+        not per-record work; use `timed' or `timed_iter' for that."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - start
+
+    @contextlib.contextmanager
+    def suspended(self) -> Generator[None, None, None]:
+        """Disable instrumentation for the body of a with block. Used by work
+        that may run in a worker process, where counts would be lost, and that
+        reports its totals to the parent explicitly instead."""
+        enabled = self.enabled
+        self.enabled = False
+        try:
+            yield
+        finally:
+            self.enabled = enabled
+
+    def timed(self, name: str, function: Callable[..., T]) -> Callable[..., T]:
+        """Return function wrapped to add its run time to timer `name'.
+        Returns function unchanged if instrumentation is disabled."""
+        if not self.enabled:
+            return function
+        timers = self.timers
+        clock = time.perf_counter
+
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timers[name] += clock() - start
+
+        return wrapper
+
+    def timed_iter(
+        self, name: str, iterable: Iterable[T], counter: str | None = None
+    ) -> Iterator[T]:
+        """Return iterator over iterable that adds time spent producing each
+        item to timer `name' and optionally counts items under `counter'.
+        Returns a plain iterator if instrumentation is disabled."""
+        if not self.enabled:
+            return iter(iterable)
+        return self._timed_iter(name, iterable, counter)
+
+    def _timed_iter(
+        self, name: str, iterable: Iterable[T], counter: str | None
+    ) -> Generator[T, None, None]:
+        iterator = iter(iterable)
+        clock = time.perf_counter
+        elapsed = 0.0
+        items = 0
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += clock() - start
+                    return
+                elapsed += clock() - start
+                items += 1
+                yield item
+        finally:
+            self.timers[name] += elapsed
+            if counter is not None:
+                self.counters[counter] += items
+
+    def summary(self, program: str = '') -> dict[str, Any]:
+        """Return counters, timings and derived throughput as a dict."""
+        wall = time.perf_counter() - self._start
+        summary: dict[str, Any] = {
+            'program': program,
+            'wall_seconds': wall,
+            'counters': dict(self.counters),
+            'seconds': dict(self.timers),
+        }
+        if wall > 0:
+            summary['throughput'] = {
+                'mb_read_per_s': self.counters['bytes_read'] / 1_000_000 / wall,
+                'mb_written_per_s': self.counters['bytes_written'] / 1_000_000 / wall,
+                'records_in_per_s': self.counters['records_in'] / wall,
+                'records_out_per_s': self.counters['records_out'] / wall,
+            }
+        try:
+            import resource  # pylint: disable=import-outside-toplevel
+
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            summary['peak_rss_kb'] = peak // 1024 if sys.platform == 'darwin' else peak
+        except ImportError:  # Windows
+            pass
+        summary['python'] = platform.python_version()
+        return summary
+
+
+STATS = Stats()
+
+
+class CountingReader:
+    """Wrap a text stream and count characters read under `bytes_read'."""
+
+    def __init__(self, stream: TextIO, stats: Stats = STATS) -> None:
+        self.stream = stream
+        self.stats = stats
+
+    def readline(self, *args: int) -> str:
+        line = self.stream.readline(*args)
+        self.stats.counters['bytes_read'] += len(line)
+        return line
+
+    def read(self, *args: int) -> str:
+        data = self.stream.read(*args)
+        self.stats.counters['bytes_read'] += len(data)
+        return data
+
+    def __iter__(self) -> Iterator[str]:
+        counters = self.stats.counters
+        for line in self.stream:
+            counters['bytes_read'] += len(line)
+            yield line
+
+    def __enter__(self) -> CountingReader:
+        return self
+
+    def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
+        self.stream.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+
+class CountingWriter:
+    """Wrap a text stream and count characters written under `bytes_written'."""
+
+    def __init__(self, stream: TextIO, stats: Stats = STATS) -> None:
+        self.stream = stream
+        self.stats = stats
+
+    def write(self, data: str) -> int:
+        self.stats.counters['bytes_written'] += len(data)
+        return self.stream.write(data)
+
+    def writelines(self, lines: Iterable[str]) -> None:
+        lines = list(lines)
+        self.stats.counters['bytes_written'] += sum(map(len, lines))
+        self.stream.writelines(lines)
+
+    def close(self) -> None:
+        with self.stats.timer('close'):
+            self.stream.close()
+
+    def __enter__(self) -> CountingWriter:
+        return self
+
+    def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
+        self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+
+def count_reads(stream: TextIO) -> TextIO:
+    """Return stream wrapped in a CountingReader if instrumentation is enabled."""
+    if STATS.enabled:
+        return CountingReader(stream)  # type: ignore
+    return stream
+
+
+def count_writes(stream: TextIO) -> TextIO:
+    """Return stream wrapped in a CountingWriter if instrumentation is enabled."""
+    if STATS.enabled:
+        return CountingWriter(stream)  # type: ignore
+    return stream
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples the main thread's stack on SIGPROF.
+
+    Output is in collapsed-stack format (`frame;frame;frame count'), which
+    flamegraph.pl, speedscope and similar tools read directly. Only available
+    on platforms with `signal.setitimer'.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        if not hasattr(signal, 'setitimer'):
+            raise OSError('Sampling profiler requires signal.setitimer (Unix only)')
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._previous_handler: Any = None
+
+    def _sample(self, _signum: int, frame: Any) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(
+                f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+            )
+            frame = frame.f_back
+        self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+    def dump_stats(self, path: str) -> None:
+        with open(path, 'w', encoding='UTF-8') as out_file:
+            for stack, count in self.samples.most_common():
+                out_file.write(f'{stack} {count}\n')
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add --stats, --profile and --profiler options to a sub-program parser."""
+    options = parser.add_argument_group('instrumentation options')
+    options.add_argument(
+        '--stats',
+        metavar='PATH',
+        nargs='?',
+        const='-',
+        help='Write a JSON summary of bytes, records and time spent in parse, '
+        + "predicate and write stages. Writes to standard error if `-' or no path "
+        + 'is given',
+    )
+    options.add_argument(
+        '--profile',
+        metavar='PATH',
+        help='Profile the run and write results to given path',
+    )
+    options.add_argument(
+        '--profiler',
+        choices=['cprofile', 'sampling'],
+        default='cprofile',
+        help="Profiler to use with --profile. `cprofile' writes pstats data; "
+        + "`sampling' writes collapsed stacks for flame graphs. Default is `cprofile'",
+    )
+
+
+@contextlib.contextmanager
+def instrument(
+    args: argparse.Namespace, program: str = ''
+) -> Generator[Stats, None, None]:
+    """Enable statistics and profiling for the body of a with block as
+    requested by the options added with `add_arguments'."""
+    stats_path = getattr(args, 'stats', None)
+    profile_path = getattr(args, 'profile', None)
+    STATS.enabled = stats_path is not None
+    STATS.reset()
+    profiler: cProfile.Profile | SamplingProfiler | None = None
+    if profile_path is not None:
+        if getattr(args, 'profiler', 'cprofile') == 'sampling':
+            profiler = SamplingProfiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+    try:
+        yield STATS
+    finally:
+        if profiler is not None:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+            profiler.dump_stats(profile_path)
+        if stats_path is not None:
+            summary = json.dumps(STATS.summary(program), indent=2) + '\n'
+            if stats_path == '-':
+                sys.stderr.write(summary)
+            else:
+                with open(stats_path, 'w', encoding='UTF-8') as stats_file:
+                    stats_file.write(summary)
+        STATS.enabled = False
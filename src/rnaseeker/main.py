@@ -18,13 +18,42 @@ available sub-programs:
     go-filter:      Filter gProfiler output and format for Revigo
     fasta-split:    Split fasta/fastq files
     fasta-filter:   Filter fasta sequences by length and 'N' content
+    fasta-stats:    Report length, N50, GC and quality statistics
+    kmer-count:     Count canonical k-mers
+    fasta-dedup:    Remove duplicate fasta sequences
+    fastq-dedup:    Remove duplicate fastq reads or read pairs
+    subsample:      Randomly subsample reads or read pairs
+    trim:           Trim low-quality ends and adapters from fastq reads
+    sra-download:   Download fastq files of SRA run accessions
+    convert:        Convert between fasta, fastq and Parquet
+    sort:           Sort fasta/fastq files by name, length or sequence
+    fetch-regions:  Fetch sequences of BED regions from a fasta file
+    demux:          Demultiplex fastq reads by inline or header barcodes
+    motif-scan:     Scan sequences for consensus motifs and weight matrices
+    cache:          List, evict, invalidate or clear cached files
 example (show help information for fasta-split sub-program):
     rnaseeker fasta-split --help
 """
 import sys
 
 from .gene_ontology import go_filter
-from .fasta import fasta_split, fasta_filter, extract_promoters
+from . import cache
+from .fasta import (
+    fasta_split,
+    fasta_filter,
+    fasta_stats,
+    kmer_count,
+    dedup,
+    subsample,
+    trim,
+    sra_download,
+    convert,
+    sort,
+    fetch_regions,
+    demux,
+    motif_scan,
+    extract_promoters,
+)
 from .version import __version__
 
 
@@ -34,7 +63,20 @@ def main(arguments: list[str] | None = None) -> None:
         'go-filter': go_filter.main,
         'fasta-split': fasta_split.main,
         'fasta-filter': fasta_filter.main,
+        'fasta-stats': fasta_stats.main,
+        'kmer-count': kmer_count.main,
+        'fasta-dedup': dedup.fasta_main,
+        'fastq-dedup': dedup.fastq_main,
+        'subsample': subsample.main,
+        'trim': trim.main,
+        'sra-download': sra_download.main,
+        'convert': convert.main,
+        'sort': sort.main,
+        'fetch-regions': fetch_regions.main,
+        'demux': demux.main,
+        'motif-scan': motif_scan.main,
         'extract-promoters': extract_promoters.main,
+        'cache': cache.main,
     }
     programs = '{' + ', '.join(program_to_function) + '}'
     try:
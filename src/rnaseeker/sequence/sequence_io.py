@@ -1,8 +1,39 @@
 """""Manipulate sequence files and store sequence information.""" ""
 from __future__ import annotations
 
-from typing import Generator, Iterable, Literal
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Generator,
+    Iterable,
+    Iterator,
+    Literal,
+    TextIO,
+)
+from collections import OrderedDict
+import contextlib
+import itertools
+import threading
+import queue
+import gzip
 import sys
+import io
+import os
+
+from rnaseeker.instrumentation import STATS, count_reads, count_writes
+
+if TYPE_CHECKING:
+    import pyarrow
+    import pyarrow.dataset
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def is_gzip(path: str) -> bool:
+    """Return whether the file at path starts with the gzip magic number."""
+    with open(path, "rb") as stream:
+        return stream.read(2) == GZIP_MAGIC
 
 
 class SequenceRecord:
@@ -62,33 +93,142 @@ class SequenceRecord:
         return SequenceRecord("", "")
 
 
+class _ByteRange(io.RawIOBase):
+    """Raw stream over `length' bytes of a binary file from its current position."""
+
+    def __init__(self, stream: BinaryIO, length: int) -> None:
+        super().__init__()
+        self.stream = stream
+        self.remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        data = self.stream.read(size)
+        buffer[: len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self.stream.close()
+        super().close()
+
+
+def _fastq_lines(
+    stream: TextIO | BinaryIO,
+) -> Generator[tuple[Any, list[Any], Any, list[Any]], None, None]:
+    """Yield the raw header, sequence lines, `+' line and quality lines of
+    each record of a text or binary fastq stream.
+
+    Sequence and quality may each span multiple lines. The quality block
+    ends once it is as long as the sequence, so quality lines starting with
+    '@' or '+' are handled correctly. Every record has at least one quality
+    line, which is empty for a zero-length read. Reading stops at the end of
+    the stream or at a blank line in place of a header.
+    """
+    readline = stream.readline
+    header = readline()
+    spacer_mark = "+" if isinstance(header, str) else b"+"
+    while header.strip():
+        sequence_lines = []
+        length = 0
+        line = readline()
+        while line and not line.startswith(spacer_mark):
+            sequence_lines.append(line)
+            length += len(line.rstrip())
+            line = readline()
+        spacer = line
+        quality_lines = []
+        quality = 0
+        while True:
+            line = readline()
+            if not line:
+                break
+            quality_lines.append(line)
+            quality += len(line.rstrip())
+            if quality >= length:
+                break
+        yield header, sequence_lines, spacer, quality_lines
+        header = readline()
+
+
+def _join_lines(lines: list[str]) -> str:
+    """Join lines without line endings, skipping the join for one line."""
+    if len(lines) == 1:
+        return lines[0].rstrip()
+    return "".join([line.rstrip() for line in lines])
+
+
 class _SequenceFileReader:
     def __init__(
-        self, path: str, encoding: Literal["phred33", "phred64"] = "phred33"
+        self,
+        path: str,
+        encoding: Literal["phred33", "phred64"] = "phred33",
+        start: int = 0,
+        end: int | None = None,
+        is_fastq: bool = False,
     ) -> None:
         self.path = path
         self.encoding = encoding
         self.sequence_count = 0
+        self.start = start
+        self.end = end
+        self.is_fastq = is_fastq
 
     def set_sequence_count(self) -> None:
         assert hasattr(
             self, "stream"
         ), "Need to open file stream by running inside of 'with' block"
-        for line in self.stream:
-            if line.startswith(">"):
-                self.sequence_count += 1
+        if self.is_fastq:
+            # Quality lines may start with '@', so count whole records
+            self.sequence_count = sum(1 for _ in _fastq_lines(self.stream))
+        else:
+            for line in self.stream:
+                if line.startswith(">"):
+                    self.sequence_count += 1
         self.stream.seek(0)
 
     def check_format(self) -> None:
-        assert self.stream.readline().startswith(">"), "File is not fasta/fastq format."
+        assert self.stream.readline().startswith(
+            (">", "@")
+        ), "File is not fasta/fastq format."
         self.stream.seek(0)
 
     def __enter__(self):
         if self.path == "-":
             self.stream = sys.stdin
+            buffer = getattr(sys.stdin, "buffer", None)
+            if hasattr(buffer, "peek") and buffer.peek(2)[:2] == GZIP_MAGIC:  # type: ignore
+                self.stream = io.TextIOWrapper(gzip.GzipFile(fileobj=buffer))  # type: ignore
+            # Piped input cannot be rewound after checking
+            elif self.stream.seekable():
+                self.check_format()
+        elif is_gzip(self.path):
+            assert (
+                not self.start and self.end is None
+            ), "Cannot read a byte range of a gzip-compressed file."
+            self.stream = gzip.open(self.path, "rt")
+            self.check_format()
+        elif self.start or self.end is not None:
+            raw = open(self.path, "rb")
+            raw.seek(self.start)
+            end = os.fstat(raw.fileno()).st_size if self.end is None else self.end
+            assert raw.peek(1)[:1] in (
+                b">",
+                b"@",
+                b"",
+            ), "Range does not start at a fasta/fastq record."
+            self.stream = io.TextIOWrapper(
+                io.BufferedReader(_ByteRange(raw, end - self.start))  # type: ignore
+            )
         else:
             self.stream = open(self.path, "r")
-        self.check_format()
+            self.check_format()
+        self.stream = count_reads(self.stream)
         return self
 
     def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:  # type: ignore
@@ -96,22 +236,28 @@ class _SequenceFileReader:
 
 
 class FastaReader:
-    """Read fasta files"""
+    """Read fasta files. Give start and end byte offsets, e.g. from
+    `chunk_offsets', to read only the records in that part of the file."""
 
-    def __init__(self, path: str, **_kwargs: str) -> None:
-        self.reader = _SequenceFileReader(path)
+    def __init__(
+        self, path: str, start: int = 0, end: int | None = None, **_kwargs: str
+    ) -> None:
+        self.reader = _SequenceFileReader(path, start=start, end=end)
         self._last_header = ""
 
-    def parse(self) -> Generator[SequenceRecord, None, None]:
+    def parse(self) -> Iterator[SequenceRecord]:
         """Parse entire fasta file for sequences.
 
         Raises:
             AttributeError: File stream is not opened
 
-        Yields:
-            Generator[SequenceRecord, None, None]: Iterator containing sequences
+        Returns:
+            Iterator[SequenceRecord]: Iterator containing sequences
         records from file
         """
+        return STATS.timed_iter("parse", self._parse(), "records_in")
+
+    def _parse(self) -> Generator[SequenceRecord, None, None]:
         assert hasattr(
             self.reader, "stream"
         ), "Need to open file stream by running inside of 'with' block"
@@ -154,39 +300,42 @@ class FastaReader:
 
 
 class FastqReader:
-    """Read fastq files"""
+    """Read fastq files. Give start and end byte offsets, e.g. from
+    `chunk_offsets', to read only the records in that part of the file."""
 
     def __init__(
-        self, path: str, encoding: Literal["phred33", "phred64"] = "phred33"
+        self,
+        path: str,
+        encoding: Literal["phred33", "phred64"] = "phred33",
+        start: int = 0,
+        end: int | None = None,
     ) -> None:
-        self.reader = _SequenceFileReader(path, encoding)
+        self.reader = _SequenceFileReader(path, encoding, start, end, is_fastq=True)
         self._last_header = ""
 
-    def parse(self) -> Generator[SequenceRecord, None, None]:
-        """Parse fastq file and return iterator of SequenceRecord objects."""
+    def parse(self) -> Iterator[SequenceRecord]:
+        """Parse fastq file and return iterator of SequenceRecord objects.
+
+        Sequence and quality may each span multiple lines; see `_fastq_lines'
+        for how records are delimited."""
+        return STATS.timed_iter("parse", self._parse(), "records_in")
+
+    def _parse(self) -> Generator[SequenceRecord, None, None]:
         assert hasattr(
             self.reader, "stream"
         ), "Need to open file stream by running inside of 'with' block"
-        header = self.reader.stream.readline().rstrip()
-        sequence = ""
-        quality = ""
-        sequence_flag = True
-        self.reader.sequence_count = 1
-        for line in self.reader.stream:
-            if line.startswith(">"):
-                yield SequenceRecord(sequence, header, quality, self.reader.encoding)
-                header = line.rstrip()
-                sequence = ""
-                quality = ""
-                self.reader.sequence_count += 1
-            elif line.startswith("+"):  # Spacer line
-                sequence_flag = False
-            else:
-                if sequence_flag:
-                    sequence += line.rstrip()
-                else:
-                    quality += line.rstrip()
-        yield SequenceRecord(sequence, header, quality, self.reader.encoding)
+        self.reader.sequence_count = 0
+        encoding = self.reader.encoding
+        for header, sequence_lines, _, quality_lines in _fastq_lines(
+            self.reader.stream
+        ):
+            self.reader.sequence_count += 1
+            yield SequenceRecord(
+                _join_lines(sequence_lines),
+                header.rstrip(),
+                _join_lines(quality_lines),
+                encoding,
+            )
 
     def __enter__(self) -> FastqReader:
         self.reader = self.reader.__enter__()
@@ -202,42 +351,64 @@ class _SequenceFileWriter:
         path: str,
         line_length: int,
         encoding: Literal["phred33", "phred64"] = "phred33",
+        append: bool = True,
     ) -> None:
         self.path = path
         self.line_length = line_length
         self.sequences_written = 0
         self.encoding = encoding
+        self.append = append
 
     def __enter__(self) -> _SequenceFileWriter:
         if self.path == "-":
             self.stream = sys.stdout
         else:
-            self.stream = open(self.path, "a")
+            self.stream = open(self.path, "a" if self.append else "w")
+        self.stream = count_writes(self.stream)
         return self
 
     def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
+        STATS.count("records_out", self.sequences_written)
         self.stream.close()
 
 
+def _fasta_text(sequence: SequenceRecord, line_length: int) -> str:
+    """Return record as fasta text, with sequence lines of at most
+    line_length characters, or on one line if line_length is 0."""
+    if line_length <= 0:
+        sequence_split = [sequence.sequence + "\n"]
+    else:
+        sequence_split = [
+            sequence.sequence[i : i + line_length] + "\n"
+            for i in range(0, len(sequence.sequence), line_length)
+        ]
+    # Records read from fastq keep their '@' header
+    description = sequence.description
+    if not description.startswith(">"):
+        description = ">" + description[1:]
+    return "".join([description + "\n"] + sequence_split)
+
+
+def _fastq_text(sequence: SequenceRecord) -> str:
+    """Return record as fastq text."""
+    return f"@{sequence.description[1:]}\n{sequence.sequence}\n+\n{sequence.quality}\n"
+
+
 class FastaWriter:
-    """Write fasta files."""
+    """Write fasta files. Records are appended to an existing file unless
+    append is False."""
 
-    def __init__(self, path: str, line_length: int = 80, **_kwargs: str) -> None:
-        self.writer = _SequenceFileWriter(path, line_length)
+    def __init__(
+        self, path: str, line_length: int = 80, append: bool = True, **_kwargs: str
+    ) -> None:
+        self.writer = _SequenceFileWriter(path, line_length, append=append)
 
     def write_sequence(self, sequence: SequenceRecord) -> None:
         """Write single SeqRecord object to file."""
         assert hasattr(
             self.writer, "stream"
         ), "Need to open file stream by running inside of 'with' block"
-        if self.writer.line_length <= 0:
-            sequence_split = [sequence.sequence + "\n"]
-        else:
-            sequence_split = [
-                sequence.sequence[i : i + self.writer.line_length] + "\n"
-                for i in range(0, len(sequence.sequence), self.writer.line_length)
-            ]
-        self.writer.stream.writelines([sequence.description + "\n"] + sequence_split)
+        self.writer.stream.write(_fasta_text(sequence, self.writer.line_length))
         self.writer.sequences_written += 1
 
     def write_sequences(self, sequences: Iterable[SequenceRecord]) -> None:
@@ -247,6 +418,8 @@ class FastaWriter:
 
     def __enter__(self) -> FastaWriter:
         self.writer = self.writer.__enter__()
+        # Shadow the method so write_sequences is timed through it as well
+        self.write_sequence = STATS.timed("write", self.write_sequence)  # type: ignore
         return self
 
     def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
@@ -254,20 +427,26 @@ class FastaWriter:
 
 
 class FastqWriter:
-    """Write fastq files"""
+    """Write fastq files. Records are appended to an existing file unless
+    append is False."""
 
     def __init__(
         self,
         path: str,
         line_length: int = 80,
         encoding: Literal["phred33", "phred64"] = "phred33",
+        append: bool = True,
     ) -> None:
-        self.writer = _SequenceFileWriter(path, line_length, encoding)
+        self.writer = _SequenceFileWriter(path, line_length, encoding, append)
 
     def write_sequence(self, sequence: SequenceRecord) -> None:
+        """Write single SequenceRecord object to file. Sequence and quality are
+        always written on one line each, as most fastq consumers expect."""
         assert hasattr(
             self.writer, "stream"
         ), "Need to open file stream by running inside of 'with' block"
+        self.writer.stream.write(_fastq_text(sequence))
+        self.writer.sequences_written += 1
 
     def write_sequences(self, sequences: Iterable[SequenceRecord]) -> None:
         """Write multiple SequenceRecord objects to file"""
@@ -276,7 +455,722 @@ class FastqWriter:
 
     def __enter__(self) -> FastqWriter:
         self.writer = self.writer.__enter__()
+        self.write_sequence = STATS.timed("write", self.write_sequence)  # type: ignore
         return self
 
     def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
         self.writer.__exit__(exc_type, exc_value, traceback)
+
+
+class _Prefetcher:
+    """Fill a bounded queue with batches from an iterator in a background
+    thread. Exceptions raised while producing are re-raised when consumed."""
+
+    _DONE = object()
+
+    def __init__(self, batches: Iterator[list[SequenceRecord]], depth: int) -> None:
+        self._queue: queue.Queue = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(batches,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item: object) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, batches: Iterator[list[SequenceRecord]]) -> None:
+        try:
+            for batch in batches:
+                if not self._put(batch):
+                    return
+            self._put(self._DONE)
+        except BaseException as exc:  # pylint: disable=broad-except
+            self._put(exc)
+
+    def __iter__(self) -> Generator[list[SequenceRecord], None, None]:
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _record_batches(
+    records: Iterator[SequenceRecord], batch_size: int
+) -> Generator[list[SequenceRecord], None, None]:
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _mate_name(name: str) -> str:
+    """Strip a trailing /1 or /2 mate suffix from a read name."""
+    if name[-2:] in ("/1", "/2"):
+        return name[:-2]
+    return name
+
+
+def is_mate_pair(name1: str, name2: str) -> bool:
+    """Return whether two read names belong to one pair: the same name, or
+    the same apart from a /1 and /2 suffix."""
+    return name1 == name2 or _mate_name(name1) == _mate_name(name2)
+
+
+class PairedFastqReader:
+    """Read paired R1/R2 fastq files in step.
+
+    Each mate file is read in batches of records. With prefetch, a
+    background thread per mate parses the next batches while the caller
+    works on the current one, which hides file system and decompression
+    latency. With check_names, every pair's read names must match apart from
+    a /1 and /2 suffix.
+    """
+
+    def __init__(
+        self,
+        path1: str,
+        path2: str,
+        encoding: Literal["phred33", "phred64"] = "phred33",
+        prefetch: bool = False,
+        batch_size: int = 1024,
+        check_names: bool = True,
+    ) -> None:
+        self.readers = (FastqReader(path1, encoding), FastqReader(path2, encoding))
+        self.prefetch = prefetch
+        self.batch_size = batch_size
+        self.check_names = check_names
+        self.pairs_read = 0
+        self._prefetchers: list[_Prefetcher] = []
+
+    @property
+    def reader(self) -> _SequenceFileReader:
+        """File reader of the first mate, for counting records."""
+        return self.readers[0].reader
+
+    def parse(self) -> Generator[tuple[SequenceRecord, SequenceRecord], None, None]:
+        """Parse both files and yield (R1, R2) SequenceRecord pairs.
+
+        Raises:
+            ValueError: Read names of a pair differ or files have different
+        numbers of records
+        """
+        batches: list[Iterable[list[SequenceRecord]]] = [
+            _record_batches(reader.parse(), self.batch_size) for reader in self.readers
+        ]
+        if self.prefetch:
+            self._prefetchers = [_Prefetcher(iter(mate), 4) for mate in batches]
+            batches = self._prefetchers  # type: ignore[assignment]
+        mates1, mates2 = (iter(mate) for mate in batches)
+        for batch1 in mates1:
+            batch2 = next(mates2, [])
+            if len(batch1) != len(batch2):
+                raise ValueError("Paired fastq files have different numbers of records")
+            if self.check_names:
+                for index, (record1, record2) in enumerate(
+                    zip(batch1, batch2), start=self.pairs_read + 1
+                ):
+                    if not is_mate_pair(record1.name, record2.name):
+                        raise ValueError(
+                            f"Paired fastq files are out of step at read {index}: "
+                            + f"{record1.name} and {record2.name}"
+                        )
+            self.pairs_read += len(batch1)
+            yield from zip(batch1, batch2)
+        if next(mates2, None) is not None:
+            raise ValueError("Paired fastq files have different numbers of records")
+
+    def _close_prefetchers(self) -> None:
+        for prefetcher in self._prefetchers:
+            prefetcher.close()
+        self._prefetchers = []
+
+    def __enter__(self) -> PairedFastqReader:
+        for reader in self.readers:
+            reader.__enter__()
+        return self
+
+    def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:  # type: ignore
+        self._close_prefetchers()
+        for reader in self.readers:
+            reader.__exit__(exc_type, exc_value, traceback)
+
+
+# Tuples of one record, or of both mates of a pair
+Reads = Iterator[tuple[SequenceRecord, ...]]
+
+
+@contextlib.contextmanager
+def open_reads(
+    input_paths: list[str],
+    input_format: Literal["fasta", "fastq"] = "fastq",
+    prefetch: bool = False,
+) -> Generator[Reads, None, None]:
+    """Open one fasta/fastq file, or a pair of fastq files, and yield an
+    iterator over tuples of one record, or of both mates of a pair, so one
+    loop handles single and paired reads."""
+    if len(input_paths) == 2:
+        with PairedFastqReader(*input_paths, prefetch=prefetch) as pairs:
+            yield pairs.parse()
+        return
+    reader_type = FastaReader if input_format == "fasta" else FastqReader
+    with reader_type(input_paths[0]) as reader:
+        yield ((record,) for record in reader.parse())
+
+
+class PairedFastqWriter:
+    """Write (R1, R2) SequenceRecord pairs to two fastq files."""
+
+    def __init__(
+        self,
+        path1: str,
+        path2: str,
+        line_length: int = 80,
+        encoding: Literal["phred33", "phred64"] = "phred33",
+        append: bool = True,
+    ) -> None:
+        self.writers = (
+            FastqWriter(path1, line_length, encoding, append),
+            FastqWriter(path2, line_length, encoding, append),
+        )
+
+    def write_sequence(self, pair: tuple[SequenceRecord, SequenceRecord]) -> None:
+        """Write one read pair."""
+        self.writers[0].write_sequence(pair[0])
+        self.writers[1].write_sequence(pair[1])
+
+    def write_sequences(
+        self, pairs: Iterable[tuple[SequenceRecord, SequenceRecord]]
+    ) -> None:
+        """Write multiple read pairs."""
+        for pair in pairs:
+            self.write_sequence(pair)
+
+    def __enter__(self) -> PairedFastqWriter:
+        for writer in self.writers:
+            writer.__enter__()
+        return self
+
+    def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
+        for writer in self.writers:
+            writer.__exit__(exc_type, exc_value, traceback)
+
+
+class WriterPool:
+    """Write records to many fasta/fastq files, such as one per sample,
+    without opening every file at once.
+
+    Records are buffered in memory per file. A file's buffer is written out
+    when it holds buffer_size characters, or every buffer is written out
+    when all buffers together hold memory characters. At most max_open
+    files are open at a time; the least recently written file is closed to
+    open another. A file is truncated the first time it is opened and
+    reopened in append mode after that, so it continues where it left off.
+    """
+
+    def __init__(
+        self,
+        file_format: Literal["fasta", "fastq"] = "fastq",
+        max_open: int = 64,
+        buffer_size: int = 64 * 1024,
+        memory: int = 256 * 1024 * 1024,
+        line_length: int = 80,
+    ) -> None:
+        if file_format not in ("fasta", "fastq"):
+            raise ValueError(
+                f"Invalid format for output file: {file_format}. Must be either 'fasta' or 'fastq'"
+            )
+        if max_open < 1:
+            raise ValueError("max_open must be at least 1")
+        self.file_format = file_format
+        self.max_open = max_open
+        self.buffer_size = buffer_size
+        self.memory = memory
+        self.line_length = line_length
+        self.sequences_written: dict[str, int] = {}
+        self.opens = 0
+        self._opened: set[str] = set()
+        self._buffers: dict[str, list[str]] = {}
+        self._buffered: dict[str, int] = {}
+        self._total_buffered = 0
+        # Open streams, least recently written first
+        self._streams: OrderedDict[str, TextIO] = OrderedDict()
+
+    def write_sequence(self, path: str, sequence: SequenceRecord) -> None:
+        """Buffer one record for the file at path."""
+        if self.file_format == "fastq":
+            text = _fastq_text(sequence)
+        else:
+            text = _fasta_text(sequence, self.line_length)
+        buffer = self._buffers.get(path)
+        if buffer is None:
+            buffer = self._buffers[path] = []
+            self._buffered[path] = 0
+            self.sequences_written[path] = 0
+        buffer.append(text)
+        self._buffered[path] += len(text)
+        self._total_buffered += len(text)
+        self.sequences_written[path] += 1
+        if self._buffered[path] >= self.buffer_size:
+            self.flush(path)
+        elif self._total_buffered >= self.memory:
+            self.flush_all()
+
+    def _stream(self, path: str) -> TextIO:
+        stream = self._streams.get(path)
+        if stream is not None:
+            self._streams.move_to_end(path)
+            return stream
+        if len(self._streams) >= self.max_open:
+            _, evicted = self._streams.popitem(last=False)
+            evicted.close()
+        stream = count_writes(open(path, "a" if path in self._opened else "w"))
+        self._opened.add(path)
+        self._streams[path] = stream
+        self.opens += 1
+        return stream
+
+    def flush(self, path: str) -> None:
+        """Write out buffered records of the file at path."""
+        buffer = self._buffers[path]
+        if not buffer:
+            return
+        self._stream(path).write("".join(buffer))
+        buffer.clear()
+        self._total_buffered -= self._buffered[path]
+        self._buffered[path] = 0
+
+    def flush_all(self) -> None:
+        """Write out all buffered records, files already open first."""
+        for path in sorted(self._buffers, key=lambda path: path not in self._streams):
+            self.flush(path)
+
+    def close(self) -> None:
+        """Write out all buffered records and close all files."""
+        try:
+            self.flush_all()
+        finally:
+            while self._streams:
+                self._streams.popitem()[1].close()
+            STATS.count("records_out", sum(self.sequences_written.values()))
+            STATS.count("files_opened", self.opens)
+
+    def __enter__(self) -> WriterPool:
+        self.write_sequence = STATS.timed("write", self.write_sequence)  # type: ignore
+        return self
+
+    def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
+        self.close()
+
+
+def _next_record_start(
+    stream: BinaryIO, offset: int, file_format: Literal["fasta", "fastq"]
+) -> int:
+    """Return offset of first record that starts at or after offset."""
+    if offset == 0:
+        return 0
+    # Step back one byte so a record starting exactly at offset is found
+    stream.seek(offset - 1)
+    position = offset - 1 + len(stream.readline())
+    if file_format == "fasta":
+        while True:
+            line = stream.readline()
+            if not line or line.startswith(b">"):
+                return position
+            position += len(line)
+    # A fastq header starts with '@' and is followed two lines later by the
+    # '+' spacer. Quality lines may also start with '@', but the line two
+    # after one of those is a sequence line, never '+'.
+    lines = [stream.readline() for _ in range(3)]
+    while lines[0]:
+        if lines[0].startswith(b"@") and lines[2].startswith(b"+"):
+            return position
+        position += len(lines[0])
+        lines = lines[1:] + [stream.readline()]
+    return position
+
+
+def chunk_offsets(
+    path: str, chunk_size: int, file_format: Literal["fasta", "fastq"] = "fasta"
+) -> list[tuple[int, int]]:
+    """Split a sequence file into byte ranges that each start at a record.
+
+    Ranges are roughly `chunk_size' bytes; a record is never split, so a
+    single very long record yields a larger range. Fastq ranges assume
+    four-line records.
+
+    Returns:
+        list[tuple[int, int]]: (start, end) byte offsets covering the file
+    """
+    size = os.path.getsize(path)
+    starts = [0]
+    with open(path, "rb") as stream:
+        offset = chunk_size
+        while offset < size:
+            start = _next_record_start(stream, offset, file_format)
+            if start >= size:
+                break
+            if start > starts[-1]:
+                starts.append(start)
+            offset = max(start, offset) + chunk_size
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def record_ranges(
+    path: str, file_format: Literal["fasta", "fastq"] = "fasta"
+) -> Generator[tuple[int, int], None, None]:
+    """Scan an uncompressed sequence file for record boundaries without
+    building records. Sequence and quality may span multiple lines.
+
+    Yields:
+        tuple[int, int]: (start, end) byte offsets of each record
+    """
+    with open(path, "rb") as stream:
+        position = 0
+        if file_format == "fasta":
+            start = -1
+            for line in stream:
+                if line.startswith(b">"):
+                    if start >= 0:
+                        yield start, position
+                    start = position
+                position += len(line)
+            if start >= 0:
+                yield start, position
+            return
+        # Records are delimited exactly as FastqReader reads them
+        for header, sequence_lines, spacer, quality_lines in _fastq_lines(stream):
+            start = position
+            position += (
+                len(header)
+                + sum(map(len, sequence_lines))
+                + len(spacer)
+                + sum(map(len, quality_lines))
+            )
+            yield start, position
+
+
+def fetch_records(
+    path: str,
+    ranges: Iterable[tuple[int, int]],
+    file_format: Literal["fasta", "fastq"] = "fasta",
+    encoding: Literal["phred33", "phred64"] = "phred33",
+) -> Generator[SequenceRecord, None, None]:
+    """Read the records at (start, end) byte ranges of an uncompressed file,
+    e.g. from `record_ranges', in the order given. Ranges in file order are
+    read with forward seeks only."""
+    with open(path, "rb") as stream:
+        for start, end in ranges:
+            stream.seek(start)
+            lines = stream.read(end - start).decode().splitlines()
+            if file_format == "fasta":
+                yield SequenceRecord(
+                    "".join(line.rstrip() for line in lines[1:]), lines[0].rstrip()
+                )
+                continue
+            spacer = next(
+                i for i, line in enumerate(lines) if i and line.startswith("+")
+            )
+            yield SequenceRecord(
+                "".join(line.rstrip() for line in lines[1:spacer]),
+                lines[0].rstrip(),
+                "".join(line.rstrip() for line in lines[spacer + 1 :]),
+                encoding,
+            )
+
+
+_COMPLEMENT = str.maketrans(
+    "ACGTUMRWSYKVHDBNacgtumrwsykvhdbn", "TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn"
+)
+
+
+def reverse_complement(sequence: str) -> str:
+    """Return reverse complement of a DNA sequence, keeping case and IUPAC
+    ambiguity codes."""
+    return sequence.translate(_COMPLEMENT)[::-1]
+
+
+class FastaIndex:
+    """Index of sequence offsets in a fasta file, compatible with the `.fai'
+    files written by `samtools faidx'.
+
+    Each entry holds a sequence's length, the byte offset of its first base,
+    and the bases and bytes per line, so any region can be read with one
+    seek. All lines of a sequence but the last must have the same length.
+    """
+
+    def __init__(self, entries: dict[str, tuple[int, int, int, int]]) -> None:
+        self.entries = entries
+
+    @classmethod
+    def build(cls, fasta_path: str) -> FastaIndex:
+        """Scan an uncompressed fasta file and index it.
+
+        Raises:
+            ValueError: A sequence has lines of different lengths
+        """
+        entries: dict[str, tuple[int, int, int, int]] = {}
+        with open(fasta_path, "rb") as stream:
+            position = 0
+            name = ""
+            length = offset = line_bases = line_width = 0
+            last_line = False
+
+            def add() -> None:
+                if name:
+                    entries[name] = (length, offset, line_bases, line_width)
+
+            for line in stream:
+                if line.startswith(b">"):
+                    add()
+                    fields = line[1:].split(None, 1)
+                    name = fields[0].decode() if fields else ""
+                    length = line_bases = line_width = 0
+                    offset = position + len(line)
+                    last_line = False
+                elif line.strip():
+                    bases = len(line.rstrip(b"\r\n"))
+                    if last_line or (line_bases and bases > line_bases):
+                        raise ValueError(
+                            f"Different line length in sequence {name}; "
+                            + "cannot index fasta file"
+                        )
+                    if not line_bases:
+                        line_bases, line_width = bases, len(line)
+                    elif bases < line_bases:
+                        last_line = True
+                    length += bases
+                position += len(line)
+            add()
+        return cls(entries)
+
+    @classmethod
+    def read(cls, index_path: str) -> FastaIndex:
+        """Read a `.fai' file."""
+        entries = {}
+        with open(index_path, "r", encoding="UTF-8") as index_file:
+            for line in index_file:
+                fields = line.rstrip("\n").split("\t")
+                entries[fields[0]] = (
+                    int(fields[1]),
+                    int(fields[2]),
+                    int(fields[3]),
+                    int(fields[4]),
+                )
+        return cls(entries)
+
+    @classmethod
+    def load(cls, fasta_path: str, index_path: str | None = None) -> FastaIndex:
+        """Read the index of fasta_path, building and writing it first if it
+        does not exist or is older than the fasta file."""
+        index_path = index_path or fasta_path + ".fai"
+        if os.path.exists(index_path) and os.path.getmtime(
+            index_path
+        ) >= os.path.getmtime(fasta_path):
+            return cls.read(index_path)
+        index = cls.build(fasta_path)
+        index.write(index_path)
+        return index
+
+    def write(self, index_path: str) -> None:
+        """Write index as a `.fai' file."""
+        with open(index_path, "w", encoding="UTF-8") as index_file:
+            for name, entry in self.entries.items():
+                index_file.write("\t".join(map(str, (name, *entry))) + "\n")
+
+    def byte_range(self, name: str, start: int, end: int) -> tuple[int, int]:
+        """Return file offsets spanning bases start to end (0-based, end
+        exclusive) of sequence name."""
+        _, offset, line_bases, line_width = self.entries[name]
+        first = offset + start // line_bases * line_width + start % line_bases
+        last = offset + (end - 1) // line_bases * line_width + (end - 1) % line_bases
+        return first, last + 1
+
+    def fetch(self, stream: BinaryIO, name: str, start: int, end: int) -> str:
+        """Read bases start to end (0-based, end exclusive) of sequence name
+        from an open binary stream of the fasta file."""
+        if end <= start:
+            return ""
+        first, last = self.byte_range(name, start, end)
+        stream.seek(first)
+        data = stream.read(last - first)
+        return data.replace(b"\n", b"").replace(b"\r", b"").decode()
+
+
+def import_pyarrow() -> Any:
+    """Import pyarrow, which is only needed for Parquet support."""
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        import pyarrow.dataset  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:
+        raise ImportError(
+            "Parquet support requires pyarrow. Install it with "
+            + "`pip install rnaseeker[parquet]'"
+        ) from exc
+    return pyarrow
+
+
+def arrow_schema() -> pyarrow.Schema:
+    """Return Arrow schema of sequence record tables.
+
+    Description is the header without its leading '>' or '@'. Quality is
+    null for fasta records. Length duplicates the sequence length so that
+    Parquet row group statistics can skip batches by read length.
+    """
+    pa = import_pyarrow()
+    return pa.schema(
+        [
+            pa.field("name", pa.string()),
+            pa.field("description", pa.string()),
+            pa.field("sequence", pa.large_string()),
+            pa.field("quality", pa.large_string()),
+            pa.field("length", pa.int64()),
+        ]
+    )
+
+
+def record_batch(records: list[SequenceRecord]) -> pyarrow.RecordBatch:
+    """Return an Arrow record batch holding records."""
+    pa = import_pyarrow()
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array([record.name for record in records], pa.string()),
+            pa.array([record.description[1:] for record in records], pa.string()),
+            pa.array([record.sequence for record in records], pa.large_string()),
+            pa.array(
+                [record.quality or None for record in records], pa.large_string()
+            ),
+            pa.array([len(record.sequence) for record in records], pa.int64()),
+        ],
+        schema=arrow_schema(),
+    )
+
+
+class ParquetWriter:
+    """Write sequence records to a Parquet file in row groups of batch_size
+    records. Requires pyarrow."""
+
+    def __init__(
+        self, path: str, batch_size: int = 65536, compression: str = "zstd"
+    ) -> None:
+        if path == "-":
+            raise ValueError("Parquet files cannot be written to standard output")
+        self.path = path
+        self.batch_size = batch_size
+        self.compression = compression
+        self.sequences_written = 0
+        self._buffer: list[SequenceRecord] = []
+
+    def write_sequence(self, sequence: SequenceRecord) -> None:
+        """Write single SequenceRecord object to file."""
+        assert hasattr(
+            self, "writer"
+        ), "Need to open file stream by running inside of 'with' block"
+        self._buffer.append(sequence)
+        if len(self._buffer) >= self.batch_size:
+            self._flush()
+
+    def write_sequences(self, sequences: Iterable[SequenceRecord]) -> None:
+        """Write multiple SequenceRecord objects to file."""
+        for sequence in sequences:
+            self.write_sequence(sequence)
+
+    def write_batch(self, batch: pyarrow.RecordBatch) -> None:
+        """Write an Arrow record batch with the `arrow_schema' columns."""
+        self._flush()
+        pa = import_pyarrow()
+        self.writer.write_table(pa.Table.from_batches([batch]))
+        self.sequences_written += batch.num_rows
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        batch = record_batch(self._buffer)
+        self._buffer = []
+        self.write_batch(batch)
+
+    def __enter__(self) -> ParquetWriter:
+        pa = import_pyarrow()
+        self.writer = pa.parquet.ParquetWriter(
+            self.path, arrow_schema(), compression=self.compression
+        )
+        self._flush = STATS.timed("write", self._flush)  # type: ignore
+        return self
+
+    def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
+        self._flush()
+        self.writer.close()
+        STATS.count("records_out", self.sequences_written)
+
+
+class ParquetReader:
+    """Read sequence records from a Parquet file with the `arrow_schema'
+    columns. Requires pyarrow.
+
+    Give columns to read only those columns and filters, a
+    `pyarrow.dataset' expression such as `pyarrow.dataset.field("length")
+    >= 50', to skip row groups using Parquet statistics and drop
+    non-matching rows before they reach Python.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 65536,
+        columns: list[str] | None = None,
+        filters: pyarrow.dataset.Expression | None = None,
+    ) -> None:
+        if path == "-":
+            raise ValueError("Parquet files cannot be read from standard input")
+        self.path = path
+        self.batch_size = batch_size
+        self.columns = columns
+        self.filters = filters
+
+    def batches(
+        self, columns: list[str] | None = None
+    ) -> Iterator[pyarrow.RecordBatch]:
+        """Return iterator of Arrow record batches without converting them
+        to Python objects. Columns default to those given to the reader."""
+        assert hasattr(
+            self, "dataset"
+        ), "Need to open file stream by running inside of 'with' block"
+        return self.dataset.to_batches(
+            columns=columns or self.columns,
+            filter=self.filters,
+            batch_size=self.batch_size,
+        )
+
+    def parse(self) -> Iterator[SequenceRecord]:
+        """Parse file and return iterator of SequenceRecord objects. Headers
+        start with '>' and quality is empty for records without quality."""
+        return STATS.timed_iter("parse", self._parse(), "records_in")
+
+    def _parse(self) -> Generator[SequenceRecord, None, None]:
+        for batch in self.batches(["description", "sequence", "quality"]):
+            columns = batch.to_pydict()
+            for description, sequence, quality in zip(
+                columns["description"], columns["sequence"], columns["quality"]
+            ):
+                yield SequenceRecord(sequence, ">" + description, quality or "")
+
+    def __enter__(self) -> ParquetReader:
+        pa = import_pyarrow()
+        self.dataset = pa.dataset.dataset(self.path, format="parquet")
+        return self
+
+    def __exit__(self, exc_type: type, exc_value: int, traceback: str) -> None:
+        del self.dataset
@@ -0,0 +1,49 @@
+"""Tests for the on-disk cache of derived files."""
+from rnaseeker import cache
+
+
+def _build(directory):
+    with open(f'{directory}/out.txt', 'w', encoding='UTF-8') as out_file:
+        out_file.write('derived')
+
+
+def _fail(_directory):
+    raise AssertionError('entry built twice')
+
+
+def test_get_or_create_reuses_entry(tmp_path):
+    source = tmp_path / 'input.txt'
+    source.write_text('input')
+    file_cache = cache.Cache(str(tmp_path / 'cache'))
+    first = file_cache.get_or_create('test', [str(source)], {'k': 1}, _build)
+    second = file_cache.get_or_create('test', [str(source)], {'k': 1}, _fail)
+    assert first == second
+    assert [entry.namespace for entry in file_cache.entries()] == ['test']
+
+
+def test_clear_keeps_files_it_does_not_own(tmp_path):
+    source = tmp_path / 'input.txt'
+    source.write_text('input')
+    directory = tmp_path / 'cache'
+    file_cache = cache.Cache(str(directory))
+    entry = file_cache.get_or_create('test', [str(source)], {}, _build)
+    key = entry.rsplit('/', 1)[1]
+    (directory / key[:2] / f'.{key}-killed').mkdir()
+    (directory / 'notes.txt').write_text('keep')
+    (directory / 'ab').mkdir(exist_ok=True)
+    (directory / 'ab' / 'data.txt').write_text('keep')
+
+    assert file_cache.clear() == 1
+    assert file_cache.entries() == []
+    assert sorted(path.name for path in directory.iterdir()) == ['ab', 'notes.txt']
+    assert (directory / 'ab' / 'data.txt').read_text() == 'keep'
+
+
+def test_clear_removes_empty_cache_directory(tmp_path):
+    source = tmp_path / 'input.txt'
+    source.write_text('input')
+    directory = tmp_path / 'cache'
+    file_cache = cache.Cache(str(directory))
+    file_cache.get_or_create('test', [str(source)], {}, _build)
+    assert file_cache.clear() == 1
+    assert not directory.exists()
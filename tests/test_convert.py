@@ -0,0 +1,81 @@
+"""Tests of converting between fasta, fastq and Parquet."""
+import gzip
+
+import pytest
+
+from rnaseeker.fasta import convert
+from rnaseeker.sequence import sequence_io as seqio
+
+READS = [
+    ('@read1 first', 'ACGTACGTAC', 'IIIII#####'),
+    ('@read2', '', ''),
+    ('@read3', 'GGCC', '@+II'),
+]
+FASTQ = ''.join(
+    f'{name}\n{sequence}\n+\n{quality}\n' for name, sequence, quality in READS
+)
+
+
+def _records(path):
+    with seqio.FastqReader(str(path)) as reader:
+        return [
+            (record.description, record.sequence, record.quality)
+            for record in reader.parse()
+        ]
+
+
+@pytest.mark.parametrize(
+    'path, file_format',
+    [
+        ('genome.fa', 'fasta'),
+        ('reads.FASTQ.gz', 'fastq'),
+        ('reads.pq', 'parquet'),
+        ('reads.txt', None),
+    ],
+)
+def test_infer_format(path, file_format):
+    assert convert.infer_format(path) == file_format
+
+
+def test_fastq_gz_to_fasta(tmp_path):
+    input_path = tmp_path / 'reads.fq.gz'
+    input_path.write_bytes(gzip.compress(FASTQ.encode()))
+    output_path = tmp_path / 'reads.fa'
+    for _ in range(2):
+        written = convert.convert(
+            str(input_path), str(output_path), 'fastq', 'fasta', min_length=1
+        )
+    assert written == 2
+    assert output_path.read_text() == '>read1 first\nACGTACGTAC\n>read3\nGGCC\n'
+
+
+def test_fasta_to_fastq_is_refused(tmp_path):
+    (tmp_path / 'genome.fa').write_text('>chr1\nACGT\n')
+    with pytest.raises(ValueError):
+        convert.convert(
+            str(tmp_path / 'genome.fa'), str(tmp_path / 'out.fq'), 'fasta', 'fastq'
+        )
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip('pyarrow')
+    (tmp_path / 'reads.fq').write_text(FASTQ)
+    convert.convert(
+        str(tmp_path / 'reads.fq'),
+        str(tmp_path / 'reads.parquet'),
+        'fastq',
+        'parquet',
+        batch_size=2,
+    )
+    convert.convert(
+        str(tmp_path / 'reads.parquet'),
+        str(tmp_path / 'long.fq'),
+        'parquet',
+        'fastq',
+        min_length=5,
+    )
+    convert.convert(
+        str(tmp_path / 'reads.parquet'), str(tmp_path / 'all.fq'), 'parquet', 'fastq'
+    )
+    assert _records(tmp_path / 'all.fq') == READS
+    assert _records(tmp_path / 'long.fq') == READS[:1]
@@ -0,0 +1,84 @@
+"""Tests that deduplication keeps first occurrences of each sequence."""
+import random
+
+import pytest
+
+from rnaseeker.fasta import dedup
+from rnaseeker.sequence import sequence_io as seqio
+
+
+def _reads(count=300):
+    generator = random.Random(3)
+    pool = [''.join(generator.choices('ACGT', k=12)) for _ in range(40)]
+    return [(f'read{index}', generator.choice(pool)) for index in range(count)]
+
+
+def _write_fastq(path, reads):
+    path.write_text(
+        ''.join(
+            f'@{name}\n{sequence}\n+\n{"I" * len(sequence)}\n'
+            for name, sequence in reads
+        )
+    )
+
+
+def _read_names(path):
+    with seqio.FastqReader(str(path)) as reader:
+        return [record.name for record in reader.parse()]
+
+
+def _first_occurrences(keys):
+    seen = set()
+    kept = []
+    for index, key in enumerate(keys):
+        if key not in seen:
+            seen.add(key)
+            kept.append(index)
+    return kept
+
+
+@pytest.mark.parametrize('external', [False, True])
+def test_single_end(tmp_path, external):
+    reads = _reads()
+    _write_fastq(tmp_path / 'reads.fq', reads)
+    counts = dedup.deduplicate(
+        [str(tmp_path / 'reads.fq')],
+        [str(tmp_path / 'unique.fq')],
+        'fastq',
+        external=external,
+        partitions=4,
+        temporary_directory=str(tmp_path),
+    )
+    kept = _first_occurrences(sequence for _, sequence in reads)
+    assert counts == (len(reads), len(kept))
+    assert _read_names(tmp_path / 'unique.fq') == [reads[index][0] for index in kept]
+
+
+@pytest.mark.parametrize('external', [False, True])
+def test_pairs_need_both_mates_to_match(tmp_path, external):
+    mates1, mates2 = _reads(), list(reversed(_reads()))
+    _write_fastq(tmp_path / 'reads_1.fq', mates1)
+    _write_fastq(
+        tmp_path / 'reads_2.fq',
+        [(name, mate2[1]) for (name, _), mate2 in zip(mates1, mates2)],
+    )
+    dedup.deduplicate(
+        [str(tmp_path / 'reads_1.fq'), str(tmp_path / 'reads_2.fq')],
+        [str(tmp_path / 'unique_1.fq'), str(tmp_path / 'unique_2.fq')],
+        'fastq',
+        external=external,
+        partitions=4,
+    )
+    kept = _first_occurrences(
+        (mate1[1], mate2[1]) for mate1, mate2 in zip(mates1, mates2)
+    )
+    names = [mates1[index][0] for index in kept]
+    assert _read_names(tmp_path / 'unique_1.fq') == names
+    assert _read_names(tmp_path / 'unique_2.fq') == names
+
+
+def test_sequence_key_is_stable():
+    record = seqio.SequenceRecord('ACGT', '>read')
+    assert dedup.sequence_key((record,)) == dedup.sequence_key((record,))
+    assert dedup.sequence_key((record, record)) != dedup.sequence_key((record,))
+    assert dedup.sequence_key((record,)) == 5148239889300062058
@@ -0,0 +1,77 @@
+"""Tests of barcode lookup and demultiplexing."""
+import itertools
+
+import pytest
+
+from rnaseeker.fasta import demux
+from rnaseeker.sequence import sequence_io as seqio
+
+SAMPLES = {'a': 'AAA', 'b': 'AAC', 'c': 'GTT', 'd': 'CCG'}
+
+
+def _reference(barcode, samples, mismatches):
+    for sample, sample_barcode in samples.items():
+        if barcode == sample_barcode:
+            return sample
+    if not mismatches:
+        return None
+    close = [
+        sample
+        for sample, sample_barcode in samples.items()
+        if sum(map(str.__ne__, barcode, sample_barcode)) == 1
+    ]
+    return close[0] if len(close) == 1 else None
+
+
+@pytest.mark.parametrize('mismatches', [0, 1])
+def test_barcode_table_matches_reference(mismatches):
+    table, ambiguous = demux.barcode_table(SAMPLES, mismatches)
+    for bases in itertools.product('ACGTN', repeat=3):
+        barcode = ''.join(bases)
+        assert table.get(barcode) == _reference(barcode, SAMPLES, mismatches)
+    assert ('AAG' in ambiguous) == bool(mismatches)
+
+
+def test_barcode_table_rejects_shared_barcode():
+    with pytest.raises(ValueError):
+        demux.barcode_table({'a': 'ACGT', 'b': 'ACGT'})
+
+
+@pytest.mark.parametrize(
+    'description, barcode',
+    [
+        ('@M1:1:FC:1:1:1:1 1:N:0:acgt+ttga', 'ACGT+TTGA'),
+        ('@M1:1:FC:1:1:1:1 1:N:0:ACGT extra words', 'ACGT'),
+        ('@read7#ACGT/1', 'ACGT'),
+        ('@read7/1', ''),
+    ],
+)
+def test_header_barcode(description, barcode):
+    assert demux.header_barcode(description) == barcode
+
+
+def test_inline_demultiplex(tmp_path):
+    reads = [
+        ('r1', 'AAAGGGG'),
+        ('r2', 'AACTTTT'),
+        ('r3', 'ATAGGGG'),  # One mismatch from AAA only
+        ('r4', 'AAGCCCC'),  # One mismatch from AAA and AAC
+        ('r5', 'TCACCCC'),  # Two or more mismatches from every barcode
+    ]
+    input_path = tmp_path / 'reads.fq'
+    input_path.write_text(
+        ''.join(f'@{name}\n{seq}\n+\n{"I" * len(seq)}\n' for name, seq in reads)
+    )
+    counts, corrected = demux.demultiplex(
+        [str(input_path)], SAMPLES, str(tmp_path / 'out'), max_open=1
+    )
+    assert corrected == 1
+    assert counts == {'a': 2, 'b': 1, 'unassigned': 2}
+
+    def read(name):
+        with seqio.FastqReader(str(tmp_path / 'out' / f'{name}.fq')) as reader:
+            return [(record.name, record.sequence) for record in reader.parse()]
+
+    assert read('a') == [('r1', 'GGGG'), ('r3', 'GGGG')]
+    assert read('b') == [('r2', 'TTTT')]
+    assert read('unassigned') == [('r4', 'AAGCCCC'), ('r5', 'TCACCCC')]
@@ -0,0 +1,83 @@
+"""Tests that fasta-stats matches statistics computed record by record."""
+from collections import Counter
+import random
+
+import pytest
+
+from rnaseeker.fasta import fasta_stats
+
+
+def _sequences(count=60):
+    generator = random.Random(5)
+    return [
+        ''.join(generator.choices('ACGTacgtNn', k=generator.randrange(0, 400)))
+        for _ in range(count)
+    ]
+
+
+def _n50(lengths):
+    covered = 0
+    for length in sorted(lengths, reverse=True):
+        covered += length
+        if covered * 2 >= sum(lengths):
+            return length
+    return 0
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_fasta_matches_reference(tmp_path, threads):
+    sequences = _sequences()
+    path = tmp_path / 'assembly.fa'
+    path.write_text(
+        ''.join(
+            f'>contig{index}\n'
+            + ''.join(sequence[i : i + 60] + '\n' for i in range(0, len(sequence), 60))
+            for index, sequence in enumerate(sequences)
+        )
+    )
+    # Small chunks and blocks cut records across ranges and blocks
+    stats = fasta_stats.compute_stats(
+        str(path), 'fasta', threads, chunk_size=1000, block_size=100
+    )
+    text = ''.join(sequences)
+    assert stats.lengths == Counter(map(len, sequences))
+    assert stats.base_counts == {
+        'gc': sum(map(text.count, 'GCgc')),
+        'at': sum(map(text.count, 'ATat')),
+        'n': sum(map(text.count, 'Nn')),
+    }
+    assert stats.nx(0.5)[0] == _n50([len(sequence) for sequence in sequences])
+
+
+@pytest.mark.parametrize('threads', [1, 2])
+def test_fastq_quality_by_position(tmp_path, threads):
+    generator = random.Random(9)
+    reads = []
+    for _ in range(50):
+        length = generator.randrange(1, 20)
+        reads.append(
+            (
+                ''.join(generator.choices('ACGT', k=length)),
+                ''.join(generator.choices('#+5?I', k=length)),
+            )
+        )
+    path = tmp_path / 'reads.fq'
+    path.write_text(
+        ''.join(
+            f'@read{index}\n{sequence}\n+\n{quality}\n'
+            for index, (sequence, quality) in enumerate(reads)
+        )
+    )
+    stats = fasta_stats.compute_stats(
+        str(path), 'fastq', threads, chunk_size=500, block_size=100
+    )
+    assert stats.record_count == len(reads)
+    summary = stats.to_dict(offset=33)['per_position_quality']
+    for position in summary:
+        scores = [
+            ord(quality[position['position'] - 1]) - 33
+            for _, quality in reads
+            if len(quality) >= position['position']
+        ]
+        assert position['mean'] == pytest.approx(sum(scores) / len(scores))
+        assert (position['min'], position['max']) == (min(scores), max(scores))
@@ -0,0 +1,92 @@
+"""Tests that fetch-regions matches slicing chromosomes in memory."""
+import random
+import re
+
+import pytest
+
+from rnaseeker import cache
+from rnaseeker.fasta import fetch_regions
+from rnaseeker.sequence import sequence_io as seqio
+
+COMPLEMENT = str.maketrans('ACGTN', 'TGCAN')
+
+
+def _genome(tmp_path):
+    generator = random.Random(2)
+    chromosomes = {
+        f'chr{number}': ''.join(generator.choices('ACGTN', k=length))
+        for number, length in ((1, 1000), (2, 333), (3, 61))
+    }
+    path = tmp_path / 'genome.fa'
+    path.write_text(
+        ''.join(
+            f'>{name} assembled\n'
+            + ''.join(sequence[i : i + 60] + '\n' for i in range(0, len(sequence), 60))
+            for name, sequence in chromosomes.items()
+        )
+    )
+    regions = []
+    for index in range(150):
+        name = generator.choice(list(chromosomes))
+        start = generator.randrange(len(chromosomes[name]))
+        end = generator.randrange(start, min(start + 120, len(chromosomes[name])) + 1)
+        regions.append((name, start, end, f'region{index}', generator.choice('+-')))
+    bed_path = tmp_path / 'regions.bed'
+    bed_path.write_text(
+        '# comment\n'
+        + ''.join(
+            f'{name}\t{start}\t{end}\t{label}\t0\t{strand}\n'
+            for name, start, end, label, strand in regions
+        )
+        + 'chrM\t0\t10\tmissing\t0\t+\n'
+    )
+    expected = []
+    for name, start, end, label, strand in regions:
+        piece = chromosomes[name][start:end]
+        if strand == '-':
+            piece = piece.translate(COMPLEMENT)[::-1]
+        expected.append((f'{label}::{name}:{start}-{end}({strand})', piece))
+    return path, bed_path, expected
+
+
+def _position(header):
+    match = re.fullmatch(r'region\d+::(\w+):(\d+)-(\d+)\([+-]\)', header)
+    return match[1], int(match[2]), int(match[3])
+
+
+def _read(path):
+    with seqio.FastaReader(str(path)) as reader:
+        return [(record.name, record.sequence) for record in reader.parse()]
+
+
+@pytest.mark.parametrize('threads', [1, 2])
+@pytest.mark.parametrize('gap', [0, 50])
+def test_regions_match_slices(tmp_path, threads, gap):
+    fasta_path, bed_path, expected = _genome(tmp_path)
+    output_path = tmp_path / 'regions.fa'
+    written = fetch_regions.fetch_regions(
+        str(bed_path), str(fasta_path), str(output_path), threads, gap
+    )
+    assert written == len(expected)
+    assert _read(output_path) == expected
+
+
+def test_sorted_output_and_cached_index(tmp_path):
+    fasta_path, bed_path, expected = _genome(tmp_path)
+    file_cache = cache.Cache(str(tmp_path / 'cache'))
+    output_path = tmp_path / 'regions.fa'
+    for _ in range(2):
+        fetch_regions.fetch_regions(
+            str(bed_path),
+            str(fasta_path),
+            str(output_path),
+            sort_output=True,
+            file_cache=file_cache,
+        )
+    result = _read(output_path)
+    assert sorted(result) == sorted(expected)
+    assert [_position(header) for header, _ in result] == sorted(
+        _position(header) for header, _ in expected
+    )
+    assert [entry.namespace for entry in file_cache.entries()] == ['fasta-index']
+    assert not (tmp_path / 'genome.fa.fai').exists()
@@ -0,0 +1,38 @@
+"""Tests of filtering gProfiler terms, with and without the cache."""
+from rnaseeker import cache
+from rnaseeker.gene_ontology import go_filter
+
+ROWS = [
+    'source,term_name,term_id,adjusted_p_value,p_value',
+    'GO:BP,biological_process,GO:0008150,0.01,0.001',
+    'GO:BP,"cell growth, regulation",GO:0001558,0.02,0.002',
+    'GO:MF,binding,GO:0005488,0.03,0.003',
+]
+
+
+def _filter(path, file_cache=None):
+    with open(path, 'r', encoding='UTF-8') as in_file:
+        return go_filter.filter_terms(
+            in_file, to_filter='biological_process', file_cache=file_cache
+        )
+
+
+def test_filter_terms(tmp_path):
+    path = tmp_path / 'gprofiler.csv'
+    path.write_text('\n'.join(ROWS) + '\n')
+    terms = _filter(path)
+    assert [row[1] for row in terms] == [
+        'term_name',
+        'cell growth, regulation',
+        'binding',
+    ]
+
+
+def test_parsed_terms_are_cached(tmp_path):
+    path = tmp_path / 'gprofiler.csv'
+    path.write_text('\n'.join(ROWS) + '\n')
+    file_cache = cache.Cache(str(tmp_path / 'cache'))
+    expected = _filter(path)
+    assert _filter(path, file_cache) == expected
+    assert _filter(path, file_cache) == expected
+    assert [entry.namespace for entry in file_cache.entries()] == ['gprofiler-terms']
@@ -0,0 +1,75 @@
+"""Tests that kmer-count matches a count of every canonical k-mer."""
+from collections import Counter
+import random
+
+import pytest
+
+from rnaseeker.fasta import kmer_count
+
+COMPLEMENT = str.maketrans('ACGT', 'TGCA')
+
+
+def _reference(sequences, k, min_count=1):
+    counts = Counter()
+    for sequence in sequences:
+        for start in range(len(sequence) - k + 1):
+            kmer = sequence[start : start + k].upper()
+            if set(kmer) <= set('ACGT'):
+                counts[min(kmer, kmer.translate(COMPLEMENT)[::-1])] += 1
+    return {kmer: count for kmer, count in counts.items() if count >= min_count}
+
+
+def _write_fasta(path, sequences):
+    path.write_text(
+        ''.join(
+            f'>read{index}\n{sequence}\n' for index, sequence in enumerate(sequences)
+        )
+    )
+
+
+def _sequences():
+    generator = random.Random(11)
+    return [
+        ''.join(generator.choices('ACGTacgN', k=generator.randrange(0, 300)))
+        for _ in range(80)
+    ]
+
+
+@pytest.mark.parametrize('with_numpy', [True, False])
+@pytest.mark.parametrize('threads', [1, 2])
+def test_counts_match_reference(tmp_path, monkeypatch, threads, with_numpy):
+    if not with_numpy:
+        monkeypatch.setattr(kmer_count, 'import_numpy', lambda: None)
+    elif kmer_count.import_numpy() is None:
+        pytest.skip('numpy is not installed')
+    sequences = _sequences()
+    input_path = tmp_path / 'reads.fa'
+    _write_fasta(input_path, sequences)
+    output_path = tmp_path / 'kmers.tsv'
+    # Small batches and chunks spill many times from several parts
+    written = kmer_count.count_kmers(
+        str(input_path),
+        str(output_path),
+        5,
+        threads=threads,
+        shards=4,
+        min_count=2,
+        batch_size=64,
+        chunk_size=2000,
+    )
+    expected = _reference(sequences, 5, min_count=2)
+    counts = {}
+    for line in output_path.read_text().splitlines():
+        kmer, count = line.split('\t')
+        counts[kmer] = int(count)
+    assert counts == expected
+    assert written == len(expected)
+
+
+def test_binary_dump_reads_back(tmp_path):
+    sequences = _sequences()
+    input_path = tmp_path / 'reads.fa'
+    _write_fasta(input_path, sequences)
+    output_path = tmp_path / 'kmers.bin'
+    kmer_count.count_kmers(str(input_path), str(output_path), 7, output_format='binary')
+    assert dict(kmer_count.read_dump(str(output_path))) == _reference(sequences, 7)
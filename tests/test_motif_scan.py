@@ -0,0 +1,154 @@
+"""Tests that motif-scan matches scanning every window directly."""
+import random
+
+import pytest
+
+from rnaseeker.fasta import motif_scan
+from rnaseeker.sequence import sequence_io as seqio
+
+MOTIFS = [
+    motif_scan.ConsensusMotif('ebox', 'CANNTG'),
+    motif_scan.ConsensusMotif('tata', 'TATAWAW'),
+    motif_scan.ConsensusMotif('gc', 'GGGCGG'),
+]
+MATRICES = [
+    motif_scan.Matrix(
+        'ctcf',
+        [
+            [0.1, 0.7, 0.1, 0.1],
+            [0.0, 0.0, 1.0, 0.0],
+            [0.25, 0.25, 0.25, 0.25],
+            [0.6, 0.0, 0.4, 0.0],
+            [0.0, 0.1, 0.0, 0.9],
+        ],
+        20,
+    )
+]
+
+
+def _sequences(count=40):
+    generator = random.Random(4)
+    return [
+        ''.join(generator.choices('ACGTACGTacgtN', k=generator.randrange(0, 200)))
+        for _ in range(count)
+    ]
+
+
+def _no_numpy():
+    try:
+        motif_scan.import_numpy()
+    except ImportError:
+        return True
+    return False
+
+
+def _matches(window, consensus):
+    return all(base in motif_scan.IUPAC[code] for base, code in zip(window, consensus))
+
+
+def test_automaton_finds_every_occurrence():
+    generator = random.Random(8)
+    patterns = {
+        ''.join(generator.choices('ACGT', k=generator.randrange(1, 5)))
+        for _ in range(30)
+    }
+    automaton = motif_scan.Automaton((pattern, pattern) for pattern in patterns)
+    text = ''.join(generator.choices('ACGTN', k=2000))
+    found = set(automaton.find(text.encode().translate(motif_scan._ENCODE)))
+    expected = {
+        (start + len(pattern), pattern)
+        for pattern in patterns
+        for start in range(len(text) - len(pattern) + 1)
+        if text.startswith(pattern, start)
+    }
+    assert found == expected
+
+
+def test_consensus_hits_match_windows():
+    sequences = _sequences()
+    hits = motif_scan.Scanner(MOTIFS).scan(sequences)
+    expected = []
+    for record, sequence in enumerate(sequences):
+        sequence = sequence.upper()
+        for start in range(len(sequence)):
+            for motif in MOTIFS:
+                window = sequence[start : start + len(motif.consensus)]
+                if len(window) < len(motif.consensus):
+                    continue
+                for strand, consensus in (
+                    ('+', motif.consensus),
+                    ('-', seqio.reverse_complement(motif.consensus)),
+                ):
+                    if _matches(window, consensus):
+                        end = start + len(window)
+                        expected.append((record, start, end, motif.name, strand, None))
+    assert sorted(hits) == sorted(expected)
+    assert hits == sorted(hits, key=lambda hit: (hit[0], hit[1]))
+
+
+def test_matrix_hits_match_windows():
+    if _no_numpy():
+        pytest.skip('numpy is not installed')
+    sequences = _sequences()
+    threshold = 0.7
+    hits = motif_scan.Scanner(matrices=MATRICES, threshold=threshold).scan(sequences)
+    forward = motif_scan.log_odds(MATRICES[0], [0.25] * 4)
+    reverse = [row[::-1] for row in forward[::-1]]
+    low = sum(map(min, forward))
+    minimum = low + threshold * (sum(map(max, forward)) - low)
+    expected = []
+    for record, sequence in enumerate(sequences):
+        sequence = sequence.upper()
+        for start in range(len(sequence) - len(forward) + 1):
+            window = sequence[start : start + len(forward)]
+            if 'N' in window:
+                continue
+            for strand, scores in (('+', forward), ('-', reverse)):
+                score = sum(
+                    row['ACGT'.index(base)] for row, base in zip(scores, window)
+                )
+                if score >= minimum - 1e-9:
+                    expected.append((record, start, start + 5, 'ctcf', strand, score))
+    assert len(hits) == len(expected) > 0
+    for hit, reference in zip(sorted(hits), sorted(expected)):
+        assert hit[:5] == reference[:5]
+        assert hit[5] == pytest.approx(reference[5])
+
+
+def test_genome_position_of_minus_strand_region():
+    generator = random.Random(6)
+    chromosome = ''.join(generator.choices('ACGT', k=100))
+    fetched = seqio.reverse_complement(chromosome[10:40])
+    for start, end, strand in ((0, 6, '+'), (3, 11, '-'), (24, 30, '+')):
+        name, first, last, genome_strand = motif_scan.genome_position(
+            'peak1::chr1:10-40(-)', start, end, strand
+        )
+        assert (name, genome_strand) == ('chr1', '+' if strand == '-' else '-')
+        assert seqio.reverse_complement(chromosome[first:last]) == fetched[start:end]
+    assert motif_scan.genome_position('chr2:5-50', 1, 4, '+') == ('chr2', 6, 9, '+')
+    with pytest.raises(ValueError):
+        motif_scan.genome_position('read1', 0, 1, '+')
+
+
+def test_workers_write_same_hits(tmp_path):
+    path = tmp_path / 'sequences.fa'
+    path.write_text(
+        ''.join(
+            f'>seq{index}\n{sequence}\n' for index, sequence in enumerate(_sequences())
+        )
+    )
+    scanner = motif_scan.Scanner(MOTIFS)
+    outputs = []
+    for threads in (1, 2):
+        output_path = tmp_path / f'hits{threads}.tsv'
+        motif_scan.scan_motifs(
+            str(path),
+            str(output_path),
+            scanner,
+            'tsv',
+            threads=threads,
+            batch_bases=500,
+        )
+        outputs.append(output_path.read_text())
+    assert outputs[0] == outputs[1]
+    assert outputs[0].count('\n') > 1
@@ -0,0 +1,74 @@
+"""Tests of reading, filtering and splitting paired fastq files."""
+import pytest
+
+from rnaseeker.fasta import fasta_filter, fasta_split
+from rnaseeker.sequence import sequence_io as seqio
+
+MATES1 = [(f'pair{index}/1', 'ACGT' * (index % 4 + 1)) for index in range(10)]
+MATES2 = [(f'pair{index}/2', 'GGN' * (index % 3 + 1)) for index in range(10)]
+
+
+def _write(path, reads):
+    path.write_text(
+        ''.join(f'@{name}\n{seq}\n+\n{"I" * len(seq)}\n' for name, seq in reads)
+    )
+
+
+def _read(path):
+    with seqio.FastqReader(str(path)) as reader:
+        return [(record.name, record.sequence) for record in reader.parse()]
+
+
+@pytest.mark.parametrize('prefetch', [False, True])
+def test_paired_reader_keeps_mates_in_step(tmp_path, prefetch):
+    _write(tmp_path / 'r1.fq', MATES1)
+    _write(tmp_path / 'r2.fq', MATES2)
+    with seqio.PairedFastqReader(
+        str(tmp_path / 'r1.fq'), str(tmp_path / 'r2.fq'), prefetch=prefetch
+    ) as reader:
+        pairs = [(mate1.name, mate2.name) for mate1, mate2 in reader.parse()]
+    assert pairs == [(name1, name2) for (name1, _), (name2, _) in zip(MATES1, MATES2)]
+
+
+def test_paired_reader_rejects_out_of_step_files(tmp_path):
+    _write(tmp_path / 'r1.fq', MATES1)
+    _write(tmp_path / 'r2.fq', MATES2[1:] + MATES2[:1])
+    with pytest.raises(ValueError), seqio.PairedFastqReader(
+        str(tmp_path / 'r1.fq'), str(tmp_path / 'r2.fq')
+    ) as reader:
+        list(reader.parse())
+
+
+def test_filter_keeps_pairs_where_both_mates_pass(tmp_path):
+    _write(tmp_path / 'r1.fq', MATES1)
+    _write(tmp_path / 'r2.fq', MATES2)
+    fasta_filter.filter_fastq(
+        [str(tmp_path / 'r1.fq'), str(tmp_path / 'r2.fq')],
+        [str(tmp_path / 'out1.fq'), str(tmp_path / 'out2.fq')],
+        8,
+    )
+    kept = [
+        index
+        for index, ((_, seq1), (_, seq2)) in enumerate(zip(MATES1, MATES2))
+        if min(len(seq1), len(seq2)) >= 8 >= max(seq1.count('N'), seq2.count('N'))
+    ]
+    assert 0 < len(kept) < len(MATES1)
+    assert _read(tmp_path / 'out1.fq') == [MATES1[index] for index in kept]
+    assert _read(tmp_path / 'out2.fq') == [MATES2[index] for index in kept]
+
+
+def test_split_writes_matching_mate_files(tmp_path):
+    _write(tmp_path / 'r1.fq', MATES1)
+    _write(tmp_path / 'r2.fq', MATES2)
+    fasta_split.split_file(
+        3,
+        str(tmp_path / 'r1.fq'),
+        'fastq',
+        directory=str(tmp_path / 'split'),
+        prefix='part',
+        input_path2=str(tmp_path / 'r2.fq'),
+    )
+    for mate, reads in ((1, MATES1), (2, MATES2)):
+        parts = [_read(tmp_path / 'split' / f'part{n}_R{mate}.fq') for n in (1, 2, 3)]
+        assert [len(part) for part in parts] == [4, 3, 3]
+        assert sum(parts, []) == reads
@@ -0,0 +1,72 @@
+"""Round-trip tests for sequence_io readers and writers."""
+from rnaseeker.sequence import sequence_io as seqio
+
+RECORDS = [
+    ('@read1 1:N:0:ACGT', 'ACGTACGT', 'IIIIIIII'),
+    ('@empty', '', ''),
+    ('@read3', 'GGCC', '@+II'),
+]
+
+WRAPPED = '@wrapped\nACGT\nACG\n+\n@+@\nIIII\n'
+
+
+def _write(path, records):
+    with seqio.FastqWriter(str(path)) as writer:
+        for description, sequence, quality in records:
+            writer.write_sequence(seqio.SequenceRecord(sequence, description, quality))
+
+
+def _read(path):
+    with seqio.FastqReader(str(path)) as reader:
+        return [
+            (record.description, record.sequence, record.quality)
+            for record in reader.parse()
+        ]
+
+
+def test_fastq_round_trip_keeps_empty_read(tmp_path):
+    path = tmp_path / 'reads.fq'
+    _write(path, RECORDS)
+    assert _read(path) == RECORDS
+
+
+def test_fastq_reads_wrapped_record(tmp_path):
+    path = tmp_path / 'wrapped.fq'
+    path.write_text(WRAPPED)
+    _write(path, RECORDS)
+    assert _read(path) == [('@wrapped', 'ACGTACG', '@+@IIII'), *RECORDS]
+
+
+def test_fastq_sequence_count(tmp_path):
+    path = tmp_path / 'wrapped.fq'
+    path.write_text(WRAPPED)
+    _write(path, RECORDS)
+    with seqio.FastqReader(str(path)) as reader:
+        reader.reader.set_sequence_count()
+        assert reader.reader.sequence_count == 4
+
+
+def test_record_ranges_match_reader(tmp_path):
+    path = tmp_path / 'wrapped.fq'
+    path.write_text(WRAPPED)
+    _write(path, RECORDS)
+    ranges = list(seqio.record_ranges(str(path), 'fastq'))
+    fetched = [
+        (record.description, record.sequence, record.quality)
+        for record in seqio.fetch_records(str(path), ranges, 'fastq')
+    ]
+    assert fetched == _read(path)
+    assert ranges[-1][1] == path.stat().st_size
+
+
+def test_writer_pool_overwrites_then_appends(tmp_path):
+    paths = [str(tmp_path / f'sample{index}.fq') for index in range(3)]
+    for _ in range(2):
+        with seqio.WriterPool('fastq', max_open=1, buffer_size=1) as pool:
+            for round_number in range(2):
+                for path in paths:
+                    pool.write_sequence(
+                        path, seqio.SequenceRecord('ACGT', f'@r{round_number}', 'IIII')
+                    )
+    for path in paths:
+        assert [record[0] for record in _read(path)] == ['@r0', '@r1']
@@ -0,0 +1,62 @@
+"""Tests that external-memory sort matches an in-memory sort."""
+import random
+
+import pytest
+
+from rnaseeker.fasta import sort
+from rnaseeker.sequence import sequence_io as seqio
+
+
+def _records(count=200):
+    generator = random.Random(7)
+    return [
+        (
+            f'read{generator.randrange(50)}_{index}',
+            ''.join(generator.choices('ACGT', k=generator.randrange(1, 30))),
+        )
+        for index in range(count)
+    ]
+
+
+def _write_fasta(path, records):
+    path.write_text(''.join(f'>{name}\n{sequence}\n' for name, sequence in records))
+
+
+def _read_fasta(path):
+    with seqio.FastaReader(str(path)) as reader:
+        return [(record.name, record.sequence) for record in reader.parse()]
+
+
+@pytest.mark.parametrize('threads', [1, 2])
+@pytest.mark.parametrize('key', ['name', 'length', 'sequence'])
+def test_sort_matches_sorted(tmp_path, key, threads):
+    records = _records()
+    input_path = tmp_path / 'reads.fa'
+    output_path = tmp_path / 'sorted.fa'
+    _write_fasta(input_path, records)
+    get_key = {
+        'name': lambda record: record[0],
+        'length': lambda record: len(record[1]),
+        'sequence': lambda record: record[1],
+    }[key]
+    # A tiny memory budget spills many runs and merges them in several passes
+    count = sort.sort_file(
+        str(input_path), str(output_path), key=key, memory=2000, threads=threads
+    )
+    assert count == len(records)
+    result = _read_fasta(output_path)
+    if threads == 1:
+        assert result == sorted(records, key=get_key)
+    else:
+        assert sorted(map(get_key, result)) == list(map(get_key, result))
+        assert sorted(result) == sorted(records)
+
+
+def test_sort_overwrites_output(tmp_path):
+    records = [('b', 'ACGT'), ('a', 'GG')]
+    input_path = tmp_path / 'reads.fa'
+    output_path = tmp_path / 'sorted.fa'
+    _write_fasta(input_path, records)
+    for _ in range(2):
+        sort.sort_file(str(input_path), str(output_path))
+    assert _read_fasta(output_path) == [('a', 'GG'), ('b', 'ACGT')]
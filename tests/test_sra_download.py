@@ -0,0 +1,123 @@
+"""Tests of sra-download against a local stand-in for the ENA server."""
+import http.server
+import threading
+import hashlib
+import gzip
+
+import pytest
+
+from rnaseeker.fasta import sra_download
+
+READS = [('@SRR1.1 read one', 'ACGTACGTAC'), ('@SRR1.2 read two', 'GGCCAATT')]
+FASTQ = ''.join(
+    f'{name}\n{sequence}\n+\n{"I" * len(sequence)}\n' for name, sequence in READS
+).encode()
+DATA = gzip.compress(FASTQ) + gzip.compress(FASTQ)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if self.path.startswith('/api/filereport'):
+            host, port = server.server_address
+            body = (
+                'run_accession\tfastq_ftp\tfastq_md5\tfastq_bytes\n'
+                + f'SRR1\t{host}:{port}/files/SRR1_1.fastq.gz\t{server.md5}\t'
+                + f'{len(DATA)}\n'
+            ).encode()
+            self._send(200, body)
+            return
+        server.ranges.append(self.headers.get('Range'))
+        start = 0
+        if self.headers.get('Range') and server.honour_range:
+            start = int(self.headers['Range'].removeprefix('bytes=').rstrip('-'))
+        body = DATA[start:]
+        status = 206 if start else 200
+        if server.cut_after is not None:
+            # Promise the whole body but hang up partway through it
+            cut_after, server.cut_after = server.cut_after, None
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:cut_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self._send(status, body)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.md5 = hashlib.md5(DATA).hexdigest()
+    server.honour_range = True
+    server.cut_after = None
+    server.ranges = []
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True
+    )
+    thread.start()
+    server.base_url = 'http://{}:{}/api'.format(*server.server_address)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _download(server, directory, output_format='fastq.gz', retries=3):
+    results = sra_download.download_sras(
+        ['SRR1'],
+        str(directory),
+        server.base_url,
+        output_format=output_format,
+        retries=retries,
+        timeout=5,
+    )
+    assert len(results) == 1
+    return results[0][1]
+
+
+def test_interrupted_download_resumes_with_range(server, tmp_path):
+    server.cut_after = len(DATA) // 2
+    path = _download(server, tmp_path)
+    with open(path, 'rb') as download:
+        assert download.read() == DATA
+    assert server.ranges == [None, f'bytes={len(DATA) // 2}-']
+
+
+def test_server_ignoring_range_sends_file_once(server, tmp_path):
+    server.honour_range = False
+    (tmp_path / 'SRR1_1.fastq.gz.part').write_bytes(DATA[:10])
+    path = _download(server, tmp_path, retries=0)
+    with open(path, 'rb') as download:
+        assert download.read() == DATA
+    assert server.ranges == ['bytes=10-']
+    assert not (tmp_path / 'SRR1_1.fastq.gz.part').exists()
+
+
+def test_checksum_mismatch_removes_download(server, tmp_path):
+    server.md5 = '0' * 32
+    result = _download(server, tmp_path)
+    assert isinstance(result, ValueError)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_fastq_gz_converted_to_fasta(server, tmp_path):
+    server.cut_after = 25
+    path = _download(server, tmp_path, output_format='fasta')
+    assert path.endswith('SRR1_1.fasta')
+    with open(path, 'r', encoding='UTF-8') as fasta:
+        assert fasta.read() == ''.join(
+            f'>{name[1:]}\n{sequence}\n' for name, sequence in READS * 2
+        )
+    assert sorted(item.name for item in tmp_path.iterdir()) == ['SRR1_1.fasta']
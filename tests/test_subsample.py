@@ -0,0 +1,83 @@
+"""Tests of subsampling reads and read pairs."""
+import random
+import gzip
+
+import pytest
+
+from rnaseeker.fasta import subsample
+from rnaseeker.sequence import sequence_io as seqio
+
+READS = [(f'read{index}', 'ACGT'[index % 4] * (index % 7 + 1)) for index in range(100)]
+
+
+def _fastq(reads, mate=''):
+    return ''.join(
+        f'@{name}{mate}\n{sequence}\n+\n{"I" * len(sequence)}\n'
+        for name, sequence in reads
+    )
+
+
+def _read(path):
+    with seqio.FastqReader(str(path)) as reader:
+        return [(record.name, record.sequence) for record in reader.parse()]
+
+
+def test_reservoir_sample_is_uniform():
+    rng = random.Random(1)
+    hits = [0] * 10
+    for _ in range(20000):
+        chosen, seen = subsample.reservoir_sample(range(10), 3, rng)
+        assert seen == 10
+        assert [position for position, _ in chosen] == sorted(
+            item for _, item in chosen
+        )
+        for _, item in chosen:
+            hits[item] += 1
+    for count in hits:
+        assert count / 20000 == pytest.approx(0.3, abs=0.02)
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_number_keeps_input_order(tmp_path, compressed):
+    input_path = tmp_path / ('reads.fq.gz' if compressed else 'reads.fq')
+    if compressed:
+        input_path.write_bytes(gzip.compress(_fastq(READS).encode()))
+    else:
+        input_path.write_text(_fastq(READS))
+    counts = subsample.subsample(
+        [str(input_path)], [str(tmp_path / 'sample.fq')], 'fastq', number=10
+    )
+    sample = _read(tmp_path / 'sample.fq')
+    assert counts == (100, 10)
+    assert len(set(sample)) == 10
+    assert sorted(sample, key=READS.index) == sample
+    assert set(sample) <= set(READS)
+
+
+def test_indexed_and_streamed_sampling_agree(tmp_path):
+    (tmp_path / 'reads.fq').write_text(_fastq(READS))
+    (tmp_path / 'reads.fq.gz').write_bytes(gzip.compress(_fastq(READS).encode()))
+    for name in ('reads.fq', 'reads.fq.gz'):
+        subsample.subsample(
+            [str(tmp_path / name)], [str(tmp_path / f'{name}.out')], 'fastq', number=25
+        )
+    assert _read(tmp_path / 'reads.fq.out') == _read(tmp_path / 'reads.fq.gz.out')
+
+
+@pytest.mark.parametrize('mode', [{'number': 30}, {'fraction': 0.3}])
+def test_mates_are_sampled_together(tmp_path, mode):
+    (tmp_path / 'reads_1.fq').write_text(_fastq(READS, '/1'))
+    mates = {name: sequence[::-1] + 'T' for name, sequence in READS}
+    (tmp_path / 'reads_2.fq').write_text(_fastq(mates.items(), '/2'))
+    subsample.subsample(
+        [str(tmp_path / 'reads_1.fq'), str(tmp_path / 'reads_2.fq')],
+        [str(tmp_path / 'sample_1.fq'), str(tmp_path / 'sample_2.fq')],
+        'fastq',
+        **mode,
+    )
+    sample1 = _read(tmp_path / 'sample_1.fq')
+    sample2 = _read(tmp_path / 'sample_2.fq')
+    assert len(sample1) == len(sample2) > 0
+    for (name1, _), (name2, sequence2) in zip(sample1, sample2):
+        assert name1.removesuffix('/1') == name2.removesuffix('/2')
+        assert sequence2 == mates[name1.removesuffix('/1')]
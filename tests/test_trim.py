@@ -0,0 +1,44 @@
+"""Tests that trimmed fastq output reads back."""
+import pytest
+
+from rnaseeker.fasta import trim
+from rnaseeker.sequence import sequence_io as seqio
+
+ADAPTER = 'AGATCGGAAGAGC'
+READS = [
+    ('@kept', 'ACGTACGTTT' + ADAPTER, 'I' * 23),
+    ('@adapter_only', ADAPTER, 'I' * 13),
+    ('@untouched', 'GGCCGGCCAA', 'I' * 10),
+]
+
+
+def _trim(tmp_path, trimmer, threads=1):
+    input_path = tmp_path / 'reads.fq'
+    output_path = tmp_path / 'trimmed.fq'
+    input_path.write_text(
+        ''.join(
+            f'{name}\n{sequence}\n+\n{quality}\n' for name, sequence, quality in READS
+        )
+    )
+    counts = trim.trim_reads(str(input_path), str(output_path), trimmer, threads)
+    with seqio.FastqReader(str(output_path)) as reader:
+        return counts, [(record.name, record.sequence) for record in reader.parse()]
+
+
+def test_trimmed_output_reads_back(tmp_path):
+    counts, reads = _trim(tmp_path, trim.Trimmer([ADAPTER]))
+    assert reads == [('kept', 'ACGTACGTTT'), ('untouched', 'GGCCGGCCAA')]
+    assert counts['too_short'] == 1
+
+
+@pytest.mark.parametrize('threads', [1, 2])
+def test_empty_reads_read_back(tmp_path, threads):
+    counts, reads = _trim(
+        tmp_path, trim.Trimmer([ADAPTER], minimum_length=0), threads
+    )
+    assert reads == [
+        ('kept', 'ACGTACGTTT'),
+        ('adapter_only', ''),
+        ('untouched', 'GGCCGGCCAA'),
+    ]
+    assert counts['written'] == 3